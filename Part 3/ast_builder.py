@@ -1,9 +1,19 @@
-from lark import Transformer, v_args
+from lark import v_args
+from lark.visitors import Transformer_NonRecursive
 
-class ASTBuilder(Transformer):
+from ast_nodes import (ADD, AND, DIV, EQ, GE, GT, LE, LT, MOD, MUL, NE, NEG, NOT, OR, SUB, BinOp, Break, Call,
+                       Continue, Expr, Function, If, Let, Mut, Param, Print, Program, Return, UnaryOp, Variable,
+                       While)
+
+class ASTBuilder(Transformer_NonRecursive):
     """
     Transforms the parse tree from parser.py into a Python dictionary AST.
     Each rule in the grammar has a corresponding method.
+
+    transform() walks the tree with an explicit stack, so arbitrarily deep
+    expressions and blocks do not hit Python's recursion limit. (The fused
+    parser calls the same methods on each LALR reduction, which does not
+    recurse either.)
     """
 
     def start(self, items):
@@ -14,17 +24,32 @@ class ASTBuilder(Transformer):
         }
 
     def function(self, items):
-        # items = [CNAME, type, block]
+        # items = [CNAME, params (None if there are none), type, block]
         fn_name = items[0].value if hasattr(items[0], "value") else items[0]
-        fn_ret_type = items[1]
-        fn_body = items[2]
+        fn_params = items[1] or []
+        fn_ret_type = items[2]
+        fn_body = items[3]
         return {
             "type": "function",
             "name": fn_name,
+            "params": fn_params,
             "ret_type": fn_ret_type,
             "body": fn_body
         }
 
+    def params(self, items):
+        # items is a list of param nodes
+        return items
+
+    def param(self, items):
+        # items = [CNAME, type]
+        param_name, param_type = items
+        return {
+            "type": "param",
+            "name": param_name.value if hasattr(param_name, "value") else param_name,
+            "var_type": param_type
+        }
+
     def block(self, items):
         # items is a list of statements
         return items
@@ -85,6 +110,10 @@ class ASTBuilder(Transformer):
     def continue_stmt(self, items):
         return {"type": "continue"}
 
+    def call_stmt(self, items):
+        # A call evaluated for its side effects
+        return {"type": "expr", "value": items[0]}
+
     def type(self, items):
         # We only have "int" for now
         return "int"
@@ -143,3 +172,138 @@ class ASTBuilder(Transformer):
         # Return a dict so we know it's a variable reference
         token = items[0]
         return {"type": "variable", "name": token.value if hasattr(token, "value") else token}
+
+    def call(self, items):
+        # items = [CNAME, args (None if there are none)]
+        token = items[0]
+        return {
+            "type": "call",
+            "name": token.value if hasattr(token, "value") else token,
+            "args": items[1] or []
+        }
+
+    def args(self, items):
+        # items is a list of argument expressions
+        return items
+
+
+def token_str(token):
+    return token.value if hasattr(token, "value") else token
+
+
+class NodeBuilder(Transformer_NonRecursive):
+    """
+    Transforms the parse tree from parser.py into the compact Node AST of
+    ast_nodes.py. Mirrors ASTBuilder rule for rule (parser.get_node_parser
+    fuses it into the LALR parse the same way);
+    `NodeBuilder().transform(tree).to_dict()` equals `ASTBuilder().transform(tree)`.
+    """
+
+    def start(self, items):
+        return Program(items)
+
+    def function(self, items):
+        # items = [CNAME, params (None if there are none), type, block]
+        return Function(token_str(items[0]), items[1] or [], items[2], items[3])
+
+    def params(self, items):
+        return items
+
+    def param(self, items):
+        return Param(token_str(items[0]), items[1])
+
+    def block(self, items):
+        return items
+
+    def statement(self, items):
+        return items[0]
+
+    def return_stmt(self, items):
+        return Return(items[0])
+
+    def let_stmt(self, items):
+        var_type, var_name, value = items
+        return Let(var_type, token_str(var_name), value)
+
+    def mut_stmt(self, items):
+        var_name, value = items
+        return Mut(token_str(var_name), value)
+
+    def print_stmt(self, items):
+        return Print(items[0])
+
+    def if_stmt(self, items):
+        return If(items[0], items[1], items[2] if len(items) == 3 else None)
+
+    def while_stmt(self, items):
+        return While(items[0], items[1])
+
+    def break_stmt(self, items):
+        return Break()
+
+    def continue_stmt(self, items):
+        return Continue()
+
+    def call_stmt(self, items):
+        return Expr(items[0])
+
+    def type(self, items):
+        return "int"
+
+    # ------------------ Expressions ------------------
+    def logical_or(self, items):
+        return BinOp(OR, items[0], items[1])
+
+    def logical_and(self, items):
+        return BinOp(AND, items[0], items[1])
+
+    def eq(self, items):
+        return BinOp(EQ, items[0], items[1])
+
+    def ne(self, items):
+        return BinOp(NE, items[0], items[1])
+
+    def lt(self, items):
+        return BinOp(LT, items[0], items[1])
+
+    def le(self, items):
+        return BinOp(LE, items[0], items[1])
+
+    def gt(self, items):
+        return BinOp(GT, items[0], items[1])
+
+    def ge(self, items):
+        return BinOp(GE, items[0], items[1])
+
+    def add(self, items):
+        return BinOp(ADD, items[0], items[1])
+
+    def sub(self, items):
+        return BinOp(SUB, items[0], items[1])
+
+    def mul(self, items):
+        return BinOp(MUL, items[0], items[1])
+
+    def div(self, items):
+        return BinOp(DIV, items[0], items[1])
+
+    def mod(self, items):
+        return BinOp(MOD, items[0], items[1])
+
+    def logical_not(self, items):
+        return UnaryOp(NOT, items[0])
+
+    def neg(self, items):
+        return UnaryOp(NEG, items[0])
+
+    def number(self, items):
+        return int(items[0])
+
+    def variable(self, items):
+        return Variable(token_str(items[0]))
+
+    def call(self, items):
+        return Call(token_str(items[0]), items[1] or [])
+
+    def args(self, items):
+        return items
@@ -0,0 +1,309 @@
+import sys
+
+# Integer opcode tags, one per node kind
+(PROGRAM, FUNCTION, PARAM,
+ RETURN, LET, MUT, PRINT, IF, WHILE, BREAK, CONTINUE, EXPR,
+ VARIABLE, CALL,
+ OR, AND, EQ, NE, LT, LE, GT, GE, ADD, SUB, MUL, DIV, MOD,
+ NEG, NOT) = range(29)
+
+# Opcode -> the "type" string used by the dictionary AST
+OP_NAMES = (
+    "program", "function", "param",
+    "return", "let", "mut", "print", "if", "while", "break", "continue", "expr",
+    "variable", "call",
+    "or", "and", "eq", "ne", "lt", "le", "gt", "ge", "add", "sub", "mul", "div", "mod",
+    "neg", "not",
+)
+OPCODES = {name: op for op, name in enumerate(OP_NAMES)}
+
+BINARY_OPCODES = frozenset(range(OR, MOD + 1))
+UNARY_OPCODES = frozenset((NEG, NOT))
+
+# Field kinds in Node.FIELDS: a string or int, one subtree, or a list of subtrees
+SCALAR, CHILD, CHILDREN = range(3)
+
+
+class Node:
+    """
+    Base class for the compact AST. Every concrete node has an integer `op`
+    tag and fixed `__slots__`, so a node costs a few machine words instead of
+    a dict. Integer literals stay plain Python ints, as in the dict AST.
+
+    FIELDS lists (dict key, attribute, field kind) in the key order
+    ASTBuilder and SemanticAnalyzer use; to_dict / from_dict convert with
+    it. Optional fields (an `if` without else, a slot not yet assigned)
+    are None and left out of the dict.
+    """
+    __slots__ = ()
+    FIELDS = ()
+
+    @property
+    def kind(self):
+        return OP_NAMES[self.op]
+
+    def to_dict(self):
+        return to_dict(self)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Program(Node):
+    __slots__ = ("functions",)
+    FIELDS = (("functions", "functions", CHILDREN),)
+    op = PROGRAM
+
+    def __init__(self, functions):
+        self.functions = functions
+
+
+class Function(Node):
+    __slots__ = ("name", "params", "ret_type", "body", "slots")
+    FIELDS = (("name", "name", SCALAR), ("params", "params", CHILDREN), ("ret_type", "ret_type", SCALAR),
+              ("body", "body", CHILDREN), ("slots", "slots", SCALAR))
+    op = FUNCTION
+
+    def __init__(self, name, params, ret_type, body):
+        self.name = sys.intern(name)
+        self.params = params
+        self.ret_type = sys.intern(ret_type)
+        self.body = body
+        self.slots = None  # set by semantic analysis
+
+
+class Param(Node):
+    __slots__ = ("name", "var_type", "slot")
+    FIELDS = (("name", "name", SCALAR), ("var_type", "var_type", SCALAR), ("slot", "slot", SCALAR))
+    op = PARAM
+
+    def __init__(self, name, var_type):
+        self.name = sys.intern(name)
+        self.var_type = sys.intern(var_type)
+        self.slot = None
+
+
+class Return(Node):
+    __slots__ = ("value",)
+    FIELDS = (("value", "value", CHILD),)
+    op = RETURN
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Let(Node):
+    __slots__ = ("var_type", "name", "value", "slot")
+    FIELDS = (("var_type", "var_type", SCALAR), ("name", "name", SCALAR), ("value", "value", CHILD),
+              ("slot", "slot", SCALAR))
+    op = LET
+
+    def __init__(self, var_type, name, value):
+        self.var_type = sys.intern(var_type)
+        self.name = sys.intern(name)
+        self.value = value
+        self.slot = None
+
+
+class Mut(Node):
+    __slots__ = ("name", "value", "slot")
+    FIELDS = (("name", "name", SCALAR), ("value", "value", CHILD), ("slot", "slot", SCALAR))
+    op = MUT
+
+    def __init__(self, name, value):
+        self.name = sys.intern(name)
+        self.value = value
+        self.slot = None
+
+
+class Print(Node):
+    __slots__ = ("value",)
+    FIELDS = (("value", "value", CHILD),)
+    op = PRINT
+
+    def __init__(self, value):
+        self.value = value
+
+
+class If(Node):
+    __slots__ = ("condition", "then", "else_")
+    FIELDS = (("condition", "condition", CHILD), ("then", "then", CHILDREN), ("else", "else_", CHILDREN))
+    op = IF
+
+    def __init__(self, condition, then, else_=None):
+        self.condition = condition
+        self.then = then
+        self.else_ = else_
+
+
+class While(Node):
+    __slots__ = ("condition", "body")
+    FIELDS = (("condition", "condition", CHILD), ("body", "body", CHILDREN))
+    op = WHILE
+
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = body
+
+
+class Break(Node):
+    __slots__ = ()
+    op = BREAK
+
+
+class Continue(Node):
+    __slots__ = ()
+    op = CONTINUE
+
+
+class Expr(Node):
+    __slots__ = ("value",)
+    FIELDS = (("value", "value", CHILD),)
+    op = EXPR
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Variable(Node):
+    __slots__ = ("name", "slot")
+    FIELDS = (("name", "name", SCALAR), ("slot", "slot", SCALAR))
+    op = VARIABLE
+
+    def __init__(self, name):
+        self.name = sys.intern(name)
+        self.slot = None
+
+
+class Call(Node):
+    __slots__ = ("name", "args")
+    FIELDS = (("name", "name", SCALAR), ("args", "args", CHILDREN))
+    op = CALL
+
+    def __init__(self, name, args):
+        self.name = sys.intern(name)
+        self.args = args
+
+
+class BinOp(Node):
+    __slots__ = ("op", "left", "right")
+    FIELDS = (("left", "left", CHILD), ("right", "right", CHILD))
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class UnaryOp(Node):
+    __slots__ = ("op", "value")
+    FIELDS = (("value", "value", CHILD),)
+
+    def __init__(self, op, value):
+        self.op = op
+        self.value = value
+
+
+# Opcode -> node class, for from_dict
+NODE_CLASSES = [None] * len(OP_NAMES)
+for cls in (Program, Function, Param, Return, Let, Mut, Print, If, While, Break, Continue, Expr, Variable, Call):
+    NODE_CLASSES[cls.op] = cls
+for op in BINARY_OPCODES:
+    NODE_CLASSES[op] = BinOp
+for op in UNARY_OPCODES:
+    NODE_CLASSES[op] = UnaryOp
+del cls, op
+
+
+def to_dict(node):
+    """
+    Converts a Node AST (or subtree) into the dictionary AST the other passes
+    use, slots included. Uses an explicit stack, so depth is not limited by
+    Python's recursion limit.
+    """
+    result = [None]
+    # (node, container, key): the converted node is stored in container[key]
+    stack = [(node, result, 0)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node, container, key = pop()
+        if not isinstance(node, Node):
+            container[key] = node
+            continue
+        converted = {"type": OP_NAMES[node.op]}
+        for dict_key, attr, field_kind in node.FIELDS:
+            value = getattr(node, attr)
+            if value is None:
+                continue
+            if field_kind == SCALAR:
+                converted[dict_key] = value
+            elif field_kind == CHILD:
+                converted[dict_key] = None
+                push((value, converted, dict_key))
+            else:
+                items = converted[dict_key] = [None] * len(value)
+                for i, child in enumerate(value):
+                    push((child, items, i))
+        container[key] = converted
+    return result[0]
+
+
+def from_dict(node):
+    """
+    Converts a dictionary AST (as produced by ASTBuilder, with or without the
+    slots from semantic analysis) into Node objects, with an explicit stack.
+    """
+    result = [None]
+    # (dict node, container, key): the new node is stored in container[key],
+    # which is a list index or an attribute of the parent node
+    stack = [(node, result, 0)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node, container, key = pop()
+        if isinstance(node, dict):
+            op = OPCODES[node["type"]]
+            cls = NODE_CLASSES[op]
+            converted = cls.__new__(cls)
+            if op in BINARY_OPCODES or op in UNARY_OPCODES:
+                converted.op = op
+            for dict_key, attr, field_kind in cls.FIELDS:
+                value = node.get(dict_key)
+                if field_kind == SCALAR:
+                    setattr(converted, attr, sys.intern(value) if isinstance(value, str) else value)
+                elif field_kind == CHILD:
+                    push((value, converted, attr))
+                elif value is None:
+                    setattr(converted, attr, None)
+                else:
+                    items = [None] * len(value)
+                    setattr(converted, attr, items)
+                    for i, child in enumerate(value):
+                        push((child, items, i))
+        else:
+            converted = node
+        if isinstance(container, list):
+            container[key] = converted
+        else:
+            setattr(container, key, converted)
+    return result[0]
+
+
+def count_nodes(node):
+    """
+    Counts nodes (statements, expressions and literals) the way
+    ast_optimizer.count_nodes does for the dictionary AST.
+    """
+    total = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        total += 1
+        if not isinstance(node, Node):
+            continue
+        for _, attr, field_kind in node.FIELDS:
+            if field_kind == CHILD:
+                stack.append(getattr(node, attr))
+            elif field_kind == CHILDREN:
+                stack.extend(getattr(node, attr) or ())
+    return total
@@ -0,0 +1,302 @@
+BINARY_OPS = ("add", "sub", "mul", "div", "mod", "eq", "ne", "lt", "le", "gt", "ge", "or", "and")
+UNARY_OPS = ("neg", "not")
+TERMINATORS = ("return", "break", "continue")
+
+
+def wrap_i32(value):
+    """
+    Wraps a Python int to the signed 32-bit range, like LLVM's i32 arithmetic.
+    """
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def fold_binary(op, left, right):
+    """
+    Evaluates a binary operator on two i32 constants with the same semantics as
+    the generated code. Returns None when the result is undefined at run time
+    (division by zero, INT_MIN / -1), so the expression is left for the backend.
+    """
+    if op == "add":
+        return wrap_i32(left + right)
+    if op == "sub":
+        return wrap_i32(left - right)
+    if op == "mul":
+        return wrap_i32(left * right)
+    if op in ("div", "mod"):
+        if right == 0 or (left == -0x80000000 and right == -1):
+            return None
+        # sdiv/srem truncate toward zero
+        quot = abs(left) // abs(right)
+        if (left < 0) != (right < 0):
+            quot = -quot
+        return quot if op == "div" else left - right * quot
+    if op == "eq":
+        return int(left == right)
+    if op == "ne":
+        return int(left != right)
+    if op == "lt":
+        return int(left < right)
+    if op == "le":
+        return int(left <= right)
+    if op == "gt":
+        return int(left > right)
+    if op == "ge":
+        return int(left >= right)
+    if op == "and":
+        return int(left != 0 and right != 0)
+    if op == "or":
+        return int(left != 0 or right != 0)
+    return None
+
+
+def count_nodes(node, skip=None):
+    """
+    Counts AST nodes (statements, expressions and literals) in a subtree,
+    leaving out the subtree `skip` if it occurs in it.
+    """
+    total = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if node is skip:
+            continue
+        total += 1
+        if not isinstance(node, dict):
+            continue
+        for key in ("value", "left", "right", "condition"):
+            if key in node and not isinstance(node[key], str):
+                stack.append(node[key])
+        for key in ("functions", "params", "args", "then", "else", "body"):
+            if key in node:
+                stack.append(node[key])
+    return total
+
+
+def called_functions(node):
+    """
+    Returns the set of function names called anywhere in a subtree.
+    """
+    found = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            if node["type"] == "call":
+                found.add(node["name"])
+            for key in ("value", "left", "right", "condition", "args", "then", "else", "body"):
+                if key in node and not isinstance(node[key], (int, str)):
+                    stack.append(node[key])
+    return found
+
+
+def is_pure(expr):
+    """
+    True if evaluating the expression has no side effects, so it may be dropped.
+    Calls may print or loop forever, and a division or modulo may trap unless
+    its divisor is a constant other than 0 and -1, so an expression containing
+    one of those is not.
+    """
+    stack = [expr]
+    while stack:
+        expr = stack.pop()
+        if not isinstance(expr, dict):
+            continue
+        if expr["type"] == "call":
+            return False
+        if expr["type"] in ("div", "mod") and (not isinstance(expr["right"], int) or expr["right"] in (0, -1)):
+            return False
+        for key in ("left", "right", "value"):
+            if key in expr:
+                stack.append(expr[key])
+    return True
+
+
+def operands(expr):
+    """
+    The subexpressions of an expression node, in evaluation order.
+    """
+    etype = expr["type"]
+    if etype in BINARY_OPS:
+        return [expr["left"], expr["right"]]
+    if etype in UNARY_OPS:
+        return [expr["value"]]
+    if etype == "call":
+        return expr["args"]
+    return []
+
+
+class ASTOptimizer:
+    """
+    Simplifies the AST between semantic analysis and code generation:
+    - Folds constant integer expressions with i32 wraparound semantics
+    - Applies simple identities (x + 0, x * 1, 0 and x, ...); x * 0 only when
+      x has no calls and no division that may trap
+    - Replaces constant-condition if/while statements with the branch taken
+    - Drops statements after return/break/continue in the same block
+    The number of AST nodes removed is kept in `removed_nodes`.
+
+    Blocks and expressions are walked with explicit stacks rather than
+    recursion, so nesting depth is not limited by Python's call stack.
+    """
+
+    def __init__(self):
+        self.removed_nodes = 0
+
+    def optimize(self, ast):
+        if ast["type"] != "program":
+            raise Exception("Top-level AST must be 'program'")
+
+        for func in ast["functions"]:
+            func["body"] = self.visit_block(func["body"])
+        return ast
+
+    def visit_block(self, stmts):
+        """
+        Returns the optimized statement list. Each pending block is a frame
+        [statements, next index, output list, owner node, owner key]; the
+        output is stored as owner[key] once the block is done. The taken branch
+        of a constant `if` gets a frame that writes into its parent's output.
+        """
+        result = []
+        stack = [[stmts, 0, result, None, None]]
+        while stack:
+            frame = stack[-1]
+            stmts, i, out = frame[0], frame[1], frame[2]
+            if i < len(stmts) and out and out[-1]["type"] in TERMINATORS:
+                # Everything after an unconditional jump is unreachable
+                self.removed_nodes += count_nodes(stmts[i:])
+                i = len(stmts)
+            if i == len(stmts):
+                stack.pop()
+                if frame[3] is not None:
+                    frame[3][frame[4]] = out
+                continue
+            frame[1] = i + 1
+            self.visit_stmt(stmts[i], out, stack)
+        return result
+
+    def visit_stmt(self, stmt, out, stack):
+        """
+        Appends what replaces `stmt` to `out`, and pushes frames for the
+        blocks nested in it onto the visit_block stack.
+        """
+        stype = stmt["type"]
+        if stype in ("let", "mut", "print", "return", "expr"):
+            stmt["value"] = self.visit_expr(stmt["value"])
+        elif stype == "if":
+            cond = self.visit_expr(stmt["condition"])
+            stmt["condition"] = cond
+            if isinstance(cond, int):
+                taken, dropped = ("then", "else") if cond != 0 else ("else", "then")
+                # The if node and its condition disappear, the taken branch is spliced in
+                self.removed_nodes += 2 + count_nodes(stmt.get(dropped, []))
+                stack.append([stmt.get(taken, []), 0, out, None, None])
+                return
+            # Pushed last, so the then block is visited first
+            if "else" in stmt:
+                stack.append([stmt["else"], 0, [], stmt, "else"])
+            stack.append([stmt["then"], 0, [], stmt, "then"])
+        elif stype == "while":
+            cond = self.visit_expr(stmt["condition"])
+            stmt["condition"] = cond
+            if cond == 0:
+                self.removed_nodes += count_nodes(stmt)
+                return
+            stack.append([stmt["body"], 0, [], stmt, "body"])
+        out.append(stmt)
+
+    def visit_expr(self, expr):
+        """
+        Returns the folded replacement of an expression. Operands are folded
+        before the node that uses them (post-order), with an explicit stack of
+        (node, operands done) entries and a stack of folded results.
+        """
+        if not isinstance(expr, dict):
+            return expr
+        results = []
+        stack = [(expr, False)]
+        while stack:
+            node, operands_done = stack.pop()
+            if not isinstance(node, dict) or node["type"] == "variable":
+                results.append(node)
+            elif not operands_done:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands(node)))
+            else:
+                etype = node["type"]
+                if etype in BINARY_OPS:
+                    node["right"] = results.pop()
+                    node["left"] = results.pop()
+                    results.append(self.fold_binary_node(node))
+                elif etype in UNARY_OPS:
+                    node["value"] = results.pop()
+                    results.append(self.fold_unary_node(node))
+                else:
+                    count = len(operands(node))
+                    if count:
+                        node["args"] = results[-count:]
+                        del results[-count:]
+                    results.append(node)
+        return results.pop()
+
+    def fold_binary_node(self, expr):
+        left, right = expr["left"], expr["right"]
+        if isinstance(left, int) and isinstance(right, int):
+            value = fold_binary(expr["type"], wrap_i32(left), wrap_i32(right))
+            if value is not None:
+                return self.replace(expr, value)
+        return self.simplify_binary(expr)
+
+    def fold_unary_node(self, expr):
+        value = expr["value"]
+        if isinstance(value, int):
+            value = wrap_i32(value)
+            return self.replace(expr, wrap_i32(-value) if expr["type"] == "neg" else int(value == 0))
+        return expr
+
+    def simplify_binary(self, expr):
+        """
+        Algebraic identities where exactly one operand is a constant.
+        """
+        etype, left, right = expr["type"], expr["left"], expr["right"]
+        if isinstance(right, int):
+            const, other = right, left
+        elif isinstance(left, int):
+            const, other = left, right
+        else:
+            return expr
+
+        if etype == "add" and const == 0:
+            return self.replace(expr, other)
+        if etype == "sub" and right == 0:
+            return self.replace(expr, left)
+        if etype == "mul" and const == 1:
+            return self.replace(expr, other)
+        if etype == "mul" and const == 0 and is_pure(other):
+            return self.replace(expr, 0)
+        if etype == "div" and right == 1:
+            return self.replace(expr, left)
+        if etype in ("and", "or") and isinstance(left, int):
+            # The left operand decides whether the right one matters
+            if (etype == "and") == (const == 0):
+                return self.replace(expr, int(etype == "or"))
+            return self.replace(expr, {"type": "ne", "left": other, "right": 0})
+        return expr
+
+    def replace(self, expr, new_expr):
+        # An operand kept in new_expr is left out of both counts, so long
+        # chains of identities (x + 0 + 0 + ...) cost linear time
+        kept = None
+        for key in ("left", "right", "value"):
+            operand = expr.get(key)
+            if isinstance(operand, dict) and (operand is new_expr or
+                                              (isinstance(new_expr, dict) and operand is new_expr.get("left"))):
+                kept = operand
+        self.removed_nodes += count_nodes(expr, kept) - count_nodes(new_expr, kept)
+        return new_expr
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lark import UnexpectedInput
+
+from ast_optimizer import ASTOptimizer
+from codegen import CodeGen
+from emit import EMIT_SUFFIXES, emit as emit_module
+from optimizer import optimize
+from parser import get_ast_parser
+from semantic_analyzer import SemanticAnalyzer
+from target import host_target_machine, parse_module
+
+# Batch artifacts are per-file; executables are left to compile-file
+BATCH_EMIT_KINDS = ("ll", "bc", "obj")
+
+# Per-process warm state, set up once by init_worker
+_target_machines = {}  # opt_level -> host TargetMachine, built on first use
+_opt_level = 0
+
+
+def collect_inputs(path):
+    """
+    Returns (root, [.xd files]) for a directory (searched recursively) or a
+    manifest file listing one path per line, relative to the manifest.
+    Blank lines and lines starting with '#' in a manifest are ignored.
+    """
+    if os.path.isdir(path):
+        files = []
+        for dirpath, _, names in os.walk(path):
+            files += [os.path.join(dirpath, n) for n in names if n.endswith(".xd")]
+        return path, sorted(files)
+
+    root = os.path.dirname(os.path.abspath(path))
+    files = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                files.append(os.path.join(root, line))
+    return root, files
+
+
+def artifact_path(source, root, out_dir, emit):
+    """
+    Mirrors the source's path below root in out_dir. A manifest entry outside
+    root goes to out_dir/external/<hash of its directory>/, so files with the
+    same name in different directories do not overwrite each other.
+    """
+    source = os.path.abspath(source)
+    rel = os.path.relpath(source, os.path.abspath(root))
+    if rel.startswith(".."):
+        parent = hashlib.sha256(os.path.dirname(source).encode("utf8")).hexdigest()[:16]
+        rel = os.path.join("external", parent, os.path.basename(source))
+    return os.path.join(out_dir, os.path.splitext(rel)[0] + EMIT_SUFFIXES[emit])
+
+
+def init_worker(opt_level):
+    """
+    Builds the parser and the host target machine for opt_level (the default
+    level of this worker) once per worker process.
+    """
+    global _opt_level
+    get_ast_parser()
+    _opt_level = opt_level
+    worker_target_machine(opt_level)
+
+
+def worker_target_machine(opt_level=None):
+    """
+    Returns the worker's target machine for opt_level (default: the level
+    given to init_worker), building it on first use.
+    """
+    opt_level = _opt_level if opt_level is None else opt_level
+    target_machine = _target_machines.get(opt_level)
+    if target_machine is None:
+        target_machine = _target_machines[opt_level] = host_target_machine(opt_level)
+    return target_machine
+
+
+def compile_source(code, fold=True, opt_level=None, lap=None):
+    """
+    Runs the whole pipeline on source text with the worker's warm parser and
+    target machine, returning the optimized llvmlite.binding.ModuleRef.
+    opt_level defaults to the level given to init_worker. If given, lap(name)
+    is called after each phase. Raises on parse and semantic errors.
+    """
+    lap = lap or (lambda name: None)
+    try:
+        ast = get_ast_parser().parse(code)
+    except UnexpectedInput as e:
+        raise Exception(f"Parse error at line {e.line}, column {e.column}:\n{e.get_context(code)}")
+    lap("parse")
+
+    SemanticAnalyzer().analyze(ast)
+    lap("semantic")
+
+    if fold:
+        ASTOptimizer().optimize(ast)
+        lap("fold")
+
+    codegen = CodeGen()
+    codegen.generate_ir(ast)
+    lap("codegen")
+
+    opt_level = _opt_level if opt_level is None else opt_level
+    target_machine = worker_target_machine(opt_level)
+    llvm_module = parse_module(codegen.module, target_machine)
+    optimize(llvm_module, target_machine, opt_level)
+    lap("optimize")
+    return llvm_module
+
+
+def compile_one(source, output, emit="ll", fold=True):
+    """
+    Compiles one .xd file to `output` with the worker's warm parser and target
+    machine. Never raises: failures are reported in the returned record, along
+    with per-phase timings in seconds.
+    """
+    record = {"file": source, "output": output, "ok": False, "phases": {}}
+    phases = record["phases"]
+    start = time.perf_counter()
+    last = start
+
+    def lap(name):
+        nonlocal last
+        now = time.perf_counter()
+        phases[name] = now - last
+        last = now
+
+    try:
+        with open(source) as f:
+            code = f.read()
+        llvm_module = compile_source(code, fold, lap=lap)
+
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        emit_module(llvm_module, worker_target_machine(), emit, output)
+        lap("emit")
+        record["ok"] = True
+    except Exception as e:
+        record["error"] = str(e)
+
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def compile_batch(inputs, root, out_dir, jobs=1, opt_level=0, emit="ll", fold=True):
+    """
+    Compiles many files, reusing one parser and target machine per worker
+    process. Returns the summary dict (also written to out_dir/summary.json).
+    """
+    outputs = [artifact_path(src, root, out_dir, emit) for src in inputs]
+    start = time.perf_counter()
+    if jobs <= 1:
+        init_worker(opt_level)
+        records = [compile_one(src, out, emit, fold) for src, out in zip(inputs, outputs)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(opt_level,)) as pool:
+            n = len(inputs)
+            chunksize = max(1, n // (jobs * 8))
+            records = list(pool.map(compile_one, inputs, outputs, [emit] * n, [fold] * n,
+                                    chunksize=chunksize))
+
+    summary = {
+        "files": len(records),
+        "succeeded": sum(r["ok"] for r in records),
+        "failed": sum(not r["ok"] for r in records),
+        "jobs": jobs,
+        "opt_level": opt_level,
+        "emit": emit,
+        "wall_seconds": time.perf_counter() - start,
+        "results": records,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
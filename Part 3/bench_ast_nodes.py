@@ -0,0 +1,91 @@
+"""
+Compares the dictionary AST with the compact Node AST of ast_nodes.py on
+generated programs: memory retained by the AST each fused parser builds,
+traversal time, and semantic analysis time (SemanticAnalyzer vs NodeAnalyzer).
+First checks that both give the same AST, before and after analysis.
+
+Usage:
+    python bench_ast_nodes.py              # 1000 and 10000 statements
+    python bench_ast_nodes.py 50000
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from ast_nodes import count_nodes as count_compact_nodes
+from ast_optimizer import count_nodes
+from parser import get_ast_parser, get_node_parser, parse_to_ast, parse_to_nodes
+from program_gen import generate_program
+from semantic_analyzer import NodeAnalyzer, SemanticAnalyzer
+
+
+def retained_memory(build):
+    """
+    Returns (result, bytes still allocated after build() returns).
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def best_time(fn, runs=3):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def analyze(analyzer_class, ast):
+    analyzer = analyzer_class()
+    analyzer.analyze(ast)
+    return analyzer
+
+
+def bench(statements):
+    code = generate_program(statements=statements, max_nesting=2, expr_depth=6)
+    # Build both parsers up front so only parsing is measured
+    get_ast_parser()
+    get_node_parser()
+
+    dict_ast, dict_mem = retained_memory(lambda: parse_to_ast(code))
+    node_ast, node_mem = retained_memory(lambda: parse_to_nodes(code))
+    if node_ast.to_dict() != dict_ast:
+        raise Exception("NodeBuilder produced a different AST")
+
+    count = count_nodes(dict_ast)
+    if count_compact_nodes(node_ast) != count:
+        raise Exception("Node counts differ")
+    dict_parse = best_time(lambda: parse_to_ast(code))
+    node_parse = best_time(lambda: parse_to_nodes(code))
+    dict_walk = best_time(lambda: count_nodes(dict_ast))
+    node_walk = best_time(lambda: count_compact_nodes(node_ast))
+
+    dict_analyzer = analyze(SemanticAnalyzer, dict_ast)
+    node_analyzer = analyze(NodeAnalyzer, node_ast)
+    if node_ast.to_dict() != dict_ast:
+        raise Exception("NodeAnalyzer assigned different slots")
+    if (node_analyzer.warnings, node_analyzer.symbol_stats) != (dict_analyzer.warnings, dict_analyzer.symbol_stats):
+        raise Exception("NodeAnalyzer reported different warnings or symbol stats")
+    dict_check = best_time(lambda: analyze(SemanticAnalyzer, dict_ast))
+    node_check = best_time(lambda: analyze(NodeAnalyzer, node_ast))
+
+    print(f"{statements} statements, {count} nodes")
+    print(f"  memory     dict: {dict_mem / 2**20:8.2f} MiB   nodes: {node_mem / 2**20:8.2f} MiB"
+          f"   ({dict_mem / node_mem:.2f}x)")
+    print(f"  parse      dict: {dict_parse * 1000:8.2f} ms    nodes: {node_parse * 1000:8.2f} ms"
+          f"    ({dict_parse / node_parse:.2f}x)")
+    print(f"  traversal  dict: {dict_walk * 1000:8.2f} ms    nodes: {node_walk * 1000:8.2f} ms"
+          f"    ({dict_walk / node_walk:.2f}x)")
+    print(f"  semantic   dict: {dict_check * 1000:8.2f} ms    nodes: {node_check * 1000:8.2f} ms"
+          f"    ({dict_check / node_check:.2f}x)")
+
+
+if __name__ == "__main__":
+    for n in (int(a) for a in sys.argv[1:]) if len(sys.argv) > 1 else (1000, 10000):
+        bench(n)
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from codegen import CodeGen
+from compiler import build_checked_ast, lower_module
+from emit import emit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KERNEL_DIR = os.path.join(HERE, "kernels")
+
+# Recursive kernels: two-way recursion, nested recursion with self tail calls,
+# and a 10M-deep tail-recursive accumulator
+KERNELS = ("fib", "ackermann", "tail_sum")
+
+
+class SelfCallCodeGen(CodeGen):
+    """
+    Baseline without tail-call elimination: a self call in return position
+    stays a call, marked `tail` or not. Unmarked, every level of recursion
+    takes a stack frame; marked, the backend may still turn it into a jump.
+    """
+
+    def __init__(self, mark_tail):
+        super().__init__()
+        self.mark_tail = mark_tail
+
+    def compile_self_tail_call(self, expr):
+        value = yield from self.compile_call(expr, tail=self.mark_tail)
+        self.ret(value)
+
+
+def build(codegen, ast, path, opt_level):
+    codegen.generate_ir(ast)
+    llvm_module, target_machine = lower_module(codegen.module, opt_level)
+    emit(llvm_module, target_machine, "exe", path)
+
+
+def time_run(path, runs):
+    """
+    Returns (best seconds, stdout), or (None, reason) if the program crashed,
+    e.g. by overflowing its stack.
+    """
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([path], stdout=subprocess.PIPE)
+        best = min(best, time.perf_counter() - start)
+        if result.returncode < 0:
+            return None, f"killed by signal {-result.returncode}"
+    return best, result.stdout
+
+
+def bench(runs=3):
+    variants = [
+        ("tail calls as loops", CodeGen),
+        ("tail-marked calls", lambda: SelfCallCodeGen(mark_tail=True)),
+        ("plain calls", lambda: SelfCallCodeGen(mark_tail=False)),
+    ]
+    print(f"recursive kernels, native executables, best of {runs}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kernel in KERNELS:
+            for opt_level in (0, 2):
+                outputs = set()
+                for index, (label, make_codegen) in enumerate(variants):
+                    ast, _ = build_checked_ast(os.path.join(KERNEL_DIR, kernel + ".xd"))
+                    path = os.path.join(tmp, f"{kernel}_O{opt_level}_{index}")
+                    build(make_codegen(), ast, path, opt_level)
+                    seconds, output = time_run(path, runs)
+                    if seconds is None:
+                        print(f"  {kernel:<10} -O{opt_level}  {label:<20} {output}")
+                        continue
+                    outputs.add(output)
+                    print(f"  {kernel:<10} -O{opt_level}  {label:<20} {seconds * 1000:10.1f} ms")
+                assert len(outputs) <= 1, f"{kernel}: variants printed different output"
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
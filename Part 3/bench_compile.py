@@ -0,0 +1,149 @@
+"""
+Compile-time benchmark: times each compiler stage on generated programs from
+1 KB up to 100 MB and saves the results as JSON, so two commits can be compared.
+
+    python bench_compile.py --max-size 1M --save results/HEAD.json
+    python bench_compile.py --max-size 1M --compare results/base.json
+
+With --compare, stages that got slower than the baseline by more than
+--threshold (default 10%) are listed and the exit status is 1. The largest
+sizes need a lot of memory (the parse tree alone is several GB at 100 MB),
+so the default stops at 1 MB.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from ast_builder import ASTBuilder
+from codegen import CodeGen
+from parser import get_ast_parser, get_parser, parse_code, parse_to_ast
+from program_gen import program_of_size
+from semantic_analyzer import SemanticAnalyzer
+from target import host_target_machine, parse_module
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SIZES = {"1K": 2**10, "10K": 10 * 2**10, "100K": 100 * 2**10, "1M": 2**20, "10M": 10 * 2**20, "100M": 100 * 2**20}
+
+# Generator knobs shared by every size, so sizes differ only in statement count
+KNOBS = {"functions": 16, "max_nesting": 3, "expr_depth": 4, "expr_width": 2}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(fn, runs):
+    """
+    Returns (result of the last run, best wall time over `runs` runs).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(runs):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def bench_size(label, size_bytes, seed, runs):
+    code = program_of_size(size_bytes, seed=seed, **KNOBS)
+    target_machine = host_target_machine()
+    stages = {}
+
+    tree, stages["parse"] = timed(lambda: parse_code(code), runs)
+    ast, stages["ast_builder"] = timed(lambda: ASTBuilder().transform(tree), runs)
+    del tree
+    _, stages["fused_parse"] = timed(lambda: parse_to_ast(code), runs)
+    _, stages["semantic"] = timed(lambda: SemanticAnalyzer().analyze(ast), runs)
+
+    def codegen():
+        gen = CodeGen()
+        gen.generate_ir(ast)
+        return gen.module
+
+    module, stages["codegen"] = timed(codegen, runs)
+    _, stages["emit"] = timed(lambda: target_machine.emit_object(parse_module(module, target_machine)), runs)
+
+    return {"size": label, "bytes": len(code), "lines": code.count("\n"), "seconds": stages}
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of "size stage: old -> new" strings for stages that got
+    slower than the baseline by more than `threshold` (a fraction).
+    """
+    old = {r["size"]: r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results["results"]:
+        for stage, seconds in r["seconds"].items():
+            before = old.get(r["size"], {}).get(stage)
+            if before and seconds > before * (1 + threshold):
+                regressions.append(f"{r['size']:>5} {stage:<12} {before * 1000:10.2f} ms -> "
+                                   f"{seconds * 1000:10.2f} ms  (+{(seconds / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    args = argparse.ArgumentParser(description="Per-stage compile-time benchmark.")
+    args.add_argument("--max-size", default="1M", choices=list(SIZES))
+    args.add_argument("--seed", type=int, default=0)
+    args.add_argument("--runs", type=int, default=3, help="Best of N runs (sizes of 10M and up run once).")
+    args.add_argument("--save", help="Write results as JSON to this path.")
+    args.add_argument("--compare", help="Baseline JSON from an earlier --save.")
+    args.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before a stage is flagged.")
+    opts = args.parse_args()
+
+    get_parser()
+    get_ast_parser()
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "knobs": KNOBS,
+        "seed": opts.seed,
+        "results": [],
+    }
+    stage_names = ("parse", "ast_builder", "fused_parse", "semantic", "codegen", "emit")
+    print(f"{'size':>5} {'bytes':>11} " + " ".join(f"{s:>12}" for s in stage_names) + "   (ms)")
+    for label, size_bytes in SIZES.items():
+        runs = opts.runs if size_bytes < 10 * 2**20 else 1
+        record = bench_size(label, size_bytes, opts.seed, runs)
+        results["results"].append(record)
+        print(f"{label:>5} {record['bytes']:>11} " +
+              " ".join(f"{record['seconds'][s] * 1000:>12.2f}" for s in stage_names))
+        if label == opts.max_size:
+            break
+
+    if opts.save:
+        os.makedirs(os.path.dirname(os.path.abspath(opts.save)), exist_ok=True)
+        with open(opts.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, opts.threshold)
+        print(f"compared with {baseline.get('commit') or opts.compare}: "
+              f"{len(regressions)} stage(s) slower by more than {opts.threshold:.0%}")
+        for line in regressions:
+            print("  " + line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
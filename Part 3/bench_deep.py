@@ -0,0 +1,71 @@
+"""
+Deep-input benchmark: times each compiler stage on programs whose depth
+doubles from run to run (long left- and right-leaning `+` chains, `and`
+chains, unary chains and nested if/while blocks) under Python's default
+recursion limit. Time per level should stay flat as depth grows.
+
+    python bench_deep.py            # depths 5000, 10000, 20000
+    python bench_deep.py 40000      # largest depth
+"""
+
+import sys
+import time
+
+from ast_builder import ASTBuilder
+from ast_optimizer import ASTOptimizer
+from codegen import CodeGen
+from parser import get_ast_parser, get_parser, parse_code, parse_to_ast
+from semantic_analyzer import SemanticAnalyzer
+from vm import BytecodeCompiler
+
+
+def wrap(body):
+    return "fn main(): int {\n    let int x = 1;\n" + body + "\n    return 0;\n}\n"
+
+
+# Shape name -> source of that shape at the given depth
+SHAPES = {
+    "left +": lambda n: wrap("print(" + "+".join(["x"] * n) + ");"),
+    "right +": lambda n: wrap("print(" + "x+(" * (n - 1) + "x" + ")" * (n - 1) + ");"),
+    "and": lambda n: wrap("print(" + " and ".join(["x"] * n) + ");"),
+    "neg": lambda n: wrap("print(" + "-" * n + "x);"),
+    "if": lambda n: wrap("if (x > 0) {\n" * n + "print(x);\n" + "}\n" * n),
+    "while": lambda n: wrap("while (x > 0) {\n" * n + "mut x = 0;\n" + "}\n" * n),
+}
+
+STAGES = ("fused_parse", "two_pass", "semantic", "fold", "codegen", "vm_compile")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_shape(code):
+    seconds = {}
+    ast, seconds["fused_parse"] = timed(parse_to_ast, code)
+    # (No AST comparison here: == on dicts this deep recurses in C)
+    _, seconds["two_pass"] = timed(lambda: ASTBuilder().transform(parse_code(code)))
+    _, seconds["semantic"] = timed(SemanticAnalyzer().analyze, ast)
+    _, seconds["codegen"] = timed(CodeGen().generate_ir, ast)
+    _, seconds["vm_compile"] = timed(BytecodeCompiler().compile_program, ast)
+    # Folding rewrites the AST in place, so it runs last
+    _, seconds["fold"] = timed(ASTOptimizer().optimize, ast)
+    return seconds
+
+
+def bench(max_depth):
+    get_parser()
+    get_ast_parser()
+    depths = [max_depth // 4, max_depth // 2, max_depth]
+    print(f"recursion limit {sys.getrecursionlimit()}; microseconds per level")
+    print(f"{'shape':<8} {'depth':>7} " + " ".join(f"{s:>11}" for s in STAGES))
+    for shape, make in SHAPES.items():
+        for depth in depths:
+            seconds = bench_shape(make(depth))
+            print(f"{shape:<8} {depth:>7} " + " ".join(f"{seconds[s] / depth * 1e6:>11.2f}" for s in STAGES))
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
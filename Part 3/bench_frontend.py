@@ -0,0 +1,201 @@
+"""
+Front-end benchmark: the Lark LALR parser against hand_parser.py.
+
+Before timing anything, both front ends are run on generated programs, on
+randomly mutated copies of them and on malformed programs whose error
+position is known; they must return the same AST, or fail at the same
+(and the known) line and column, or the script exits nonzero. Then it
+reports tokens/s for lexing alone and for lexing plus parsing into the AST,
+files/s over many small programs (one process), and the time a fresh
+process takes to import the front end and build its first AST.
+
+    python bench_frontend.py               # 1 MiB program, 500 small files
+    python bench_frontend.py 4 2000
+    python bench_frontend.py --check-only  # just the agreement check
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from lark import UnexpectedInput
+
+import hand_parser
+from parser import get_ast_parser, get_parser
+from program_gen import generate_program, program_of_size
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Snippets spliced into programs to check that errors are reported at the same place
+MUTATIONS = ["(", ")", "{", "}", ";", ",", ":", "=", "==", "!", "!=", "-", "+", "*", "<", "<=", " ", "\n",
+             "or", "and", "if", "else", "fn", "int", "let", "mut", "while", "x", "1", "1.5", "@", "print"]
+
+# (source, (line, column) of the syntax error), checked for both front ends
+MALFORMED = [
+    ("fn main(): int {\n    let int x = ;\n}\n", (2, 17)),
+    ("fn main(): int {\n    return 1\n}\n", (3, 1)),
+    ("fn main(): int {\n    print(1 +);\n}\n", (2, 14)),
+    ("fn main() int { return 0; }\n", (1, 11)),
+    ("fn main(): int {\n    let int x = 1 @ 2;\n}\n", (2, 19)),
+    ("fn main(): int {\n    if (1) { print(1); } else print(2);\n}\n", (2, 31)),
+    ("fn main(): int {\n    while (1) { break;\n", (2, 22)),
+    ("fn f(a: int,): int { return a; }\n", (1, 13)),
+    ("fn main(): int {\n    mut = 3;\n}\n", (2, 9)),
+    ("fn main(): int {\n    return 1.5;\n}\n", (2, 12)),
+]
+
+# Runs one build_ast() in a fresh interpreter and prints its wall time.
+CHILD = """
+import sys, time
+sys.path.insert(0, {here!r})
+start = time.perf_counter()
+from build_ast import build_ast
+build_ast({filename!r}, frontend={frontend!r})
+print(time.perf_counter() - start)
+"""
+
+
+def lark_outcome(code):
+    try:
+        return "ok", get_ast_parser().parse(code)
+    except UnexpectedInput as e:
+        return "error", (e.line, e.column)
+    except ValueError:
+        # Lark's NUMBER also matches floats, which ASTBuilder rejects with int()
+        return "value", None
+
+
+def hand_outcome(code):
+    try:
+        return "ok", hand_parser.parse(code)
+    except hand_parser.ParseError as e:
+        return "error", (e.line, e.column)
+
+
+def mutate(code, rng):
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(code) + 1)
+        roll = rng.random()
+        if roll < 0.4:
+            code = code[:i] + code[i + rng.randint(1, 3):]
+        else:
+            code = code[:i] + rng.choice(MUTATIONS) + code[i + (roll >= 0.8):]
+    return code
+
+
+def small_programs(count):
+    return [generate_program(seed=seed, functions=1 + seed % 3, statements=5 + seed % 30,
+                             max_nesting=seed % 4, expr_depth=1 + seed % 4, expr_width=1 + seed % 3,
+                             max_params=seed % 3) for seed in range(count)]
+
+
+def describe(outcome):
+    kind, detail = outcome
+    return f"error at {detail}" if kind == "error" else kind
+
+
+def disagreement(expected, actual, position=None):
+    """
+    Describes how the outcomes of the Lark (`expected`) and hand front ends
+    differ, or how they miss an input's known error position; None if they
+    agree.
+    """
+    if expected[0] == "value":
+        if actual[0] != "error":
+            return "hand parser accepted a float literal"
+    elif expected != actual:
+        return f"lark: {describe(expected)}, hand: {describe(actual)}"
+    if position is not None and actual != ("error", position):
+        return f"expected an error at {position}, hand: {describe(actual)}"
+    return None
+
+
+def check_agreement(programs, mutations=10, seed=0):
+    """
+    Checks both front ends on every program, on `mutations` mutated copies of
+    each and on MALFORMED. Raises listing the first disagreements if there
+    are any; returns (inputs checked, inputs both rejected).
+    """
+    rng = random.Random(seed)
+    inputs = []
+    for program in programs:
+        inputs += [(code, None) for code in [program] + [mutate(program, rng) for _ in range(mutations)]]
+    inputs += MALFORMED
+
+    failures = []
+    rejected = 0
+    for code, position in inputs:
+        actual = hand_outcome(code)
+        problem = disagreement(lark_outcome(code), actual, position)
+        if problem:
+            failures.append(f"{problem}:\n{code}")
+        rejected += actual[0] == "error"
+    if failures:
+        raise Exception(f"Front ends disagree on {len(failures)} of {len(inputs)} inputs:\n\n"
+                        + "\n\n".join(failures[:5]))
+    return len(inputs), rejected
+
+
+def best_of(fn, runs):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_fresh_process(filename, frontend):
+    """
+    Times import + first build_ast() in a new Python process.
+    """
+    code = CHILD.format(here=HERE, filename=os.path.abspath(filename), frontend=frontend)
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def bench(megabytes, files, runs=3):
+    get_parser()
+    get_ast_parser()
+    programs = small_programs(files)
+    checked, rejected = check_agreement(programs[:200])
+
+    code = program_of_size(megabytes * 2**20, seed=1)
+    if get_ast_parser().parse(code) != hand_parser.parse(code):
+        raise Exception("front ends built different ASTs")
+    tokens = sum(1 for _ in hand_parser.tokenize(code)) - 1  # without the end marker
+
+    rows = [
+        # (front end, lex only, lex + parse); Lark's lex() runs its non-contextual lexer
+        ("lark", lambda: sum(1 for _ in get_parser().lex(code)), lambda: get_ast_parser().parse(code)),
+        ("hand", lambda: sum(1 for _ in hand_parser.tokenize(code)), lambda: hand_parser.parse(code)),
+    ]
+    parse_files = {"lark": get_ast_parser().parse, "hand": hand_parser.parse}
+
+    with tempfile.NamedTemporaryFile("w", suffix=".xd", delete=False) as f:
+        f.write(programs[0])
+    try:
+        startup = {name: min(time_fresh_process(f.name, name) for _ in range(runs)) for name in parse_files}
+    finally:
+        os.unlink(f.name)
+
+    print(f"front ends agree on {checked} programs (generated, mutated and malformed; {rejected} rejected)")
+    print(f"source: {len(code) / 2**20:.2f} MiB, {tokens} tokens; {files} small files, "
+          f"{sum(map(len, programs)) / files / 1024:.1f} KiB each")
+    print(f"{'frontend':<9} {'lex Mtok/s':>11} {'parse Mtok/s':>13} {'files/s':>9} {'startup ms':>11}")
+    for name, lex, parse in rows:
+        lex_time, parse_time = best_of(lex, runs), best_of(parse, runs)
+        files_time = best_of(lambda: [parse_files[name](p) for p in programs], runs)
+        print(f"{name:<9} {tokens / lex_time / 1e6:>11.2f} {tokens / parse_time / 1e6:>13.2f} "
+              f"{files / files_time:>9.0f} {startup[name] * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check-only"]:
+        checked, rejected = check_agreement(small_programs(200))
+        print(f"front ends agree on {checked} programs (generated, mutated and malformed; {rejected} rejected)")
+    else:
+        bench(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0, int(sys.argv[2]) if len(sys.argv) > 2 else 500)
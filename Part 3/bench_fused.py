@@ -0,0 +1,51 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+from ast_builder import ASTBuilder
+from parser import get_ast_parser, get_parser, parse_code, parse_to_ast
+from program_gen import program_of_size
+
+
+def two_pass(code):
+    return ASTBuilder().transform(parse_code(code))
+
+
+def measure(fn, code):
+    """
+    Returns (result, seconds, peak traced bytes). Time and memory are measured in
+    separate runs, since tracemalloc slows allocation down considerably.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(code)
+    seconds = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn(code)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def bench(megabytes):
+    code = program_of_size(megabytes * 2**20, seed=1)
+    # Build both parsers up front so only parsing is measured
+    get_parser()
+    get_ast_parser()
+
+    tree_ast, tree_time, tree_peak = measure(two_pass, code)
+    fused_ast, fused_time, fused_peak = measure(parse_to_ast, code)
+    assert fused_ast == tree_ast, "fused front end produced a different AST"
+
+    print(f"source: {len(code) / 2**20:.2f} MiB")
+    print(f"  parse tree + ASTBuilder: {tree_time:8.2f} s   peak {tree_peak / 2**20:8.1f} MiB")
+    print(f"  fused LALR transform:    {fused_time:8.2f} s   peak {fused_peak / 2**20:8.1f} MiB")
+    print(f"  speedup {tree_time / fused_time:.2f}x, peak memory {tree_peak / fused_peak:.2f}x lower")
+
+
+if __name__ == "__main__":
+    bench(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
@@ -0,0 +1,88 @@
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from compiler import build_module
+from emit import find_linker, link_executable
+from jit import run_jit
+from target import host_target_machine, parse_module
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@contextlib.contextmanager
+def silence_stdout():
+    """
+    Redirects fd 1 to /dev/null so C-level printf output is discarded too.
+    """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def time_runs(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench(filename, runs=10):
+    module = build_module(filename).module
+
+    with silence_stdout():
+        jit_time = time_runs(lambda: run_jit(module), runs)
+    print(f"jit   (MCJIT, in-process):          {jit_time * 1000:8.2f} ms")
+
+    try:
+        find_linker()
+    except Exception as e:
+        print(f"emit  (object in memory -> link):  skipped, {e}")
+        return
+
+    target_machine = host_target_machine()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exe = os.path.join(tmp, "output")
+        ll = os.path.join(tmp, "output.ll")
+
+        def emit_path():
+            obj = target_machine.emit_object(parse_module(module, target_machine))
+            link_executable(obj, exe)
+            subprocess.run([exe], stdout=subprocess.DEVNULL)
+
+        emit_time = time_runs(emit_path, runs)
+        print(f"emit  (object in memory -> link):  {emit_time * 1000:8.2f} ms")
+        print(f"jit speedup over emit: {emit_time / jit_time:.1f}x")
+
+        if shutil.which("clang") is None:
+            print("clang (output.ll -> ./output):     skipped, clang not found")
+            return
+
+        def clang_path():
+            with open(ll, "w") as f:
+                f.write(str(module))
+            subprocess.run(["clang", "-o", exe, ll])
+            subprocess.run([exe], stdout=subprocess.DEVNULL)
+
+        clang_time = time_runs(clang_path, runs)
+    print(f"clang (output.ll -> ./output):     {clang_time * 1000:8.2f} ms")
+    print(f"emit speedup over clang: {clang_time / emit_time:.1f}x")
+
+
+if __name__ == "__main__":
+    bench(sys.argv[1] if len(sys.argv) > 1 else os.path.join(HERE, "main.xd"))
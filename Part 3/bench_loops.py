@@ -0,0 +1,230 @@
+"""
+Break/continue benchmark: loops that exit early against one that runs to
+completion, with the iterations each executes.
+
+Before timing, every loop runs on the JIT (-O0, -O2, unfolded) and on the
+VM, and the iteration counts each prints must match the expected ones;
+any mismatch raises, so the script exits nonzero.
+
+    python bench_loops.py                # check, then time with n = 5000000
+    python bench_loops.py 1000000
+    python bench_loops.py --check-only   # just the check
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_jit import silence_stdout
+from compiler import build_module, lower_module
+from jit import run_jit
+
+# Searches for the first i with i * i % 1000003 == target and returns the
+# number of loop iterations executed, with and without an early exit.
+EARLY_EXIT = """
+fn main(): int {{
+    let int i = 0;
+    let int iters = 0;
+    while (i < {n}) {{
+        mut iters = iters + 1;
+        if (i * i % 1000003 == {target}) {{
+            break;
+        }}
+        mut i = i + 1;
+    }}
+    print(iters);
+    return iters;
+}}
+"""
+
+NO_EXIT = """
+fn main(): int {{
+    let int i = 0;
+    let int iters = 0;
+    let int found = 0;
+    while (i < {n}) {{
+        mut iters = iters + 1;
+        if (found == 0 and i * i % 1000003 == {target}) {{
+            mut found = 1;
+        }}
+        mut i = i + 1;
+    }}
+    print(iters);
+    return iters;
+}}
+"""
+
+# Counts iterations that reach the end of the body when every other one is skipped.
+CONTINUE = """
+fn main(): int {{
+    let int i = 0;
+    let int iters = 0;
+    while (i < {n}) {{
+        mut i = i + 1;
+        if (i % 2 == 0) {{
+            continue;
+        }}
+        mut iters = iters + 1;
+    }}
+    print(iters);
+    return iters;
+}}
+"""
+
+# Nested loops with statements after break/continue (which must not run);
+# prints the running total after each outer iteration that gets that far.
+NESTED = """
+fn main(): int {{
+    let int total = 0;
+    let int i = 0;
+    while (i < {n}) {{
+        mut i = i + 1;
+        if (i % 3 == 0) {{
+            continue;
+            mut total = total + 1000;
+        }}
+        let int j = 0;
+        while (1) {{
+            mut j = j + 1;
+            if (j > i % 5) {{
+                break;
+                mut total = total + 1000;
+            }}
+            mut total = total + 1;
+        }}
+        if (i > {stop}) {{
+            break;
+        }}
+        print(total);
+    }}
+    print(total);
+    return total;
+}}
+"""
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# `compiler.py run` arguments of every backend the check compares
+CHECK_PATHS = [
+    ["--jit"],
+    ["--jit", "-O2"],
+    ["--jit", "--no-fold"],
+    ["--backend", "vm"],
+    ["--backend", "vm", "--no-fold"],
+]
+
+
+def loop_cases(n, target=4):
+    """
+    (label, source, iterations main returns) for the timed loops. 2 * 2 == 4,
+    so with the default target the search succeeds on the third iteration.
+    """
+    return [
+        ("break (early exit)", EARLY_EXIT.format(n=n, target=target), 3),
+        ("no break (flag)", NO_EXIT.format(n=n, target=target), n),
+        ("continue (odd only)", CONTINUE.format(n=n, target=target), (n + 1) // 2),
+    ]
+
+
+def nested_expected(n, stop):
+    """
+    What NESTED prints, computed in Python: (lines, total).
+    """
+    total = 0
+    lines = []
+    i = 0
+    while i < n:
+        i += 1
+        if i % 3 == 0:
+            continue
+        j = 0
+        while True:
+            j += 1
+            if j > i % 5:
+                break
+            total += 1
+        if i > stop:
+            break
+        lines.append(total)
+    lines.append(total)
+    return lines, total
+
+
+def run_cli(source, args, timeout=60):
+    """
+    Runs a program with `compiler.py run` and returns (exit status, stdout);
+    a run that takes longer than `timeout` seconds is reported as (None, reason).
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".xd", delete=False) as f:
+        f.write(source)
+    try:
+        proc = subprocess.run([sys.executable, os.path.join(HERE, "compiler.py"), "run", *args, f.name],
+                              capture_output=True, text=True, cwd=tempfile.gettempdir(), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, f"timed out after {timeout} s"
+    finally:
+        os.unlink(f.name)
+    return proc.returncode, proc.stdout
+
+
+def check(n=1000, stop=700):
+    """
+    Runs every loop on each of CHECK_PATHS and compares the printed iteration
+    counts (and NESTED's output) and the exit status with the expected ones.
+    Raises with all mismatches if there are any; returns the number of runs.
+    """
+    cases = [(label, source, [iters], iters) for label, source, iters in loop_cases(n)]
+    lines, total = nested_expected(n, stop)
+    cases.append(("nested break/continue", NESTED.format(n=n, stop=stop), lines, total))
+
+    failures = []
+    runs = 0
+    for label, source, lines, result in cases:
+        expected = (result % 256, "".join(f"{line}\n" for line in lines))
+        for args in CHECK_PATHS:
+            actual = run_cli(source, args)
+            runs += 1
+            if actual != expected:
+                failures.append(f"{label} with {' '.join(args)}: got exit {actual[0]}, "
+                                f"output {actual[1][-60:]!r}; expected exit {expected[0]}, "
+                                f"output {expected[1][-60:]!r}")
+    if failures:
+        raise Exception("Loop check failed:\n" + "\n".join(failures))
+    return runs
+
+
+def run_source(source, opt_level=0):
+    """
+    Compiles and JIT-runs a program, returning (main's return value, seconds).
+    The program's own output is discarded.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".xd", delete=False) as f:
+        f.write(source)
+    try:
+        codegen = build_module(f.name)
+    finally:
+        os.unlink(f.name)
+    llvm_module, target_machine = lower_module(codegen.module, opt_level)
+    with silence_stdout():
+        start = time.perf_counter()
+        result = run_jit(llvm_module, target_machine)
+        seconds = time.perf_counter() - start
+    return result, seconds
+
+
+def bench(n=5_000_000):
+    print(f"iteration counts agree on {check()} runs (JIT and VM, with and without folding)")
+    for label, source, expected in loop_cases(n):
+        iters, seconds = run_source(source)
+        if iters != expected:
+            raise Exception(f"{label}: {iters} iterations, expected {expected}")
+        print(f"{label:22s} {iters:10d} iterations {seconds * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check-only"]:
+        print(f"iteration counts agree on {check()} runs (JIT and VM, with and without folding)")
+    else:
+        bench(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
@@ -0,0 +1,38 @@
+import copy
+import os
+import sys
+import time
+
+from parallel import compile_parallel
+from parser import parse_to_ast
+from program_gen import generate_program
+
+
+def bench(max_jobs, functions=32, statements=3200, opt_level=0):
+    ast = parse_to_ast(generate_program(seed=2, functions=functions, statements=statements))
+    print(f"{functions} functions, {statements} statements, -O{opt_level}, {os.cpu_count()} CPUs")
+
+    reference = None
+    baseline = None
+    jobs = 1
+    while jobs <= max_jobs:
+        start = time.perf_counter()
+        module = compile_parallel(copy.deepcopy(ast), jobs, opt_level=opt_level)
+        seconds = time.perf_counter() - start
+
+        # Sharding must not change the result; optimized shards inline only
+        # within themselves, so their IR legitimately depends on the sharding
+        ir_text = str(module)
+        if reference is None:
+            reference = ir_text
+        status = "" if ir_text == reference or opt_level > 0 else "  (IR differs from -j1)"
+
+        baseline = baseline or seconds
+        print(f"  -j{jobs:<3} {seconds:8.2f} s   speedup {baseline / seconds:5.2f}x{status}")
+        jobs *= 2
+
+
+if __name__ == "__main__":
+    max_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    opt_level = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    bench(max_jobs, opt_level=opt_level)
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from build_ast import build_ast
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs one build_ast() in a fresh interpreter and prints its wall time.
+CHILD = """
+import sys, time
+sys.path.insert(0, {here!r})
+start = time.perf_counter()
+from build_ast import build_ast
+build_ast({filename!r})
+print(time.perf_counter() - start)
+"""
+
+
+def time_fresh_process(filename, cache_dir):
+    """
+    Times import + first build_ast() in a new Python process using the given cache dir.
+    """
+    env = dict(os.environ, XDLANG_CACHE_DIR=cache_dir)
+    code = CHILD.format(here=HERE, filename=os.path.abspath(filename))
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                         capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def bench(filename, runs=5, reuse_iters=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        cold = []
+        for i in range(runs):
+            # A fresh, empty cache dir per run forces a full LALR build
+            cold.append(time_fresh_process(filename, os.path.join(tmp, f"cold{i}")))
+
+        warm_dir = os.path.join(tmp, "warm")
+        time_fresh_process(filename, warm_dir)  # populate the cache
+        warm = [time_fresh_process(filename, warm_dir) for _ in range(runs)]
+
+    build_ast(filename)  # make sure the in-process parser exists
+    start = time.perf_counter()
+    for _ in range(reuse_iters):
+        build_ast(filename)
+    reuse = (time.perf_counter() - start) / reuse_iters
+
+    print(f"cold start (no cache):    {min(cold) * 1000:8.2f} ms")
+    print(f"warm cache (new process): {min(warm) * 1000:8.2f} ms")
+    print(f"in-process reuse:         {reuse * 1000:8.3f} ms per build_ast")
+
+
+if __name__ == "__main__":
+    bench(sys.argv[1] if len(sys.argv) > 1 else os.path.join(HERE, "main.xd"))
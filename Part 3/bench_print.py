@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from llvmlite import ir
+
+from codegen import CodeGen
+from compiler import lower_module
+from emit import emit
+from parser import parse_to_ast
+from semantic_analyzer import SemanticAnalyzer
+
+PRINT_LOOP = """
+fn main(): int {{
+    let int i = 0;
+    while (i < {n}) {{
+        print(i * 7919 - 50000000);
+        mut i = i + 1;
+    }}
+    return 0;
+}}
+"""
+
+
+class PrintfCodeGen(CodeGen):
+    """
+    The previous print lowering: one variadic printf("%d\\n") call per print.
+    """
+
+    def print_int(self, val):
+        printf = self.module.globals.get("printf")
+        if printf is None:
+            printf_ty = ir.FunctionType(ir.IntType(32), [ir.PointerType(ir.IntType(8))], var_arg=True)
+            printf = ir.Function(self.module, printf_ty, name="printf")
+        fmt = self.module.globals.get("fmt")
+        if fmt is None:
+            data = bytearray(b"%d\n\0")
+            fmt = ir.GlobalVariable(self.module, ir.ArrayType(ir.IntType(8), len(data)), name="fmt")
+            fmt.global_constant = True
+            fmt.initializer = ir.Constant(fmt.type.pointee, data)
+        self.builder.call(printf, [fmt.bitcast(ir.PointerType(ir.IntType(8))), val])
+
+    def ret(self, value):
+        # printf output is flushed by libc's exit handlers
+        self.builder.ret(value)
+
+
+def build(codegen, ast, path, opt_level):
+    codegen.generate_ir(ast)
+    llvm_module, target_machine = lower_module(codegen.module, opt_level)
+    emit(llvm_module, target_machine, "exe", path)
+
+
+def time_run(path, runs):
+    best = float("inf")
+    for _ in range(runs):
+        with open(os.devnull, "wb") as devnull:
+            start = time.perf_counter()
+            subprocess.run([path], stdout=devnull, check=True)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(n=10_000_000, opt_level=2, runs=3):
+    ast = parse_to_ast(PRINT_LOOP.format(n=n))
+    SemanticAnalyzer().analyze(ast)
+    variants = [
+        ("printf per print", PrintfCodeGen()),
+        ("buffered runtime", CodeGen()),
+        ("line-buffered", CodeGen(line_buffered=True)),
+    ]
+    print(f"{n} prints to /dev/null, -O{opt_level}, best of {runs}")
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {}
+        for label, codegen in variants:
+            path = os.path.join(tmp, label.replace(" ", "_"))
+            build(codegen, ast, path, opt_level)
+            outputs[label] = subprocess.run([path], stdout=subprocess.PIPE, check=True).stdout
+            seconds = time_run(path, runs)
+            print(f"  {label:<18} {seconds * 1000:10.1f} ms")
+        assert len(set(outputs.values())) == 1, "variants printed different output"
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
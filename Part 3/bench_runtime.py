@@ -0,0 +1,177 @@
+"""
+Runtime benchmark: compiles each kernel in kernels/ under each backend and
+optimization level, runs it repeatedly and reports the median runtime, plus
+instructions retired (user space) when `perf` is available. Kernels with a C
+twin (kernels/<name>.c) are also built with clang -O2 (or cc -O2 if there is
+no clang) and the XDLANG timings are shown relative to it.
+
+    python bench_runtime.py                      # all kernels, jit+exe, -O0 and -O2
+    python bench_runtime.py -k sieve -b exe -O 0 -O 3 --runs 9 --save out.json
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_jit import silence_stdout
+from compiler import build_checked_ast, build_module, lower_module
+from emit import emit
+from jit import jit_main, load_libc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KERNEL_DIR = os.path.join(HERE, "kernels")
+
+
+def kernel_names():
+    return sorted(name[:-3] for name in os.listdir(KERNEL_DIR) if name.endswith(".xd"))
+
+
+def perf_instructions(cmd):
+    """
+    Returns user-space instructions retired by one run of cmd, or None if perf
+    is missing or the counter is not available (e.g. in a container).
+    """
+    if shutil.which("perf") is None:
+        return None
+    result = subprocess.run(["perf", "stat", "-x", ",", "-e", "instructions:u", *cmd],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    for line in result.stderr.splitlines():
+        fields = line.split(",")
+        if len(fields) > 2 and fields[2].startswith("instructions") and fields[0].isdigit():
+            return int(fields[0])
+    return None
+
+
+def time_executable(path, runs):
+    """
+    Runs an executable `runs` times; returns (median seconds, stdout, exit code, instructions).
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([path], stdout=subprocess.PIPE, text=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result.stdout, result.returncode, perf_instructions([path])
+
+
+def run_exe(kernel, opt_level, runs, tmp):
+    codegen = build_module(os.path.join(KERNEL_DIR, kernel + ".xd"))
+    llvm_module, target_machine = lower_module(codegen.module, opt_level)
+    exe = os.path.join(tmp, f"{kernel}_O{opt_level}")
+    emit(llvm_module, target_machine, "exe", exe)
+    seconds, stdout, exit_code, instructions = time_executable(exe, runs)
+    return {"seconds": seconds, "exit_code": exit_code, "stdout": stdout, "instructions": instructions}
+
+
+def run_jit(kernel, opt_level, runs, tmp):
+    """
+    Times main() only: MCJIT compiles once, then main is called `runs` times.
+    Output is discarded, so only the exit code is checked.
+    """
+    codegen = build_module(os.path.join(KERNEL_DIR, kernel + ".xd"))
+    llvm_module, target_machine = lower_module(codegen.module, opt_level)
+    engine, main = jit_main(llvm_module, target_machine)
+    libc = load_libc()
+    times = []
+    with silence_stdout():
+        for _ in range(runs):
+            start = time.perf_counter()
+            exit_code = main() & 0xFF
+            libc.fflush(None)
+            times.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(times), "exit_code": exit_code, "stdout": None, "instructions": None}
+
+
+def run_vm(kernel, opt_level, runs, tmp):
+    """
+    Times the bytecode VM; opt_level does not apply. Slow: opt in with -b vm.
+    """
+    from vm import BytecodeCompiler, execute
+
+    ast, _ = build_checked_ast(os.path.join(KERNEL_DIR, kernel + ".xd"))
+    main = BytecodeCompiler().compile_program(ast)["main"]
+    times = []
+    for _ in range(runs):
+        out = io.StringIO()
+        start = time.perf_counter()
+        exit_code = execute(main, out) & 0xFF
+        times.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(times), "exit_code": exit_code, "stdout": out.getvalue(),
+            "instructions": None}
+
+
+# Backend name -> runner(kernel, opt_level, runs, tmp) returning a result dict
+BACKENDS = {"jit": run_jit, "exe": run_exe, "vm": run_vm}
+
+
+def c_compiler():
+    for name in ("clang", "cc", "gcc"):
+        if shutil.which(name):
+            return name
+    return None
+
+
+def run_c(kernel, runs, tmp):
+    source = os.path.join(KERNEL_DIR, kernel + ".c")
+    compiler = c_compiler()
+    if compiler is None or not os.path.exists(source):
+        return None
+    exe = os.path.join(tmp, kernel + "_c")
+    # -fwrapv: XDLANG integers wrap, so signed overflow must not be UB in C either
+    subprocess.run([compiler, "-O2", "-fwrapv", "-o", exe, source], check=True)
+    seconds, stdout, exit_code, instructions = time_executable(exe, runs)
+    return {"compiler": compiler, "seconds": seconds, "exit_code": exit_code, "stdout": stdout,
+            "instructions": instructions}
+
+
+def main():
+    args = argparse.ArgumentParser(description="Runtime benchmark of compiled XDLANG kernels.")
+    args.add_argument("-k", "--kernel", action="append", choices=kernel_names(), help="Kernel (repeatable).")
+    args.add_argument("-b", "--backend", action="append", choices=list(BACKENDS), help="Backend (repeatable).")
+    args.add_argument("-O", "--opt-level", action="append", type=int, choices=(0, 1, 2, 3),
+                      help="Optimization level (repeatable).")
+    args.add_argument("--runs", type=int, default=5)
+    args.add_argument("--save", help="Write results as JSON to this path.")
+    opts = args.parse_args()
+
+    kernels = opts.kernel or kernel_names()
+    backends = opts.backend or ["jit", "exe"]
+    opt_levels = opts.opt_level or [0, 2]
+    results = []
+
+    print(f"{'kernel':<12} {'backend':<8} {'-O':>3} {'median ms':>10} {'instructions':>14} {'vs C':>7}  check")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kernel in kernels:
+            c = run_c(kernel, opts.runs, tmp)
+            if c is not None:
+                results.append({"kernel": kernel, "backend": "c", "opt_level": 2, **c})
+                instructions = c["instructions"] if c["instructions"] is not None else "n/a"
+                print(f"{kernel:<12} {c['compiler']:<8} {2:>3} {c['seconds'] * 1000:>10.2f} "
+                      f"{instructions:>14} {'1.00x':>7}")
+            for backend in backends:
+                for opt_level in opt_levels:
+                    r = BACKENDS[backend](kernel, opt_level, opts.runs, tmp)
+                    results.append({"kernel": kernel, "backend": backend, "opt_level": opt_level, **r})
+                    check = "-"
+                    if c is not None:
+                        same = r["exit_code"] == c["exit_code"] and r["stdout"] in (None, c["stdout"])
+                        check = "ok" if same else "MISMATCH"
+                    ratio = f"{r['seconds'] / c['seconds']:.2f}x" if c is not None else "n/a"
+                    instructions = r["instructions"] if r["instructions"] is not None else "n/a"
+                    print(f"{kernel:<12} {backend:<8} {opt_level:>3} {r['seconds'] * 1000:>10.2f} "
+                          f"{instructions:>14} {ratio:>7}  {check}")
+
+    if opts.save:
+        with open(opts.save, "w") as f:
+            json.dump({"runs": opts.runs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
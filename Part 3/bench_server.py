@@ -0,0 +1,97 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from server import Client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(label, latencies, wall):
+    print(f"{label:24s} n={len(latencies):5d}  p50 {percentile(latencies, 50) * 1000:8.2f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:8.2f} ms  "
+          f"mean {statistics.mean(latencies) * 1000:8.2f} ms  {len(latencies) / wall:8.1f} req/s")
+
+
+def load(worker, requests, concurrency):
+    """
+    Runs worker(i) for i in range(requests) on `concurrency` threads.
+    Returns (latencies, wall seconds).
+    """
+    latencies = []
+    lock = threading.Lock()
+    next_index = iter(range(requests))
+
+    def loop():
+        state = {}
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            worker(i, state)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+        if "client" in state:
+            state["client"].close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=loop) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def bench(source_file, requests=200, concurrency=4, cli_requests=20):
+    with open(source_file) as f:
+        source = f.read()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "xdlang.sock")
+        server = subprocess.Popen([sys.executable, os.path.join(HERE, "compiler.py"), "serve",
+                                   "--socket", socket_path, "--workers", str(concurrency)],
+                                  stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.05)
+
+            for action in ("compile", "run"):
+                def worker(i, state, action=action):
+                    if "client" not in state:
+                        state["client"] = Client(socket_path)
+                    # Vary the source so the per-worker result cache does not answer
+                    varied = source + f"\nfn unused{i}(): int {{ return {i}; }}\n"
+                    response = state["client"].request(action=action, source=varied)
+                    assert response["ok"], response
+
+                load(worker, concurrency * 2, concurrency)  # warm up the workers
+                latencies, wall = load(worker, requests, concurrency)
+                report(f"server {action}", latencies, wall)
+        finally:
+            server.terminate()
+            server.wait()
+
+    def cli_worker(i, state):
+        subprocess.run([sys.executable, os.path.join(HERE, "compiler.py"), "run", "--jit", source_file],
+                       stdout=subprocess.DEVNULL, cwd=HERE)
+
+    latencies, wall = load(cli_worker, cli_requests, concurrency)
+    report("per-process CLI run", latencies, wall)
+
+
+if __name__ == "__main__":
+    bench(sys.argv[1] if len(sys.argv) > 1 else os.path.join(HERE, "main.xd"))
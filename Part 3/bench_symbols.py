@@ -0,0 +1,60 @@
+"""
+Symbol resolution benchmark on single functions of growing size.
+
+For each size it reports the function's declarations (parameters and
+`let`s), the slots they were resolved to (sibling blocks reuse slots, so
+there are fewer), the peak memory of the symbol table, and the time of
+semantic analysis and of the two code generators, which index by slot.
+
+    python bench_symbols.py            # 1250, 5000 and 20000 statements
+    python bench_symbols.py 80000
+"""
+
+import sys
+import time
+
+from codegen import CodeGen
+from hand_parser import parse
+from program_gen import generate_program
+from semantic_analyzer import SemanticAnalyzer
+from vm import BytecodeCompiler
+
+
+def count_declarations(func):
+    count = len(func["params"])
+    stack = list(func["body"])
+    while stack:
+        stmt = stack.pop()
+        if stmt["type"] == "let":
+            count += 1
+        elif stmt["type"] == "if":
+            stack.extend(stmt["then"])
+            stack.extend(stmt.get("else", []))
+        elif stmt["type"] == "while":
+            stack.extend(stmt["body"])
+    return count
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench(max_statements):
+    print(f"{'statements':>10} {'decls':>7} {'slots':>6} {'peak KiB':>9} {'B/slot':>7} "
+          f"{'semantic ms':>12} {'codegen ms':>11} {'vm ms':>8}")
+    for statements in (max_statements // 16, max_statements // 4, max_statements):
+        ast = parse(generate_program(seed=3, functions=1, statements=statements, max_nesting=3))
+        func = ast["functions"][0]
+        analyzer = SemanticAnalyzer()
+        _, semantic = timed(analyzer.analyze, ast)
+        _, codegen = timed(CodeGen().generate_ir, ast)
+        _, vm_compile = timed(BytecodeCompiler().compile_program, ast)
+        _, slots, peak = analyzer.symbol_stats[0]
+        print(f"{statements:>10} {count_declarations(func):>7} {slots:>6} {peak / 1024:>9.1f} "
+              f"{peak / slots:>7.0f} {semantic * 1000:>12.1f} {codegen * 1000:>11.1f} {vm_compile * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
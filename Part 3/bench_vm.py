@@ -0,0 +1,156 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_jit import silence_stdout
+from compiler import lower_module
+from codegen import CodeGen
+from jit import jit_main, load_libc
+from parser import parse_to_ast
+from semantic_analyzer import SemanticAnalyzer
+from vm import BytecodeCompiler, execute
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HELLO = """
+fn main(): int {
+    print(42);
+    return 0;
+}
+"""
+
+# Sums (i * j) % 7 over an n x 100 grid, touching arithmetic, compares and jumps
+LOOP = """
+fn main(): int {{
+    let int sum = 0;
+    let int i = 0;
+    while (i < {n}) {{
+        let int j = 0;
+        while (j < 100) {{
+            mut sum = sum + (i * j) % 7;
+            mut j = j + 1;
+        }}
+        mut i = i + 1;
+    }}
+    print(sum);
+    return sum % 256;
+}}
+"""
+
+# Literals outside the i32 range wrap, as i32 constants do in the native backends
+LITERALS = """
+fn main(): int {
+    print(3000000000);
+    let int x = 2147483648;
+    print(x);
+    print(-2147483648);
+    print(4294967297 + 1);
+    print(x - 1);
+    return 3000000000 % 256;
+}
+"""
+
+# (label, extra `compiler.py run` arguments)
+CLI_PATHS = [
+    ("vm", ["--backend", "vm"]),
+    ("llvm jit", ["--jit"]),
+    ("llvm exe", []),
+]
+
+
+def time_to_first_output(args, source_file, runs):
+    """
+    Best time from starting `compiler.py run` to the first byte on its stdout.
+    """
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(HERE, "compiler.py"), "run", *args, source_file],
+                                stdout=subprocess.PIPE, cwd=tempfile.gettempdir())
+        proc.stdout.read(1)
+        best = min(best, time.perf_counter() - start)
+        proc.stdout.read()
+        proc.wait()
+    return best
+
+
+def check_backends_agree(source_file):
+    """
+    Asserts that the VM and the native JIT print the same output and exit
+    with the same status, with and without folding.
+    """
+    for fold in ("--fold", "--no-fold"):
+        results = []
+        for args in (["--backend", "vm"], ["--jit"]):
+            proc = subprocess.run([sys.executable, os.path.join(HERE, "compiler.py"), "run", *args, fold,
+                                   source_file], capture_output=True, text=True, cwd=tempfile.gettempdir())
+            results.append((proc.returncode, proc.stdout))
+        assert results[0] == results[1], f"VM and native results differ ({fold}): {results}"
+
+
+def analyzed(source):
+    ast = parse_to_ast(source)
+    SemanticAnalyzer().analyze(ast)
+    return ast
+
+
+def throughput(n, runs):
+    """
+    Returns {label: best seconds} for running LOOP in-process, excluding compile time.
+    """
+    ast = analyzed(LOOP.format(n=n))
+    times = {}
+
+    main = BytecodeCompiler().compile_program(ast)["main"]
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        vm_result = execute(main, io.StringIO())
+        best = min(best, time.perf_counter() - start)
+    times["vm"] = best
+
+    for opt_level in (0, 2):
+        codegen = CodeGen()
+        codegen.generate_ir(ast)
+        llvm_module, target_machine = lower_module(codegen.module, opt_level)
+        engine, native_main = jit_main(llvm_module, target_machine)
+        best = float("inf")
+        with silence_stdout():
+            for _ in range(runs):
+                start = time.perf_counter()
+                native_result = native_main()
+                load_libc().fflush(None)
+                best = min(best, time.perf_counter() - start)
+        assert native_result == vm_result, "VM and native results differ"
+        times[f"llvm jit -O{opt_level}"] = best
+    return times
+
+
+def bench(n=2000, runs=5):
+    with tempfile.NamedTemporaryFile("w", suffix=".xd", delete=False) as f:
+        f.write(LITERALS)
+    try:
+        check_backends_agree(f.name)
+    finally:
+        os.unlink(f.name)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".xd", delete=False) as f:
+        f.write(HELLO)
+    try:
+        print("time to first output (hello world, fresh process):")
+        for label, args in CLI_PATHS:
+            print(f"  {label:<14} {time_to_first_output(args, f.name, runs) * 1000:8.1f} ms")
+    finally:
+        os.unlink(f.name)
+
+    iterations = n * 100
+    print(f"steady state ({iterations} inner iterations, in-process, compile time excluded):")
+    for label, seconds in throughput(n, runs).items():
+        print(f"  {label:<14} {seconds * 1000:8.1f} ms   {iterations / seconds / 1e6:8.2f} M iterations/s")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -1,17 +1,36 @@
-from parser import parse_code
-from ast_builder import ASTBuilder
 import sys
 
-def build_ast(filename):
+# lark: the LALR parser from parser.py; hand: hand_parser.py, which does not import Lark;
+# nodes: the LALR parser building the compact Node AST of ast_nodes.py
+FRONTENDS = ("lark", "hand", "nodes")
+
+def build_ast(filename, fused=True, frontend="lark"):
     """
-    Reads .xd file, parses it into a parse tree,
-    then transforms into an AST using ASTBuilder.
+    Reads .xd file and builds its AST.
+    By default ASTBuilder runs inside the LALR parse (no parse tree is built);
+    with fused=False the file is parsed into a parse tree first and then
+    transformed into an AST using ASTBuilder. frontend="hand" uses the
+    hand-written parser instead, which builds the same AST; frontend="nodes"
+    returns an ast_nodes.Program (the fused parse with NodeBuilder).
     """
     with open(filename) as f:
         code = f.read()
+    # Front ends are imported on first use, so the hand-written one never loads Lark
+    if frontend == "hand":
+        from hand_parser import parse_to_ast as hand_parse_to_ast
+        return hand_parse_to_ast(code)
+    if frontend == "nodes":
+        from parser import parse_to_nodes
+        return parse_to_nodes(code)
+    if frontend != "lark":
+        raise ValueError(f"Unknown frontend: {frontend}")
+    from parser import parse_code, parse_to_ast
+    if fused:
+        return parse_to_ast(code)
     tree = parse_code(code)
     if tree is None:
         return None
+    from ast_builder import ASTBuilder
     ast = ASTBuilder().transform(tree)
     return ast
 
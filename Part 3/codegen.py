@@ -1,174 +1,598 @@
 from llvmlite import ir
 
+import trampoline
+from node_timing import NodeTimer
+from runtime import add_output_runtime
+
+# Binary operator -> IRBuilder method
+ARITH_OPS = {
+    "add": "add",
+    "sub": "sub",
+    "mul": "mul",
+    "div": "sdiv",
+    "mod": "srem",
+}
+
+# Comparison operator -> icmp_signed predicate
+CMP_OPS = {
+    "eq": "==",
+    "ne": "!=",
+    "lt": "<",
+    "le": "<=",
+    "gt": ">",
+    "ge": ">=",
+}
+
+
+# Requests a handler yields to CodeGen.run: compile a node as an i32 value,
+# as an i1, as a branch (COND, expr, true_bb, false_bb), a statement or a block
+VALUE, BOOL, COND, STMT, BLOCK = range(5)
+
+
+def has_self_tail_call(stmts, fn_name):
+    """
+    True if any `return` in the statements returns a call to fn_name.
+    """
+    stack = list(stmts)
+    while stack:
+        stmt = stack.pop()
+        stype = stmt["type"]
+        if stype == "return":
+            value = stmt["value"]
+            if isinstance(value, dict) and value["type"] == "call" and value["name"] == fn_name:
+                return True
+        elif stype == "if":
+            stack.extend(stmt["then"])
+            stack.extend(stmt.get("else", []))
+        elif stype == "while":
+            stack.extend(stmt["body"])
+    return False
+
+
+class UseTrackingBuilder(ir.IRBuilder):
+    """
+    IRBuilder that passes every instruction it inserts to `on_insert`, so
+    CodeGen can record which instructions use each phi.
+    """
+
+    def __init__(self, block, on_insert):
+        super().__init__(block)
+        self.on_insert = on_insert
+
+    def _insert(self, instr):
+        super()._insert(instr)
+        self.on_insert(instr)
+
+
 class CodeGen:
-    def __init__(self):
+    """
+    Lowers the dictionary AST to LLVM IR.
+
+    Local variables never touch memory: the generator builds SSA form directly
+    while it walks the AST, following Braun et al., "Simple and Efficient
+    Construction of Static Single Assignment Form" (CC 2013).
+    Variables are identified by the slots SemanticAnalyzer resolved, so the
+    AST must be analyzed first; SSA state is kept in lists indexed by slot.
+    Each block records the current definition of every variable assigned in it;
+    a read looks the name up in the current block and, failing that, in its
+    predecessors, inserting phi nodes at join points. Blocks whose predecessors
+    are not all known yet (loop headers) get placeholder phis that are completed
+    when the block is sealed. As soon as a phi's operands are complete it is
+    removed if they are all the same value; the instructions using each phi
+    are recorded, so a removal only revisits the phis that used it.
+
+    Statements and expressions are dispatched through tables keyed by node type.
+    Handlers with operands or nested blocks are generators: instead of calling
+    back into the code generator they yield a request such as
+    `(VALUE, expr["left"])` and are resumed with its result. `run`
+    (trampoline.py) keeps the suspended handlers on an explicit stack, so
+    arbitrarily deep expressions and nested blocks compile in linear time
+    without Python recursion; variable lookups walk the CFG with explicit
+    worklists too.
+    With profile=True every handler is timed and `timer.report()` shows where
+    code generation time goes.
+
+    Every function is declared before any body is compiled, so calls may go
+    forward. A function that returns a call to itself gets a loop header after
+    its entry block: such a call rebinds the parameters and branches back to
+    it, so self recursion in tail position runs in constant stack. Other calls
+    whose result is returned directly are marked `tail`.
+
+    `print` goes through the buffered output runtime (runtime.py), which main
+    flushes before returning. With line_buffered=True every print is flushed
+    immediately, for interactive use.
+    """
+
+    def __init__(self, profile=False, line_buffered=False):
         self.module = ir.Module(name="xdlang_module")
         self.builder = None
-        self.printf = None
-        self.string_constants = {}
-        self.local_vars = {}
+        self.line_buffered = line_buffered
+        self.runtime = None       # (print_int, flush)
+        self.in_main = False
+        self.functions = {}       # fn_name -> ir.Function
+        self.params = []          # parameter slots of the current function
+        self.fn_name = None
+        self.tail_header = None   # loop header for self tail calls, if any
+        # SSA construction state, reset per function
+        self.current_def = []     # slot -> {block: value}
+        self.slot_names = []      # slot -> name of its latest declaration, for phi names
+        self.preds = {}           # block -> [predecessor blocks], as variable lookups see them
+        self.sealed = set()       # blocks whose predecessors are all known
+        self.incomplete_phis = {} # block -> {slot: phi}
+        self.phis = []            # every phi created in the current function
+        self.phi_users = {}       # id(phi) -> {id(instr): instr} using it, for phis still in place
+        self.replaced = {}        # id(removed phi) -> value it was replaced with
+        self.loop_targets = []    # (continue_bb, break_bb) per enclosing while
+
+        self.stmt_handlers = {
+            "let": self.compile_assign,
+            "mut": self.compile_assign,
+            "print": self.compile_print,
+            "if": self.compile_if,
+            "while": self.compile_while,
+            "break": self.compile_break,
+            "continue": self.compile_continue,
+            "return": self.compile_return,
+            "expr": self.compile_expr_stmt,
+        }
+        self.expr_handlers = {
+            "variable": self.compile_variable,
+            "neg": self.compile_neg,
+            "call": self.compile_call,
+        }
+        self.expr_handlers.update(dict.fromkeys(ARITH_OPS, self.compile_arith))
+        self.expr_handlers.update(dict.fromkeys(("and", "or", "not", *CMP_OPS), self.compile_truth_value))
+        # Expressions that produce an i1 natively
+        self.bool_handlers = {"and": self.compile_logical, "or": self.compile_logical, "not": self.compile_not}
+        self.bool_handlers.update(dict.fromkeys(CMP_OPS, self.compile_compare))
+
+        self.timer = None
+        if profile:
+            self.timer = NodeTimer()
+            self.stmt_handlers = self.timer.wrap_table(self.stmt_handlers)
+            self.expr_handlers = self.timer.wrap_table(self.expr_handlers)
+            self.bool_handlers = {kind: self.timer.wrap(f"{kind}.i1", handler)
+                                  for kind, handler in self.bool_handlers.items()}
 
-    def generate_ir(self, ast):
+    def generate_ir(self, ast, signatures=None):
+        """
+        `signatures` maps the name of every function to declare to its
+        parameter count, in declaration order. It defaults to the program's
+        own functions; a module holding part of a program also passes the
+        functions it calls in other modules.
+        """
         if ast["type"] != "program":
             raise Exception("Expected 'program' node.")
+        # Defined up front, so separately compiled modules lay out the same
+        # as a whole-program one once their linkonce copies are merged
+        self.runtime = add_output_runtime(self.module)
+        if signatures is None:
+            signatures = {func["name"]: len(func["params"]) for func in ast["functions"]}
+        for fn_name, arity in signatures.items():
+            fn_type = ir.FunctionType(ir.IntType(32), [ir.IntType(32)] * arity)
+            self.functions[fn_name] = ir.Function(self.module, fn_type, name=fn_name)
         for func in ast["functions"]:
             self.compile_function(func)
 
     def compile_function(self, func):
-        fn_return_type = ir.IntType(32)
-        fn_type = ir.FunctionType(fn_return_type, [])
-        llvm_func = ir.Function(self.module, fn_type, name=func["name"])
+        llvm_func = self.functions[func["name"]]
+        self.fn_name = func["name"]
+        self.params = [param["slot"] for param in func["params"]]
 
         block = llvm_func.append_basic_block(name="entry")
-        self.builder = ir.IRBuilder(block)
+        self.builder = UseTrackingBuilder(block, self.record_uses)
+
+        # main flushes the output buffer on the way out, even if it does not
+        # print itself: other modules linked with it may have
+        self.in_main = func["name"] == "main"
+
+        # Clear SSA state
+        self.current_def = [{} for _ in range(func["slots"])]
+        self.slot_names = [None] * func["slots"]
+        self.preds = {block: []}
+        self.sealed = {block}
+        self.incomplete_phis = {}
+        self.phis = []
+        self.phi_users = {}
+        self.replaced = {}
+        self.loop_targets = []
 
-        # Declare printf if not done
-        if not self.printf:
-            self.declare_printf()
+        for param, arg in zip(func["params"], llvm_func.args):
+            arg.name = self.slot_names[param["slot"]] = param["name"]
+            self.write_variable(param["slot"], block, arg)
 
-        # Clear local vars
-        self.local_vars = {}
+        # Self tail calls branch back here; it is sealed once they are all known
+        self.tail_header = None
+        if has_self_tail_call(func["body"], self.fn_name):
+            self.tail_header = llvm_func.append_basic_block("tailrecurse")
+            self.branch(self.tail_header)
+            self.builder.position_at_start(self.tail_header)
 
-        for stmt in func["body"]:
-            self.compile_stmt(stmt)
+        self.run((BLOCK, func["body"]))
 
         # If no return encountered, return 0 by default
-        if not block.is_terminated:
-            self.builder.ret(ir.Constant(ir.IntType(32), 0))
+        if not self.builder.block.is_terminated:
+            self.ret(ir.Constant(ir.IntType(32), 0))
 
-    def declare_printf(self):
-        printf_ty = ir.FunctionType(ir.IntType(32), [ir.PointerType(ir.IntType(8))], var_arg=True)
-        self.printf = ir.Function(self.module, printf_ty, name="printf")
+        if self.tail_header is not None:
+            self.seal_block(self.tail_header)
 
-    def compile_stmt(self, stmt):
-        stype = stmt["type"]
-        if stype == "let":
-            var_name = stmt["name"]
-            var_ptr = self.builder.alloca(ir.IntType(32), name=var_name)
-            val = self.compile_expr(stmt["value"])
-            self.builder.store(val, var_ptr)
-            self.local_vars[var_name] = var_ptr
-        elif stype == "mut":
-            var_name = stmt["name"]
-            var_ptr = self.local_vars[var_name]
-            val = self.compile_expr(stmt["value"])
-            self.builder.store(val, var_ptr)
-        elif stype == "print":
-            val = self.compile_expr(stmt["value"])
-            self.print_int(val)
-        elif stype == "if":
-            self.compile_if(stmt)
-        elif stype == "while":
-            self.compile_while(stmt)
-        elif stype == "break":
-            # Minimal approach: we won't implement break in codegen yet
-            pass
-        elif stype == "continue":
-            # Minimal approach: not implementing yet
-            pass
-        elif stype == "return":
-            ret_val = self.compile_expr(stmt["value"])
-            self.builder.ret(ret_val)
-        else:
-            raise Exception(f"Unhandled stmt type: {stype}")
+    def ret(self, value):
+        if self.in_main:
+            self.builder.call(self.runtime[1], [])
+        self.builder.ret(value)
+
+    # ------------------ SSA construction ------------------
+    def write_variable(self, slot, block, value):
+        self.current_def[slot][block] = value
+
+    def read_variable(self, slot, block):
+        val = self.current_def[slot].get(block)
+        if val is None:
+            pending = []
+            val = self.lookup_variable(slot, block, pending)
+            self.complete_phis(slot, pending)
+        return self.resolve(val)
+
+    def resolve(self, val):
+        """
+        Follows the replacements of removed phis. Definitions recorded for
+        blocks may still name a phi removed since.
+        """
+        replaced = self.replaced
+        while id(val) in replaced:
+            val = replaced[id(val)]
+        return val
+
+    def lookup_variable(self, slot, block, pending):
+        """
+        Finds the definition of the variable in `slot` reaching `block`, following chains of
+        single predecessors in a loop. Where the chain ends at a join point a
+        phi is created and returned at once; its operands are left to
+        complete_phis through `pending`, which breaks cycles and recursion alike.
+        """
+        defs = self.current_def[slot]
+        passed = []
+        while block not in defs:
+            preds = self.preds.get(block, [])
+            if block not in self.sealed:
+                # Not all predecessors known yet: operands are added in seal_block
+                val = self.new_phi(block, slot)
+                self.incomplete_phis.setdefault(block, {})[slot] = val
+            elif not preds:
+                # Unreachable code, e.g. after an if whose branches both return
+                val = ir.Constant(ir.IntType(32), ir.Undefined)
+            elif len(preds) == 1:
+                passed.append(block)
+                block = preds[0]
+                continue
+            else:
+                val = self.new_phi(block, slot)
+                pending.append((val, block))
+            defs[block] = val
+            break
+        val = defs[block]
+        for block in passed:
+            defs[block] = val
+        return val
+
+    def new_phi(self, block, slot):
+        phi_builder = ir.IRBuilder(block)
+        phi_builder.position_at_start(block)
+        phi = phi_builder.phi(ir.IntType(32), name=self.slot_names[slot])
+        self.phis.append(phi)
+        self.phi_users[id(phi)] = {}
+        if self.builder.block is block:
+            # Codegen only appends, so keep the main builder after the new phi
+            self.builder.position_at_end(block)
+        return phi
+
+    def record_uses(self, instr):
+        phi_users = self.phi_users
+        for op in instr.operands:
+            users = phi_users.get(id(op))
+            if users is not None:
+                users[id(instr)] = instr
+
+    def complete_phis(self, slot, pending):
+        """
+        Adds the operands of each (phi, block) in `pending`, one per
+        predecessor, then tries to remove the phi; lookups may append
+        further phis to the list.
+        """
+        phi_users = self.phi_users
+        while pending:
+            phi, block = pending.pop()
+            for pred in self.preds[block]:
+                val = self.resolve(self.lookup_variable(slot, pred, pending))
+                phi.add_incoming(val, pred)
+                users = phi_users.get(id(val))
+                if users is not None:
+                    users[id(phi)] = phi
+            self.try_remove_trivial_phi(phi)
+
+    def try_remove_trivial_phi(self, phi):
+        """
+        Removes `phi` if its operands are all the same value (or the phi
+        itself), replacing its uses with that value. Phis that used it may
+        become trivial in turn; they are revisited from a worklist.
+        """
+        phi_users, replaced = self.phi_users, self.replaced
+        work = [phi]
+        while work:
+            phi = work.pop()
+            if id(phi) not in phi_users:
+                continue  # already removed
+            same = None
+            for val, _ in phi.incomings:
+                if val is phi or val is same:
+                    continue
+                if same is not None:
+                    break
+                same = val
+            else:
+                if same is None:
+                    same = ir.Constant(ir.IntType(32), ir.Undefined)
+                replaced[id(phi)] = same
+                users = phi_users.pop(id(phi))
+                block = phi.parent
+                block.instructions.remove(phi)
+                if self.builder.block is block:
+                    # The builder's position counted the removed phi
+                    self.builder.position_at_end(block)
+                same_users = phi_users.get(id(same))
+                for key, user in users.items():
+                    if key in replaced:
+                        continue  # a phi removed already
+                    user.replace_usage(phi, same)
+                    if same_users is not None:
+                        same_users[key] = user
+                    if key in phi_users:
+                        work.append(user)
+
+    def seal_block(self, block):
+        for slot, phi in self.incomplete_phis.pop(block, {}).items():
+            self.complete_phis(slot, [(phi, block)])
+        self.sealed.add(block)
+
+    def share_definitions(self, block, source):
+        """
+        Makes variable lookups in `block` go straight to `source`, for a block
+        only reached through branches of an expression that began in `source`.
+        Expressions assign no variables, so every definition reaching `block`
+        is the one reaching `source`, and a phi there would be trivial. The
+        LLVM branches themselves are unchanged.
+        """
+        self.preds[block] = [source]
+
+    def branch(self, target):
+        self.preds.setdefault(target, []).append(self.builder.block)
+        self.builder.branch(target)
+
+    def cbranch(self, cond, true_bb, false_bb):
+        self.preds.setdefault(true_bb, []).append(self.builder.block)
+        self.preds.setdefault(false_bb, []).append(self.builder.block)
+        self.builder.cbranch(cond, true_bb, false_bb)
+
+    # ------------------ Driver ------------------
+    def run(self, request):
+        """
+        Compiles a request (see VALUE, BOOL, ...) and returns its result.
+        """
+        return trampoline.run(self.start, request)
+
+    def start(self, request):
+        """
+        Dispatches a request to its handler; constants finish immediately.
+        """
+        kind, node = request[0], request[1]
+        if kind == VALUE:
+            # If it's an integer literal
+            if isinstance(node, int):
+                return ir.Constant(ir.IntType(32), node)
+            if not isinstance(node, dict):
+                raise Exception(f"Unknown expr: {node}")
+            handler = self.expr_handlers.get(node["type"])
+            if handler is None:
+                raise Exception(f"Unhandled expr type: {node['type']}")
+            return handler(node)
+        if kind == BOOL:
+            if isinstance(node, int):
+                return ir.Constant(ir.IntType(1), node != 0)
+            return self.bool_handlers.get(node["type"], self.compile_nonzero)(node)
+        if kind == COND:
+            return self.compile_cond(node, request[2], request[3])
+        if kind == STMT:
+            handler = self.stmt_handlers.get(node["type"])
+            if handler is None:
+                raise Exception(f"Unhandled stmt type: {node['type']}")
+            return handler(node)
+        return self.compile_block(node)
 
     def compile_expr(self, expr):
-        # If it's an integer literal
-        if isinstance(expr, int):
-            return ir.Constant(ir.IntType(32), expr)
-        if not isinstance(expr, dict):
-            raise Exception(f"Unknown expr: {expr}")
+        return self.run((VALUE, expr))
 
-        etype = expr["type"]
-        if etype == "variable":
-            var_ptr = self.local_vars[expr["name"]]
-            return self.builder.load(var_ptr)
-        elif etype in ("add","sub","mul","div","mod"):
-            left = self.compile_expr(expr["left"])
-            right = self.compile_expr(expr["right"])
-            if etype == "add":
-                return self.builder.add(left, right)
-            elif etype == "sub":
-                return self.builder.sub(left, right)
-            elif etype == "mul":
-                return self.builder.mul(left, right)
-            elif etype == "div":
-                return self.builder.sdiv(left, right)
-            elif etype == "mod":
-                return self.builder.srem(left, right)
-        elif etype in ("eq","ne","lt","le","gt","ge"):
-            left = self.compile_expr(expr["left"])
-            right = self.compile_expr(expr["right"])
-            if etype == "eq":
-                cmp_val = self.builder.icmp_signed("==", left, right)
-            elif etype == "ne":
-                cmp_val = self.builder.icmp_signed("!=", left, right)
-            elif etype == "lt":
-                cmp_val = self.builder.icmp_signed("<", left, right)
-            elif etype == "le":
-                cmp_val = self.builder.icmp_signed("<=", left, right)
-            elif etype == "gt":
-                cmp_val = self.builder.icmp_signed(">", left, right)
-            elif etype == "ge":
-                cmp_val = self.builder.icmp_signed(">=", left, right)
-            # Convert i1 -> i32 (0 or 1)
-            return self.builder.zext(cmp_val, ir.IntType(32))
-        elif etype == "and":
-            left = self.compile_expr(expr["left"])
-            right = self.compile_expr(expr["right"])
-            # minimal approach: nonzero => true
-            left_bool = self.builder.icmp_signed("!=", left, ir.Constant(left.type, 0))
-            right_bool = self.builder.icmp_signed("!=", right, ir.Constant(right.type, 0))
-            and_val = self.builder.and_(left_bool, right_bool)
-            return self.builder.zext(and_val, ir.IntType(32))
-        elif etype == "or":
-            left = self.compile_expr(expr["left"])
-            right = self.compile_expr(expr["right"])
-            left_bool = self.builder.icmp_signed("!=", left, ir.Constant(left.type, 0))
-            right_bool = self.builder.icmp_signed("!=", right, ir.Constant(right.type, 0))
-            or_val = self.builder.or_(left_bool, right_bool)
-            return self.builder.zext(or_val, ir.IntType(32))
-        elif etype == "neg":
-            val = self.compile_expr(expr["value"])
-            return self.builder.neg(val)
-        elif etype == "not":
-            val = self.compile_expr(expr["value"])
-            val_bool = self.builder.icmp_signed("!=", val, ir.Constant(val.type, 0))
-            # flip bit
-            not_val = self.builder.xor(val_bool, ir.Constant(val_bool.type, True))
-            return self.builder.zext(not_val, ir.IntType(32))
+    def compile_bool(self, expr):
+        """
+        Compiles an expression to an i1 truth value (nonzero => true).
+        Comparisons, 'not' and logical operators produce i1 directly, without
+        an i32 round trip.
+        """
+        return self.run((BOOL, expr))
+
+    # ------------------ Statements ------------------
+    def compile_block(self, stmts):
+        for stmt in stmts:
+            if self.builder.block.is_terminated:
+                # Unreachable statements after return/break/continue
+                break
+            yield STMT, stmt
+
+    def compile_assign(self, stmt):
+        # let and mut both just define a new SSA value for the slot
+        val = yield VALUE, stmt["value"]
+        if stmt["type"] == "let":
+            self.slot_names[stmt["slot"]] = stmt["name"]
+        self.write_variable(stmt["slot"], self.builder.block, val)
+
+    def compile_print(self, stmt):
+        val = yield VALUE, stmt["value"]
+        self.print_int(val)
+
+    def compile_break(self, stmt):
+        self.branch(self.loop_targets[-1][1])
+
+    def compile_continue(self, stmt):
+        self.branch(self.loop_targets[-1][0])
+
+    def compile_return(self, stmt):
+        value = stmt["value"]
+        if isinstance(value, dict) and value["type"] == "call":
+            if value["name"] == self.fn_name:
+                yield from self.compile_self_tail_call(value)
+                return
+            ret_val = yield from self.compile_call(value, tail=True)
         else:
-            raise Exception(f"Unhandled expr type: {etype}")
+            ret_val = yield VALUE, value
+        self.ret(ret_val)
 
-    def compile_if(self, stmt):
-        cond_val = self.compile_expr(stmt["condition"])
+    def compile_self_tail_call(self, expr):
+        # Every argument is evaluated before any parameter is rebound
+        args = []
+        for arg in expr["args"]:
+            args.append((yield VALUE, arg))
+        for param, val in zip(self.params, args):
+            self.write_variable(param, self.builder.block, val)
+        self.branch(self.tail_header)
+
+    def compile_expr_stmt(self, stmt):
+        yield VALUE, stmt["value"]
+
+    # ------------------ Expressions ------------------
+    def compile_variable(self, expr):
+        return self.read_variable(expr["slot"], self.builder.block)
+
+    def compile_call(self, expr, tail=False):
+        callee = self.functions.get(expr["name"])
+        if callee is None:
+            raise Exception(f"Undeclared function: {expr['name']}")
+        args = []
+        for arg in expr["args"]:
+            args.append((yield VALUE, arg))
+        return self.builder.call(callee, args, tail=tail)
+
+    def compile_arith(self, expr):
+        left = yield VALUE, expr["left"]
+        right = yield VALUE, expr["right"]
+        return getattr(self.builder, ARITH_OPS[expr["type"]])(left, right)
+
+    def compile_neg(self, expr):
+        val = yield VALUE, expr["value"]
+        return self.builder.neg(val)
+
+    def compile_truth_value(self, expr):
+        # Truth values are i1; widen to i32 (0 or 1) only when used as a value.
+        # Every type routed here has an i1 handler, run in place by `yield from`
+        val = yield from self.bool_handlers[expr["type"]](expr)
+        return self.builder.zext(val, ir.IntType(32))
+
+    def compile_nonzero(self, expr):
+        val = yield VALUE, expr
         # convert i32 -> i1
-        cond_bool = self.builder.icmp_signed("!=", cond_val, ir.Constant(cond_val.type, 0))
+        return self.builder.icmp_signed("!=", val, ir.Constant(val.type, 0))
+
+    def compile_compare(self, expr):
+        left = yield VALUE, expr["left"]
+        right = yield VALUE, expr["right"]
+        return self.builder.icmp_signed(CMP_OPS[expr["type"]], left, right)
+
+    def compile_not(self, expr):
+        # flip bit
+        val = yield BOOL, expr["value"]
+        return self.builder.not_(val)
+
+    def compile_cond(self, expr, true_bb, false_bb):
+        """
+        Compiles an expression in branch position: control goes to true_bb if it is
+        nonzero and to false_bb otherwise. Logical operators branch straight to the
+        targets instead of materializing a value, so the right operand is only
+        evaluated when it decides the outcome.
+        """
+        etype = expr["type"] if isinstance(expr, dict) else None
+        if etype in ("and", "or"):
+            rhs_bb = self.builder.append_basic_block(f"{etype}.rhs")
+            if etype == "and":
+                yield COND, expr["left"], rhs_bb, false_bb
+            else:
+                yield COND, expr["left"], true_bb, rhs_bb
+            self.seal_block(rhs_bb)
+            self.builder.position_at_start(rhs_bb)
+            yield COND, expr["right"], true_bb, false_bb
+        elif etype == "not":
+            yield COND, expr["value"], false_bb, true_bb
+        else:
+            cond = yield BOOL, expr
+            self.cbranch(cond, true_bb, false_bb)
 
+    def compile_logical(self, expr):
+        """
+        Compiles `and`/`or` as an i1 value: the right operand is evaluated in its own
+        block only when the left one does not decide the result, and a phi merges
+        the outcomes.
+        """
+        etype = expr["type"]
+        left_bool = yield BOOL, expr["left"]
+        left_bb = self.builder.block
+
+        rhs_bb = self.builder.append_basic_block(f"{etype}.rhs")
+        merge_bb = self.builder.append_basic_block(f"{etype}.end")
+        if etype == "and":
+            self.cbranch(left_bool, rhs_bb, merge_bb)
+        else:
+            self.cbranch(left_bool, merge_bb, rhs_bb)
+
+        self.seal_block(rhs_bb)
+        self.builder.position_at_start(rhs_bb)
+        right_bool = yield BOOL, expr["right"]
+        right_bb = self.builder.block
+        self.branch(merge_bb)
+
+        self.share_definitions(merge_bb, left_bb)
+        self.seal_block(merge_bb)
+        self.builder.position_at_start(merge_bb)
+        result = self.builder.phi(ir.IntType(1))
+        # Short-circuited: 'and' is false, 'or' is true
+        result.add_incoming(ir.Constant(ir.IntType(1), etype == "or"), left_bb)
+        result.add_incoming(right_bool, right_bb)
+        return result
+
+    def compile_if(self, stmt):
         then_bb = self.builder.append_basic_block("then")
         else_bb = self.builder.append_basic_block("else") if "else" in stmt else None
         merge_bb = self.builder.append_basic_block("merge")
 
+        cond_start = self.builder.block
+        yield COND, stmt["condition"], then_bb, else_bb or merge_bb
+        self.share_definitions(then_bb, cond_start)
         if else_bb:
-            self.builder.cbranch(cond_bool, then_bb, else_bb)
-        else:
-            self.builder.cbranch(cond_bool, then_bb, merge_bb)
+            self.share_definitions(else_bb, cond_start)
 
         # then block
+        self.seal_block(then_bb)
         self.builder.position_at_start(then_bb)
-        for s in stmt["then"]:
-            self.compile_stmt(s)
+        yield BLOCK, stmt["then"]
         if not self.builder.block.is_terminated:
-            self.builder.branch(merge_bb)
+            self.branch(merge_bb)
 
         # else block
         if else_bb:
+            self.seal_block(else_bb)
             self.builder.position_at_start(else_bb)
-            for s in stmt["else"]:
-                self.compile_stmt(s)
+            yield BLOCK, stmt["else"]
             if not self.builder.block.is_terminated:
-                self.builder.branch(merge_bb)
+                self.branch(merge_bb)
 
+        self.seal_block(merge_bb)
         self.builder.position_at_start(merge_bb)
 
     def compile_while(self, stmt):
@@ -176,38 +600,28 @@ class CodeGen:
         body_bb = self.builder.append_basic_block("while.body")
         end_bb  = self.builder.append_basic_block("while.end")
 
-        # jump to cond
-        self.builder.branch(cond_bb)
+        # jump to cond; cond stays unsealed until the back edge is known
+        self.branch(cond_bb)
         self.builder.position_at_start(cond_bb)
 
-        cond_val = self.compile_expr(stmt["condition"])
-        cond_bool = self.builder.icmp_signed("!=", cond_val, ir.Constant(cond_val.type, 0))
-        self.builder.cbranch(cond_bool, body_bb, end_bb)
+        yield COND, stmt["condition"], body_bb, end_bb
+        self.share_definitions(body_bb, cond_bb)
 
         # body
+        self.seal_block(body_bb)
         self.builder.position_at_start(body_bb)
-        for s in stmt["body"]:
-            self.compile_stmt(s)
+        self.loop_targets.append((cond_bb, end_bb))
+        yield BLOCK, stmt["body"]
+        self.loop_targets.pop()
         if not self.builder.block.is_terminated:
-            self.builder.branch(cond_bb)
+            self.branch(cond_bb)
 
+        self.seal_block(cond_bb)
+        self.seal_block(end_bb)
         self.builder.position_at_start(end_bb)
 
     def print_int(self, val):
-        # create or reuse "%d\n"
-        fmt_str = "%d\n"
-        c_str = self.get_string_constant(fmt_str)
-        self.builder.call(self.printf, [c_str, val])
-
-    def get_string_constant(self, text):
-        if text in self.string_constants:
-            return self.string_constants[text]
-        byte_arr = bytearray(text.encode("utf8")) + b"\0"
-        const_str = ir.Constant(ir.ArrayType(ir.IntType(8), len(byte_arr)), byte_arr)
-        global_var = ir.GlobalVariable(self.module, const_str.type, name=f"str_{len(self.string_constants)}")
-        global_var.linkage = "internal"
-        global_var.global_constant = True
-        global_var.initializer = const_str
-        ptr = self.builder.bitcast(global_var, ir.PointerType(ir.IntType(8)))
-        self.string_constants[text] = ptr
-        return ptr
+        print_int, flush = self.runtime
+        self.builder.call(print_int, [val])
+        if self.line_buffered:
+            self.builder.call(flush, [])
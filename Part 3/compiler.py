@@ -2,47 +2,468 @@ import typer
 import subprocess
 import os
 
-from build_ast import build_ast
-from semantic_analyzer import SemanticAnalyzer
-from codegen import CodeGen
+from build_ast import FRONTENDS, build_ast
+from semantic_analyzer import NodeAnalyzer, SemanticAnalyzer
+from ast_optimizer import ASTOptimizer, count_nodes
+from ast_nodes import Node, count_nodes as count_compact_nodes
+from emit import EMIT_SUFFIXES, default_output, emit as emit_module, link_executable
+from phases import NULL_PROFILER, PhaseProfiler, ir_counts
 
+# llvmlite is imported where it is needed, so `run --backend vm` starts
+# without loading LLVM
 app = typer.Typer()
 
-@app.command()
-def compile_file(filename: str):
+
+def parse_phase(filename: str, phases=NULL_PROFILER, frontend: str = "lark"):
     """
-    This is a subcommand named 'compile-file'.
-    Usage: python compiler.py compile-file main.xd
+    Builds the AST of a .xd file as the "parse" phase (the AST is built inside
+    the parse, so there is no separate AST phase). Returns None on failure.
     """
-    # 1. Build AST
-    ast = build_ast(filename)
+    with phases.phase("parse", ast_nodes=lambda: ast_size(ast) if ast else 0):
+        ast = build_ast(filename, frontend=frontend)
     if not ast:
         print("AST build failed. Exiting.")
-        return
+    return ast
+
+
+def ast_size(ast):
+    return count_compact_nodes(ast) if isinstance(ast, Node) else count_nodes(ast)
+
+
+def dict_ast(ast):
+    # The incremental and parallel pipelines analyze the dictionary AST function by function
+    return ast.to_dict() if isinstance(ast, Node) else ast
+
+
+def report_analysis(analyzer, symbol_stats: bool = False):
+    """
+    Prints the analyzer's shadowing warnings (and with symbol_stats, symbol
+    table sizes) on stderr.
+    """
+    for warning in analyzer.warnings:
+        typer.echo(warning, err=True)
+    if symbol_stats:
+        typer.echo(analyzer.symbol_report(), err=True)
+
+
+def build_checked_ast(filename: str, fold: bool = True, fold_stats: bool = False, profile_nodes: bool = False,
+                      phases=NULL_PROFILER, frontend: str = "lark", symbol_stats: bool = False):
+    """
+    Runs the front end, semantic analysis and (with fold) the AST optimizer on
+    a .xd file. Returns (ast, analyzer), or (None, None) if the AST could not be built.
+    Shadowing warnings (and with symbol_stats, symbol table sizes) go to stderr.
+    """
+    # 1. Build AST
+    ast = parse_phase(filename, phases, frontend)
+    if not ast:
+        return None, None
 
     # 2. Semantic Analysis
+    analyzer = (NodeAnalyzer if isinstance(ast, Node) else SemanticAnalyzer)(profile=profile_nodes)
+    with phases.phase("semantic"):
+        analyzer.analyze(ast)
+    report_analysis(analyzer, symbol_stats)
+    if isinstance(ast, Node):
+        # --frontend nodes: the compact AST is analyzed as is, later passes take dicts
+        with phases.phase("to_dict"):
+            ast = ast.to_dict()
+
+    # 3. Constant folding and dead-branch elimination
+    if fold:
+        ast_optimizer = ASTOptimizer()
+        with phases.phase("fold", ast_nodes=lambda: count_nodes(ast)):
+            ast_optimizer.optimize(ast)
+        if fold_stats:
+            typer.echo(f"AST optimizer removed {ast_optimizer.removed_nodes} nodes", err=True)
+    return ast, analyzer
+
+
+def build_module(filename: str, fold: bool = True, fold_stats: bool = False, profile_nodes: bool = False,
+                 phases=NULL_PROFILER, line_buffered: bool = False, frontend: str = "lark",
+                 symbol_stats: bool = False):
+    """
+    Runs the front end, AST optimizer and code generator on a .xd file.
+    Returns the CodeGen instance, or None if the AST could not be built.
+    With profile_nodes, per-node-kind timings of analysis and codegen go to stderr.
+    Each step is recorded as a phase of `phases` (see phases.PhaseProfiler).
+    """
+    from codegen import CodeGen
+
+    ast, analyzer = build_checked_ast(filename, fold, fold_stats, profile_nodes, phases, frontend, symbol_stats)
+    if ast is None:
+        return None
+
+    # 4. Code Generation
+    codegen = CodeGen(profile=profile_nodes, line_buffered=line_buffered)
+    with phases.phase("codegen", **{"ir_instructions,basic_blocks": lambda: ir_counts(codegen.module)}):
+        codegen.generate_ir(ast)
+
+    if profile_nodes:
+        typer.echo(analyzer.timer.report("semantic"), err=True)
+        typer.echo(codegen.timer.report("codegen"), err=True)
+    return codegen
+
+
+def build_incremental(filename: str, fold: bool = True, cache_stats: bool = False, phases=NULL_PROFILER,
+                      line_buffered: bool = False, frontend: str = "lark", symbol_stats: bool = False):
+    """
+    Like build_module, but compiles function by function through the
+    incremental FunctionCache. Returns a linked llvmlite.binding.ModuleRef,
+    or None if the AST could not be built. Semantic analysis, folding and
+    codegen are recorded as one "codegen" phase.
+    """
+    from incremental import FunctionCache, compile_incremental
+
+    ast = parse_phase(filename, phases, frontend)
+    if not ast:
+        return None
+    ast = dict_ast(ast)
+
+    cache = FunctionCache()
+    analyzer = SemanticAnalyzer()
+    with phases.phase("codegen", **{"ir_instructions,basic_blocks": lambda: ir_counts(module)}):
+        module = compile_incremental(ast, cache, fold, line_buffered, analyzer)
+    report_analysis(analyzer, symbol_stats)
+    if cache_stats:
+        typer.echo(f"function cache: {cache.stats()}", err=True)
+    return module
+
+
+def build_parallel(filename: str, fold: bool = True, jobs: int = 1, phases=NULL_PROFILER,
+                   line_buffered: bool = False, frontend: str = "lark", symbol_stats: bool = False,
+                   opt_level: int = 0, inline_threshold=None, loop_vectorize: bool = False,
+                   link_objects: bool = False):
+    """
+    Like build_module, but shards the functions across `jobs` worker processes,
+    which also run the -O pipeline on their shard. Returns a linked
+    llvmlite.binding.ModuleRef, or with link_objects a list of the shards'
+    object files, or None if the AST could not be built.
+    The workers' time shows up as child CPU time of the "codegen" phase.
+    """
+    from parallel import compile_parallel, compile_parallel_objects
+
+    ast = parse_phase(filename, phases, frontend)
+    if not ast:
+        return None
+    ast = dict_ast(ast)
     analyzer = SemanticAnalyzer()
-    analyzer.analyze(ast)
+    options = dict(line_buffered=line_buffered, analyzer=analyzer, inline_threshold=inline_threshold,
+                   loop_vectorize=loop_vectorize)
+    if link_objects:
+        with phases.phase("codegen"):
+            result = compile_parallel_objects(ast, jobs, fold, opt_level, **options)
+    else:
+        with phases.phase("codegen", **{"ir_instructions,basic_blocks": lambda: ir_counts(result)}):
+            result = compile_parallel(ast, jobs, fold, opt_level, **options)
+    report_analysis(analyzer, symbol_stats)
+    return result
+
+
+def is_sharded(incremental: bool, jobs: int, link_objects: bool = False):
+    """
+    True if build_any takes the parallel pipeline, whose workers optimize.
+    """
+    return not incremental and (jobs > 1 or link_objects)
 
-    # 3. Code Generation
-    codegen = CodeGen()
-    codegen.generate_ir(ast)
-    ll_str = str(codegen.module)
 
-    # 4. Write IR to file
-    with open("output.ll", "w") as f:
-        f.write(ll_str)
+def build_any(filename, fold, fold_stats, profile_nodes, incremental, cache_stats, jobs=1, phases=NULL_PROFILER,
+              line_buffered=False, frontend="lark", symbol_stats=False, opt_level=0, inline_threshold=None,
+              loop_vectorize=False, link_objects=False):
+    """
+    Returns the module for a .xd file from the whole-program, incremental or
+    parallel pipeline, or None if the AST could not be built. Only the
+    parallel pipeline (see is_sharded) uses the optimization options; it
+    returns an optimized module, or object files with link_objects.
+    """
+    if incremental:
+        return build_incremental(filename, fold, cache_stats, phases, line_buffered, frontend, symbol_stats)
+    if is_sharded(incremental, jobs, link_objects):
+        return build_parallel(filename, fold, jobs, phases, line_buffered, frontend, symbol_stats, opt_level,
+                              inline_threshold, loop_vectorize, link_objects)
+    codegen = build_module(filename, fold, fold_stats, profile_nodes, phases, line_buffered, frontend,
+                           symbol_stats)
+    return codegen.module if codegen is not None else None
+
+
+def lower_module(module, opt_level: int = 0, inline_threshold=None, loop_vectorize: bool = False,
+                 emit_optimized_ir=None, phases=NULL_PROFILER, optimized: bool = False):
+    """
+    Parses and verifies the module (an llvmlite.ir.Module such as codegen.module,
+    or an already parsed ModuleRef) with llvmlite.binding and runs the
+    optimization pipeline over it, unless it was `optimized` already (by the
+    parallel pipeline's workers). Every output (JIT, object, textual IR)
+    starts from the module returned here.
+    Returns (llvm_module, target_machine).
+    """
+    from optimizer import optimize
+    from target import host_target_machine, parse_module
 
-    # 5. Compile with clang
-    subprocess.run([
-        "clang",
-        "-isysroot", subprocess.check_output(["xcrun", "--sdk", "macosx", "--show-sdk-path"]).decode().strip(),
-        "-o", "output",
-        "output.ll"
-    ])
+    with phases.phase("lower"):
+        target_machine = host_target_machine(opt_level)
+        llvm_module = parse_module(module, target_machine)
+    if not optimized:
+        with phases.phase("optimize", **{"ir_instructions,basic_blocks": lambda: ir_counts(llvm_module)}):
+            optimize(llvm_module, target_machine, opt_level, inline_threshold, loop_vectorize)
+
+    if emit_optimized_ir:
+        with open(emit_optimized_ir, "w") as f:
+            f.write(str(llvm_module))
+    return llvm_module, target_machine
+
+
+OPT_LEVEL_HELP = "LLVM optimization level (0-3)."
+INLINE_HELP = "Inliner cost threshold (overrides the -O level default)."
+VECTORIZE_HELP = "Enable the loop and SLP vectorizers."
+EMIT_OPT_HELP = "Also write the optimized IR to this path."
+FOLD_HELP = "Fold constants and remove dead branches on the AST before codegen."
+FOLD_STATS_HELP = "Report how many AST nodes the AST optimizer removed (on stderr)."
+PROFILE_NODES_HELP = "Report per-node-kind time in semantic analysis and codegen (on stderr)."
+INCREMENTAL_HELP = "Reuse cached IR for functions whose AST has not changed."
+CACHE_STATS_HELP = "Report function cache hits, misses and evictions (on stderr)."
+JOBS_HELP = "Generate and optimize code for functions in this many worker processes."
+LINK_OBJECTS_HELP = "Have each --jobs worker emit an object file and link those (--emit exe only)."
+EMIT_HELP = "Output kind: ll (textual IR), bc (bitcode), obj (object file) or exe (linked executable)."
+OUTPUT_HELP = "Output path (default: output plus the suffix for --emit)."
+TIME_PHASES_HELP = "Report wall/CPU time, RSS growth, allocations and AST/IR sizes per phase (on stderr)."
+PHASE_JSON_HELP = "Write the per-phase report as JSON to this path (implies phase timing)."
+BACKEND_HELP = "llvm: native code (see --jit); vm: interpret register bytecode, no LLVM or toolchain needed."
+LINE_BUFFERED_HELP = "Flush program output after every print instead of when the buffer fills or main returns."
+SYMBOL_STATS_HELP = "Report slots and peak symbol table memory of the largest functions (on stderr)."
+FRONTEND_HELP = ("lark: the LALR grammar in parser.py; hand: the hand-written lexer and parser (same AST, no Lark "
+                 "import); nodes: the LALR grammar building the compact slotted AST of ast_nodes.py.")
+
+
+def phase_profiler(time_phases: bool, phase_json):
+    return PhaseProfiler() if time_phases or phase_json else NULL_PROFILER
+
+
+def report_phases(phases, time_phases: bool, phase_json):
+    if not phases.enabled:
+        return
+    phases.stop()
+    if time_phases:
+        typer.echo(phases.report(), err=True)
+    if phase_json:
+        with open(phase_json, "w") as f:
+            f.write(phases.to_json())
+
+
+def run_on_vm(filename, fold, fold_stats, profile_nodes, phases, line_buffered, time_phases, phase_json,
+              frontend="lark", symbol_stats=False):
+    """
+    Runs a program on the bytecode VM and returns main()'s result as an exit code.
+    """
+    from vm import BytecodeCompiler, VMError, execute
+
+    ast, analyzer = build_checked_ast(filename, fold, fold_stats, profile_nodes, phases, frontend, symbol_stats)
+    if ast is None:
+        return 1
+    if profile_nodes:
+        typer.echo(analyzer.timer.report("semantic"), err=True)
+    with phases.phase("bytecode"):
+        functions = BytecodeCompiler().compile_program(ast)
+    try:
+        with phases.phase("run"):
+            exit_code = execute(functions["main"], line_buffered=line_buffered)
+    except VMError as e:
+        typer.echo(f"Runtime error: {e}", err=True)
+        exit_code = 1
+    report_phases(phases, time_phases, phase_json)
+    return exit_code
+
+
+def check_frontend(frontend: str):
+    if frontend not in FRONTENDS:
+        raise typer.BadParameter(f"--frontend must be one of: {', '.join(FRONTENDS)}")
+
+
+# LLVM-only `run` options and their defaults; the VM backend rejects anything else
+VM_UNSUPPORTED = {
+    "--jit": ("jit", False),
+    "--opt-level": ("opt_level", 0),
+    "--inline-threshold": ("inline_threshold", None),
+    "--loop-vectorize": ("loop_vectorize", False),
+    "--emit-optimized-ir": ("emit_optimized_ir", None),
+    "--incremental": ("incremental", False),
+    "--cache-stats": ("cache_stats", False),
+    "--jobs": ("jobs", 1),
+}
+
+
+def check_vm_options(**options):
+    used = [flag for flag, (name, default) in VM_UNSUPPORTED.items() if options[name] != default]
+    if used:
+        raise typer.BadParameter(f"{', '.join(used)} cannot be used with --backend vm")
+
+
+def check_emit(emit: str):
+    if emit not in EMIT_SUFFIXES:
+        raise typer.BadParameter(f"--emit must be one of: {', '.join(EMIT_SUFFIXES)}")
+
+
+def check_link_objects(link_objects: bool, emit: str, incremental: bool, emit_optimized_ir):
+    # With per-worker objects there is never a whole-program module
+    if link_objects and (emit != "exe" or incremental or emit_optimized_ir):
+        raise typer.BadParameter("--link-objects needs --emit exe and cannot be used with "
+                                 "--incremental or --emit-optimized-ir")
+
+
+@app.command()
+def compile_file(
+    filename: str,
+    opt_level: int = typer.Option(0, "--opt-level", "-O", min=0, max=3, help=OPT_LEVEL_HELP),
+    inline_threshold: int = typer.Option(None, "--inline-threshold", help=INLINE_HELP),
+    loop_vectorize: bool = typer.Option(False, "--loop-vectorize", help=VECTORIZE_HELP),
+    emit_optimized_ir: str = typer.Option(None, "--emit-optimized-ir", help=EMIT_OPT_HELP),
+    fold: bool = typer.Option(True, "--fold/--no-fold", help=FOLD_HELP),
+    fold_stats: bool = typer.Option(False, "--fold-stats", help=FOLD_STATS_HELP),
+    profile_nodes: bool = typer.Option(False, "--profile-nodes", help=PROFILE_NODES_HELP),
+    incremental: bool = typer.Option(False, "--incremental", help=INCREMENTAL_HELP),
+    cache_stats: bool = typer.Option(False, "--cache-stats", help=CACHE_STATS_HELP),
+    jobs: int = typer.Option(1, "--jobs", "-j", min=1, help=JOBS_HELP),
+    link_objects: bool = typer.Option(False, "--link-objects", help=LINK_OBJECTS_HELP),
+    emit: str = typer.Option("exe", "--emit", help=EMIT_HELP),
+    output: str = typer.Option(None, "--output", "-o", help=OUTPUT_HELP),
+    time_phases: bool = typer.Option(False, "--time-phases", help=TIME_PHASES_HELP),
+    phase_json: str = typer.Option(None, "--phase-json", help=PHASE_JSON_HELP),
+    line_buffered: bool = typer.Option(False, "--line-buffered", help=LINE_BUFFERED_HELP),
+    frontend: str = typer.Option("lark", "--frontend", help=FRONTEND_HELP),
+    symbol_stats: bool = typer.Option(False, "--symbol-stats", help=SYMBOL_STATS_HELP),
+):
+    """
+    This is a subcommand named 'compile-file'.
+    Usage: python compiler.py compile-file main.xd
+    """
+    check_emit(emit)
+    check_frontend(frontend)
+    check_link_objects(link_objects, emit, incremental, emit_optimized_ir)
+    phases = phase_profiler(time_phases, phase_json)
+    module = build_any(filename, fold, fold_stats, profile_nodes, incremental, cache_stats, jobs, phases,
+                       line_buffered, frontend, symbol_stats, opt_level, inline_threshold, loop_vectorize,
+                       link_objects)
+    if module is None:
+        return
+    output = output or default_output(emit)
+    if link_objects:
+        # 5. The workers emitted optimized objects; link them once
+        with phases.phase("emit"):
+            link_executable(module, output)
+    else:
+        llvm_module, target_machine = lower_module(module, opt_level, inline_threshold, loop_vectorize,
+                                                   emit_optimized_ir, phases,
+                                                   optimized=is_sharded(incremental, jobs))
+
+        # 5. Emit the requested artifact in-process (linking once for exe)
+        with phases.phase("emit"):
+            emit_module(llvm_module, target_machine, emit, output)
 
     # 6. Run the executable
-    subprocess.run(["./output"])
+    if emit == "exe":
+        with phases.phase("run"):
+            subprocess.run([os.path.abspath(output)])
+    report_phases(phases, time_phases, phase_json)
+
+
+@app.command()
+def run(
+    filename: str,
+    jit: bool = typer.Option(False, "--jit", help="Run in-process with MCJIT instead of linking an executable."),
+    backend: str = typer.Option("llvm", "--backend", help=BACKEND_HELP),
+    opt_level: int = typer.Option(0, "--opt-level", "-O", min=0, max=3, help=OPT_LEVEL_HELP),
+    inline_threshold: int = typer.Option(None, "--inline-threshold", help=INLINE_HELP),
+    loop_vectorize: bool = typer.Option(False, "--loop-vectorize", help=VECTORIZE_HELP),
+    emit_optimized_ir: str = typer.Option(None, "--emit-optimized-ir", help=EMIT_OPT_HELP),
+    fold: bool = typer.Option(True, "--fold/--no-fold", help=FOLD_HELP),
+    fold_stats: bool = typer.Option(False, "--fold-stats", help=FOLD_STATS_HELP),
+    profile_nodes: bool = typer.Option(False, "--profile-nodes", help=PROFILE_NODES_HELP),
+    incremental: bool = typer.Option(False, "--incremental", help=INCREMENTAL_HELP),
+    cache_stats: bool = typer.Option(False, "--cache-stats", help=CACHE_STATS_HELP),
+    jobs: int = typer.Option(1, "--jobs", "-j", min=1, help=JOBS_HELP),
+    time_phases: bool = typer.Option(False, "--time-phases", help=TIME_PHASES_HELP),
+    phase_json: str = typer.Option(None, "--phase-json", help=PHASE_JSON_HELP),
+    line_buffered: bool = typer.Option(False, "--line-buffered", help=LINE_BUFFERED_HELP),
+    frontend: str = typer.Option("lark", "--frontend", help=FRONTEND_HELP),
+    symbol_stats: bool = typer.Option(False, "--symbol-stats", help=SYMBOL_STATS_HELP),
+):
+    """
+    Compiles and runs a program, exiting with main()'s return value.
+    Usage: python compiler.py run --jit main.xd
+    """
+    check_frontend(frontend)
+    phases = phase_profiler(time_phases, phase_json)
+    if backend == "vm":
+        check_vm_options(jit=jit, opt_level=opt_level, inline_threshold=inline_threshold,
+                         loop_vectorize=loop_vectorize, emit_optimized_ir=emit_optimized_ir,
+                         incremental=incremental, cache_stats=cache_stats, jobs=jobs)
+        raise typer.Exit(code=run_on_vm(filename, fold, fold_stats, profile_nodes, phases, line_buffered,
+                                        time_phases, phase_json, frontend, symbol_stats))
+    if backend != "llvm":
+        raise typer.BadParameter("--backend must be llvm or vm")
+    module = build_any(filename, fold, fold_stats, profile_nodes, incremental, cache_stats, jobs, phases,
+                       line_buffered, frontend, symbol_stats, opt_level, inline_threshold, loop_vectorize)
+    if module is None:
+        raise typer.Exit(code=1)
+    llvm_module, target_machine = lower_module(module, opt_level, inline_threshold, loop_vectorize,
+                                               emit_optimized_ir, phases, optimized=is_sharded(incremental, jobs))
+
+    if jit:
+        from jit import run_jit
+        with phases.phase("run"):
+            exit_code = run_jit(llvm_module, target_machine)
+    else:
+        with phases.phase("emit"):
+            emit_module(llvm_module, target_machine, "exe", "output")
+        with phases.phase("run"):
+            exit_code = subprocess.run([os.path.abspath("output")]).returncode
+    report_phases(phases, time_phases, phase_json)
+    raise typer.Exit(code=exit_code)
+
+
+@app.command()
+def compile_batch(
+    inputs: str = typer.Argument(..., help="Directory of .xd files, or a manifest listing one path per line."),
+    out_dir: str = typer.Option("build", "--out-dir", "-o", help="Where artifacts and summary.json are written."),
+    jobs: int = typer.Option(os.cpu_count() or 1, "--jobs", "-j", min=1, help="Worker processes."),
+    opt_level: int = typer.Option(0, "--opt-level", "-O", min=0, max=3, help=OPT_LEVEL_HELP),
+    emit: str = typer.Option("ll", "--emit", help="Artifact kind: ll, bc or obj."),
+    fold: bool = typer.Option(True, "--fold/--no-fold", help=FOLD_HELP),
+):
+    """
+    Compiles many .xd files with one warm parser and target machine per worker.
+    Usage: python compiler.py compile-batch tests/ --out-dir build -j 8
+    """
+    from batch import BATCH_EMIT_KINDS, collect_inputs, compile_batch as run_batch
+
+    if emit not in BATCH_EMIT_KINDS:
+        raise typer.BadParameter(f"--emit must be one of: {', '.join(BATCH_EMIT_KINDS)}")
+    root, files = collect_inputs(inputs)
+    summary = run_batch(files, root, out_dir, jobs, opt_level, emit, fold)
+    for record in summary["results"]:
+        if not record["ok"]:
+            typer.echo(f"FAILED {record['file']}: {record['error']}", err=True)
+    typer.echo(f"{summary['succeeded']}/{summary['files']} files compiled in "
+               f"{summary['wall_seconds']:.2f} s; summary in {os.path.join(out_dir, 'summary.json')}")
+    if summary["failed"]:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def serve(
+    socket_path: str = typer.Option("/tmp/xdlang.sock", "--socket", help="Unix socket to listen on."),
+    workers: int = typer.Option(os.cpu_count() or 1, "--workers", "-j", min=1, help="Max concurrent compiles."),
+):
+    """
+    Runs a compile server with warm parser and target machine (see server.py for the protocol).
+    Usage: python compiler.py serve --socket /tmp/xdlang.sock
+    """
+    from server import serve as run_server
+
+    typer.echo(f"Listening on {socket_path} with {workers} workers", err=True)
+    try:
+        run_server(socket_path, workers)
+    except KeyboardInterrupt:
+        pass
+
 
 if __name__ == "__main__":
     app()
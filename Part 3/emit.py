@@ -0,0 +1,68 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+# Output kind -> default file suffix
+EMIT_SUFFIXES = {"ll": ".ll", "bc": ".bc", "obj": ".o", "exe": ""}
+
+# Tried in order when XDLANG_LINKER is not set; each drives the system linker
+# with the C runtime and libc, which the output runtime (write) needs.
+LINKER_CANDIDATES = ("cc", "clang", "gcc")
+
+
+def find_linker():
+    """
+    Returns the compiler driver used to link executables: $XDLANG_LINKER if set,
+    else the first of cc, clang, gcc found on PATH.
+    """
+    linker = os.environ.get("XDLANG_LINKER")
+    if linker:
+        return linker
+    for candidate in LINKER_CANDIDATES:
+        path = shutil.which(candidate)
+        if path:
+            return path
+    raise Exception(f"No linker found (tried {', '.join(LINKER_CANDIDATES)}); set XDLANG_LINKER.")
+
+
+def default_output(kind, base="output"):
+    return base + EMIT_SUFFIXES[kind]
+
+
+def link_executable(obj, output):
+    """
+    Links an in-memory object file, or a list of them, into an executable
+    with one linker invocation.
+    """
+    objects = obj if isinstance(obj, list) else [obj]
+    with tempfile.TemporaryDirectory() as tmp:
+        obj_paths = []
+        for i, data in enumerate(objects):
+            obj_paths.append(os.path.join(tmp, f"module{i}.o"))
+            with open(obj_paths[-1], "wb") as f:
+                f.write(data)
+        result = subprocess.run([find_linker(), "-o", output, *obj_paths], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Linking failed:\n{result.stderr}")
+
+
+def emit(llvm_module, target_machine, kind, output):
+    """
+    Writes a parsed, verified module as textual IR (ll), bitcode (bc), an object
+    file (obj) or a linked executable (exe). Bitcode and objects are produced
+    in memory by llvmlite and written straight to disk.
+    """
+    if kind == "ll":
+        with open(output, "w") as f:
+            f.write(str(llvm_module))
+    elif kind == "bc":
+        with open(output, "wb") as f:
+            f.write(llvm_module.as_bitcode())
+    elif kind == "obj":
+        with open(output, "wb") as f:
+            f.write(target_machine.emit_object(llvm_module))
+    elif kind == "exe":
+        link_executable(target_machine.emit_object(llvm_module), output)
+    else:
+        raise Exception(f"Unknown output kind: {kind} (expected one of {', '.join(EMIT_SUFFIXES)})")
@@ -0,0 +1,410 @@
+"""
+Hand-written front end for xdlang_grammar_part3.lark: a regex scanner and an
+operator-precedence parser that build the same dictionary AST as ASTBuilder,
+without importing Lark.
+
+Lark lexes contextually: in each parser state only the terminals that state
+accepts are tried. This parser reproduces that, so both front ends accept the
+same programs and fail at the same positions:
+- A keyword is a keyword only where the grammar allows it; elsewhere it is a
+  name (`let int if = 1;`, `fn(1);` as a statement after `;` or `{`). After a
+  block's `}` the LALR state also accepts `fn` and `else`, so there they are
+  keywords (and an error unless `else` follows an if).
+- Where no name is allowed, a keyword matches as a prefix of a longer word:
+  `let integer = 1;` declares `eger`, `x orange` is `x or ange`, and the
+  first function may be written `fnmain(): int`.
+- `==` where only `=` is allowed, or `!=` where an operand starts, is read as
+  `=` or `!` followed by an unexpected `=`.
+
+Expressions and nested blocks are parsed with explicit stacks, so nesting
+depth is not limited by Python's recursion limit.
+"""
+
+import re
+
+NAME, NUMBER, END = "NAME", "NUMBER", "$END"
+
+# Optional whitespace, then a name, a number (Lark's common.NUMBER, which also
+# matches floats) or punctuation. No group matches at the end of input or at a
+# character that starts no token.
+TOKEN = re.compile(r"""
+    [ \t\f\r\n]*
+    (?:
+        ([_A-Za-z][_A-Za-z0-9]*)
+      | ([0-9]+[eE][+-]?[0-9]+|(?:[0-9]+\.(?:[0-9]+)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[0-9]+)
+      | (==|!=|<=|>=|[-+*/%<>=!(){},;:])
+    )?
+""", re.VERBOSE)
+
+STATEMENT_KEYWORDS = {"return", "let", "mut", "print", "if", "while", "break", "continue"}
+
+# Binary operator -> (precedence, AST type); all are left-associative
+BINARY_OPS = {
+    "or": (1, "or"),
+    "and": (2, "and"),
+    "==": (3, "eq"), "!=": (3, "ne"), "<": (3, "lt"), "<=": (3, "le"), ">": (3, "gt"), ">=": (3, "ge"),
+    "+": (4, "add"), "-": (4, "sub"),
+    "*": (5, "mul"), "/": (5, "div"), "%": (5, "mod"),
+}
+
+# Markers on the operator stack besides binary operators (tuples) and calls (lists)
+PAREN = "("
+PREFIX_OPS = {"-": "neg", "!": "not", "!=": "not"}
+
+
+class ParseError(Exception):
+    """
+    A syntax error at `line`/`column` (1-based) and offset `pos_in_stream`,
+    the position Lark reports for the same input.
+    """
+
+    def __init__(self, message, code, pos):
+        self.pos_in_stream = pos
+        self.line = code.count("\n", 0, pos) + 1
+        self.column = pos - code.rfind("\n", 0, pos)
+        super().__init__(f"{message} at line {self.line}, column {self.column}.")
+
+    def get_context(self, text, span=40):
+        """
+        Returns the source line around the error with a caret under it,
+        formatted like lark.UnexpectedInput.get_context.
+        """
+        pos = self.pos_in_stream
+        before = text[max(pos - span, 0):pos].rsplit("\n", 1)[-1]
+        after = text[pos:pos + span].split("\n", 1)[0]
+        return before + after + "\n" + " " * len(before.expandtabs()) + "^\n"
+
+
+def tokenize(code):
+    """
+    Yields (kind, text, offset) for every token, kind being NAME, NUMBER or
+    the punctuation itself, then (END, "", len(code)). Keywords come out as
+    NAME: whether a word is a keyword depends on where it appears.
+    """
+    match = TOKEN.match
+    pos = 0
+    while True:
+        m = match(code, pos)
+        group = m.lastindex
+        if group is None:
+            if m.end() == len(code):
+                yield END, "", m.end()
+                return
+            raise ParseError(f"No token matches {code[m.end()]!r}", code, m.end())
+        pos = m.end()
+        text = m.group(group)
+        yield (NAME if group == 1 else NUMBER if group == 2 else text), text, m.start(group)
+
+
+class Parser:
+    """
+    Parses one source string; parse() returns the program AST. The scanner
+    runs one token ahead: `kind`, `text` and `start` describe the current token.
+    """
+
+    def __init__(self, code):
+        self.code = code
+        self.end = 0            # offset just past the current token
+        self.prev_start = None  # offset of the last consumed token
+        self.kind = self.text = self.start = None
+        self.scan()
+
+    # ------------------ Tokens ------------------
+    def scan(self):
+        m = TOKEN.match(self.code, self.end)
+        group = m.lastindex
+        if group is None:
+            self.end = m.end()
+            if self.end != len(self.code):
+                raise ParseError(f"No token matches {self.code[self.end]!r}", self.code, self.end)
+            self.kind, self.text, self.start = END, "", self.end
+            return
+        self.end = m.end()
+        self.text = text = m.group(group)
+        self.kind = NAME if group == 1 else NUMBER if group == 2 else text
+        self.start = m.start(group)
+
+    def advance(self):
+        self.prev_start = self.start
+        self.scan()
+
+    def split(self, length):
+        """
+        Consumes the first `length` characters of the current token and scans
+        on from there.
+        """
+        self.prev_start = self.start
+        self.end = self.start + length
+        self.scan()
+
+    def unexpected(self):
+        if self.kind == END:
+            # Like Lark, end of input is reported at the last token
+            pos = self.prev_start or 0
+            return ParseError("Unexpected end of input", self.code, pos)
+        return ParseError(f"Unexpected token {self.text!r}", self.code, self.start)
+
+    def expect(self, kind):
+        if self.kind != kind:
+            raise self.unexpected()
+        self.advance()
+
+    def expect_prefix(self, keyword):
+        """
+        Consumes `keyword` where no name is allowed, so it may run into the next word.
+        """
+        if self.kind != NAME or not self.text.startswith(keyword):
+            raise self.unexpected()
+        self.split(len(keyword))
+
+    def expect_assign(self):
+        if self.kind == "==":
+            self.split(1)
+        else:
+            self.expect("=")
+
+    def is_word(self, word):
+        return self.kind == NAME and self.text == word
+
+    def name(self):
+        if self.kind != NAME:
+            raise self.unexpected()
+        text = self.text
+        self.advance()
+        return text
+
+    # ------------------ Program ------------------
+    def parse(self):
+        functions = []
+        self.expect_prefix("fn")
+        while True:
+            functions.append(self.function())
+            if self.kind == END:
+                return {"type": "program", "functions": functions}
+            if not self.is_word("fn"):
+                raise self.unexpected()
+            self.advance()
+
+    def function(self):
+        name = self.name()
+        self.expect("(")
+        params = []
+        if self.kind != ")":
+            while True:
+                param_name = self.name()
+                self.expect(":")
+                self.expect_prefix("int")
+                params.append({"type": "param", "name": param_name, "var_type": "int"})
+                if self.kind != ",":
+                    break
+                self.advance()
+        self.expect(")")
+        self.expect(":")
+        self.expect_prefix("int")
+        self.expect("{")
+        body = []
+        self.block(body)
+        return {"type": "function", "name": name, "params": params, "ret_type": "int", "body": body}
+
+    def block(self, stmts):
+        """
+        Parses statements into `stmts` up to the `}` closing the current block.
+        Blocks nested in if/while go on an explicit stack.
+        """
+        stack = []          # (statements, owner) of each enclosing block
+        owner = None        # if/while node whose block `stmts` is
+        after_block = False
+        while True:
+            kind = self.kind
+            if kind == "}":
+                self.advance()
+                if owner is None:
+                    return
+                if owner["type"] == "if" and stmts is owner["then"] and self.is_word("else"):
+                    self.advance()
+                    self.expect("{")
+                    stmts = owner["else"] = []
+                    after_block = False
+                    continue
+                stmts, owner = stack.pop()
+                after_block = True
+                continue
+            if kind != NAME:
+                raise self.unexpected()
+            word = self.text
+            if word in STATEMENT_KEYWORDS:
+                self.advance()
+                if word in ("if", "while"):
+                    self.expect("(")
+                    condition = self.expr()
+                    self.expect(")")
+                    self.expect("{")
+                    if word == "if":
+                        node = {"type": "if", "condition": condition, "then": []}
+                        inner = node["then"]
+                    else:
+                        node = {"type": "while", "condition": condition, "body": []}
+                        inner = node["body"]
+                    stmts.append(node)
+                    stack.append((stmts, owner))
+                    stmts, owner = inner, node
+                    after_block = False
+                    continue
+                stmts.append(self.simple_statement(word))
+            elif after_block and word in ("fn", "else"):
+                # Keywords in the state after a block (see the module docstring)
+                raise self.unexpected()
+            else:
+                self.advance()
+                stmts.append({"type": "expr", "value": self.call(word)})
+            self.expect(";")
+            after_block = False
+
+    def simple_statement(self, keyword):
+        # The keyword is consumed; the closing ";" is left to the caller
+        if keyword == "return":
+            return {"type": "return", "value": self.expr()}
+        if keyword == "let":
+            self.expect_prefix("int")
+            name = self.name()
+            self.expect_assign()
+            return {"type": "let", "var_type": "int", "name": name, "value": self.expr()}
+        if keyword == "mut":
+            name = self.name()
+            self.expect_assign()
+            return {"type": "mut", "name": name, "value": self.expr()}
+        if keyword == "print":
+            self.expect("(")
+            value = self.expr()
+            self.expect(")")
+            return {"type": "print", "value": value}
+        return {"type": keyword}  # break / continue
+
+    def call(self, name):
+        # Call statement: the name is consumed
+        self.expect("(")
+        args = []
+        if self.kind != ")":
+            args.append(self.expr())
+            while self.kind == ",":
+                self.advance()
+                args.append(self.expr())
+        self.expect(")")
+        return {"type": "call", "name": name, "args": args}
+
+    # ------------------ Expressions ------------------
+    def number(self):
+        text, start = self.text, self.start
+        self.advance()
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        # A float literal: Lark converts it (and fails) only once the next
+        # token shows the operand is complete
+        kind = self.kind
+        if kind not in BINARY_OPS and kind not in (")", ";", ",") and not (
+                kind == NAME and self.text.startswith(("or", "and"))):
+            raise self.unexpected()
+        raise ParseError(f"Invalid integer literal {text!r}", self.code, start)
+
+    def expr(self):
+        """
+        Parses an expression by precedence climbing with explicit stacks and
+        stops at the first token that cannot continue it.
+        """
+        operands = []  # left operands of the pending binary operators
+        ops = []       # (precedence, type) binary operators, prefix types, PAREN, [name, args] calls
+        while True:
+            # Operand position: prefix operators, "(" and one atom
+            after_prefix = False
+            while True:
+                kind = self.kind
+                prefix = PREFIX_OPS.get(kind)
+                if prefix is not None:
+                    ops.append(prefix)
+                    self.split(1)  # "!=" here is "!" followed by "="
+                    after_prefix = True
+                elif kind == "(" and not after_prefix:
+                    # unary applies to an atom or another unary, never to "( expr )"
+                    ops.append(PAREN)
+                    self.advance()
+                else:
+                    break
+            if kind == NUMBER:
+                value = self.number()
+            elif kind == NAME:
+                name = self.text
+                self.advance()
+                if self.kind != "(":
+                    value = {"type": "variable", "name": name}
+                else:
+                    self.advance()
+                    if self.kind != ")":
+                        ops.append([name, []])
+                        continue
+                    self.advance()
+                    value = {"type": "call", "name": name, "args": []}
+            else:
+                raise self.unexpected()
+
+            # Operator position, after a complete atom
+            while True:
+                while ops and type(ops[-1]) is str and ops[-1] is not PAREN:
+                    value = {"type": ops.pop(), "value": value}
+                kind = self.kind
+                if kind == NAME:
+                    # No name can follow an operand, so "or"/"and" also match as prefixes
+                    text = self.text
+                    op = "or" if text.startswith("or") else "and" if text.startswith("and") else None
+                else:
+                    op = kind if kind in BINARY_OPS else None
+                if op is not None:
+                    prec, op_type = BINARY_OPS[op]
+                    while ops and type(ops[-1]) is tuple and ops[-1][0] >= prec:
+                        value = {"type": ops.pop()[1], "left": operands.pop(), "right": value}
+                    operands.append(value)
+                    ops.append((prec, op_type))
+                    self.split(len(op))
+                    break
+                while ops and type(ops[-1]) is tuple:
+                    value = {"type": ops.pop()[1], "left": operands.pop(), "right": value}
+                if not ops:
+                    return value
+                top = ops[-1]
+                if top is PAREN:
+                    if kind != ")":
+                        raise self.unexpected()
+                    ops.pop()
+                    self.advance()
+                    continue
+                # Inside a call's argument list
+                top[1].append(value)
+                if kind == ",":
+                    self.advance()
+                    break
+                if kind != ")":
+                    raise self.unexpected()
+                ops.pop()
+                self.advance()
+                value = {"type": "call", "name": top[0], "args": top[1]}
+
+
+def parse(code):
+    """
+    Returns the program AST for `code`; raises ParseError on a syntax error.
+    """
+    return Parser(code).parse()
+
+
+def parse_to_ast(code: str):
+    """
+    Same contract as parser.parse_to_ast: returns the AST, or prints the error
+    location and returns None.
+    """
+    try:
+        return parse(code)
+    except ParseError as e:
+        print("Parse Error:")
+        print(e.get_context(code))
+        return None
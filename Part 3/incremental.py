@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import llvmlite.binding as llvm
+
+from ast_optimizer import ASTOptimizer, called_functions
+from codegen import CodeGen
+from parser import CACHE_DIR
+from semantic_analyzer import SemanticAnalyzer
+from target import init_llvm
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose behaviour determines a function's IR; editing any of them
+# changes COMPILER_VERSION and so invalidates every cached function.
+VERSIONED_SOURCES = ("ast_optimizer.py", "codegen.py", "incremental.py", "runtime.py", "semantic_analyzer.py",
+                     "symbols.py", "trampoline.py")
+
+
+def compiler_version():
+    digest = hashlib.sha256()
+    for name in VERSIONED_SOURCES:
+        with open(os.path.join(HERE, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+COMPILER_VERSION = compiler_version()
+
+DEFAULT_FUNCTION_CACHE_DIR = os.path.join(CACHE_DIR, "functions") if CACHE_DIR else None
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+
+def hash_value(value, digest):
+    """
+    Feeds a canonical encoding of a JSON-like value (dicts in key order, lists,
+    tuples and scalars) into `digest`. An explicit stack replaces json.dumps,
+    whose C encoder is bounded by the recursion limit, so deep ASTs hash too.
+    """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, bytes):
+            digest.update(value)
+        elif isinstance(value, dict):
+            digest.update(b"{")
+            stack.append(b"}")
+            for key in sorted(value, reverse=True):
+                stack.append(value[key])
+                stack.append(json.dumps(key).encode("utf8") + b":")
+        elif isinstance(value, (list, tuple)):
+            digest.update(b"[")
+            stack.append(b"]")
+            stack.extend(reversed(value))
+        else:
+            digest.update(json.dumps(value).encode("utf8") + b",")
+
+
+def function_key(func, options, signatures):
+    """
+    Content hash of a function's AST, the compiler version, the options that
+    affect its IR and the signatures of the functions it declares (itself and
+    its callees), so changing a callee's parameter count recompiles callers.
+    """
+    digest = hashlib.sha256()
+    hash_value([COMPILER_VERSION, options, signatures, func], digest)
+    return digest.hexdigest()
+
+
+class FunctionCache:
+    """
+    Content-addressed store of per-function LLVM IR, bounded to `max_bytes`
+    with least-recently-used eviction. Entries live as `<key>.ll` files under
+    `cache_dir` (file mtime is the recency), or only in memory if cache_dir is None.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_FUNCTION_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.memory = {}              # key -> IR text, when there is no cache_dir
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            found = []
+            for name in os.listdir(cache_dir):
+                if name.endswith(".ll"):
+                    st = os.stat(os.path.join(cache_dir, name))
+                    found.append((st.st_mtime, name[:-3], st.st_size))
+            for _, key, size in sorted(found):
+                self.entries[key] = size
+                self.total_bytes += size
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + ".ll")
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        if self.cache_dir:
+            try:
+                with open(self.path(key)) as f:
+                    text = f.read()
+            except OSError:
+                # Removed behind our back (e.g. by another process evicting it)
+                self.total_bytes -= self.entries.pop(key)
+                self.misses += 1
+                return None
+            os.utime(self.path(key))
+        else:
+            text = self.memory[key]
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        size = len(text.encode("utf8"))
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)
+        if self.cache_dir:
+            tmp = self.path(key) + f".{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, self.path(key))
+        else:
+            self.memory[key] = text
+        self.entries[key] = size
+        self.total_bytes += size
+        self.evict()
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            if self.cache_dir:
+                try:
+                    os.remove(self.path(key))
+                except OSError:
+                    pass
+            else:
+                del self.memory[key]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+        }
+
+
+def function_signatures(func, analyzer):
+    """
+    Returns {name: parameter count} for func and every function it calls, in
+    the program's order, for the declarations of its separate module.
+    Calls to undefined functions are left for semantic analysis to report.
+    """
+    names = called_functions(func["body"])
+    names.add(func["name"])
+    return {fn_name: arity for fn_name, arity in analyzer.functions.items() if fn_name in names}
+
+
+def compile_function_ir(func, fold, line_buffered=False, signatures=None):
+    """
+    Runs AST optimization and codegen on one analyzed function and returns
+    the textual IR of a module that contains only that function (and
+    declarations of the functions it calls).
+    """
+    program = {"type": "program", "functions": [func]}
+    if fold:
+        ASTOptimizer().optimize(program)
+    codegen = CodeGen(line_buffered=line_buffered)
+    codegen.generate_ir(program, signatures)
+    return str(codegen.module)
+
+
+def compile_incremental(ast, cache, fold=True, line_buffered=False, analyzer=None):
+    """
+    Compiles a program function by function, reusing cached IR for every
+    function whose AST (and compiler version and options) is unchanged.
+    Every function goes through SemanticAnalyzer.visit_function, which is
+    cheap and reports its warnings; only cache misses go through
+    CodeGen.compile_function. Pass `analyzer` to read its warnings and
+    symbol_stats afterwards. Returns a linked llvmlite.binding.ModuleRef.
+    """
+    if ast["type"] != "program":
+        raise Exception("Top-level AST must be 'program'")
+
+    analyzer = analyzer or SemanticAnalyzer()
+    analyzer.declare_functions(ast["functions"])
+    options = {"fold": fold, "line_buffered": line_buffered}
+    texts = []
+    for func in ast["functions"]:
+        signatures = function_signatures(func, analyzer)
+        # Key before folding, which rewrites the AST in place
+        key = function_key(func, options, signatures)
+        analyzer.visit_function(func)
+        text = cache.get(key)
+        if text is None:
+            text = compile_function_ir(func, fold, line_buffered, signatures)
+            cache.put(key, text)
+        texts.append(text)
+
+    if not any(func["name"] == "main" for func in ast["functions"]):
+        raise Exception("No 'main' function found!")
+
+    init_llvm()
+    module = llvm.parse_assembly(texts[0])
+    for text in texts[1:]:
+        module.link_in(llvm.parse_assembly(text))
+    return module
@@ -0,0 +1,66 @@
+import ctypes
+import ctypes.util
+import sys
+
+import llvmlite.binding as llvm
+
+from target import host_target_machine, parse_module
+
+_libc = None
+
+
+def load_libc():
+    """
+    Makes libc symbols (printf, fflush, ...) visible to the JIT and returns a handle to libc.
+    """
+    global _libc
+    if _libc is None:
+        path = ctypes.util.find_library("c")
+        if path:
+            llvm.load_library_permanently(path)
+        _libc = ctypes.CDLL(path)
+    return _libc
+
+
+def jit_main(module, target_machine=None):
+    """
+    Compiles the module in-process with MCJIT and returns (engine, main), where
+    main is a ctypes function returning main()'s int32 result. Accepts either an
+    llvmlite.ir.Module or an already parsed (and possibly optimized)
+    llvmlite.binding.ModuleRef. The engine owns the machine code, so keep it
+    alive while calling main.
+    """
+    load_libc()
+    if target_machine is None:
+        target_machine = host_target_machine()
+    if isinstance(module, llvm.ModuleRef):
+        llvm_module = module
+    else:
+        llvm_module = parse_module(module, target_machine)
+
+    engine = llvm.create_mcjit_compiler(llvm_module, target_machine)
+    engine.finalize_object()
+    engine.run_static_constructors()
+
+    main_ptr = engine.get_function_address("main")
+    if not main_ptr:
+        raise Exception("No 'main' function in module.")
+    return engine, ctypes.CFUNCTYPE(ctypes.c_int32)(main_ptr)
+
+
+def run_jit(module, target_machine=None):
+    """
+    Compiles the module in-process with MCJIT, calls main() and returns its exit code.
+    No files are written and no processes are started.
+    """
+    libc = load_libc()
+    engine, main = jit_main(module, target_machine)
+
+    # Keep Python's and C's stdout ordering consistent
+    sys.stdout.flush()
+    try:
+        exit_code = main()
+    finally:
+        libc.fflush(None)
+        engine.run_static_destructors()
+    return exit_code
@@ -0,0 +1,17 @@
+#include <stdio.h>
+
+int ack(int m, int n) {
+    if (m == 0) {
+        return n + 1;
+    }
+    if (n == 0) {
+        return ack(m - 1, 1);
+    }
+    return ack(m - 1, ack(m, n - 1));
+}
+
+int main(void) {
+    int result = ack(3, 8);
+    printf("%d\n", result);
+    return result % 256;
+}
@@ -0,0 +1,22 @@
+#include <stdio.h>
+
+int main(void) {
+    int n = 100000;
+    int total = 0, longest = 0;
+    for (int i = 1; i < n; i++) {
+        int x = i, steps = 0;
+        while (x != 1) {
+            if (x % 2 == 0)
+                x = x / 2;
+            else
+                x = 3 * x + 1;
+            steps++;
+        }
+        total += steps;
+        if (steps > longest)
+            longest = steps;
+    }
+    printf("%d\n", total);
+    printf("%d\n", longest);
+    return longest % 256;
+}
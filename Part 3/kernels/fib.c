@@ -0,0 +1,14 @@
+#include <stdio.h>
+
+int fib(int n) {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main(void) {
+    int result = fib(30);
+    printf("%d\n", result);
+    return result % 256;
+}
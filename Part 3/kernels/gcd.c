@@ -0,0 +1,19 @@
+#include <stdio.h>
+
+int main(void) {
+    int n = 1000;
+    int sum = 0;
+    for (int a = 1; a <= n; a++) {
+        for (int b = 1; b <= n; b++) {
+            int x = a, y = b;
+            while (y != 0) {
+                int t = x % y;
+                x = y;
+                y = t;
+            }
+            sum += x;
+        }
+    }
+    printf("%d\n", sum);
+    return sum % 256;
+}
@@ -0,0 +1,21 @@
+#include <stdio.h>
+
+int main(void) {
+    int m = 40009;
+    int n = 200000;
+    int sum = 0;
+    for (int b = 1; b <= n; b++) {
+        int base = b % m;
+        int e = b + 1000003;
+        int result = 1;
+        while (e > 0) {
+            if (e % 2 == 1)
+                result = result * base % m;
+            base = base * base % m;
+            e = e / 2;
+        }
+        sum = (sum + result) % m;
+    }
+    printf("%d\n", sum);
+    return sum % 256;
+}
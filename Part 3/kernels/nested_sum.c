@@ -0,0 +1,12 @@
+#include <stdio.h>
+
+int main(void) {
+    int n = 300;
+    int sum = 0;
+    for (int i = 0; i < n; i++)
+        for (int j = 0; j < n; j++)
+            for (int k = 0; k < n; k++)
+                sum = sum + (i * j + k) % 7 - 3;
+    printf("%d\n", sum);
+    return sum % 256;
+}
@@ -0,0 +1,18 @@
+#include <stdio.h>
+
+int main(void) {
+    int n = 200000;
+    int count = 0;
+    for (int i = 2; i < n; i++) {
+        int prime = 1;
+        for (int d = 2; d * d <= i; d++) {
+            if (i % d == 0) {
+                prime = 0;
+                break;
+            }
+        }
+        count += prime;
+    }
+    printf("%d\n", count);
+    return count % 256;
+}
@@ -0,0 +1,14 @@
+#include <stdio.h>
+
+int sum(int n, int acc) {
+    if (n == 0) {
+        return acc;
+    }
+    return sum(n - 1, acc + n % 7);
+}
+
+int main(void) {
+    int result = sum(10000000, 0);
+    printf("%d\n", result);
+    return result % 256;
+}
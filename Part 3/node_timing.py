@@ -0,0 +1,73 @@
+import inspect
+import time
+
+
+class NodeTimer:
+    """
+    Per-node-kind call counts and exclusive time for table-dispatched visitors.
+    Time spent in nested handlers is charged to the nested node kind, not the parent,
+    so the report shows which constructs dominate a pass.
+
+    Generator handlers (driven by an explicit stack, see CodeGen.run) are timed
+    per step: the time between being resumed and yielding the next request.
+    Their operands are compiled between steps, so this is exclusive time too;
+    a handler run inside a step with `yield from` is charged to its own kind.
+    """
+
+    def __init__(self):
+        self.stats = {}        # kind -> [calls, exclusive seconds]
+        self._child_time = []  # inclusive time of children, per active handler
+
+    def wrap(self, kind, handler):
+        stats = self.stats.setdefault(kind, [0, 0.0])
+        child_time = self._child_time
+        perf_counter = time.perf_counter
+
+        if inspect.isgeneratorfunction(handler):
+            def timed_steps(*args):
+                stats[0] += 1
+                steps = handler(*args)
+                value = None
+                while True:
+                    start = perf_counter()
+                    child_time.append(0.0)
+                    try:
+                        request = steps.send(value)
+                    except StopIteration as done:
+                        return done.value
+                    finally:
+                        elapsed = perf_counter() - start
+                        children = child_time.pop()
+                        stats[1] += elapsed - children
+                        if child_time:
+                            child_time[-1] += elapsed
+                    value = yield request
+            return timed_steps
+
+        def timed(*args):
+            start = perf_counter()
+            child_time.append(0.0)
+            try:
+                return handler(*args)
+            finally:
+                elapsed = perf_counter() - start
+                children = child_time.pop()
+                stats[0] += 1
+                stats[1] += elapsed - children
+                if child_time:
+                    child_time[-1] += elapsed
+        return timed
+
+    def wrap_table(self, table):
+        """
+        Returns a copy of a kind -> handler table with every handler timed.
+        """
+        return {kind: self.wrap(kind, handler) for kind, handler in table.items()}
+
+    def report(self, title):
+        lines = [f"{title}: {'kind':>10} {'calls':>10} {'ms':>10}"]
+        ordered = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)
+        for kind, (calls, seconds) in ordered:
+            if calls:
+                lines.append(f"{'':{len(title) + 1}} {kind:>10} {calls:>10} {seconds * 1000:>10.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,27 @@
+import llvmlite.binding as llvm
+
+OPT_LEVELS = (0, 1, 2, 3)
+
+
+def optimize(llvm_module, target_machine, opt_level=0, inline_threshold=None, loop_vectorize=False):
+    """
+    Runs LLVM's standard -O<opt_level> module pipeline over a parsed module, in place.
+    inline_threshold overrides the inliner's cost threshold; loop_vectorize enables
+    the loop and SLP vectorizers. At -O0 the module is left untouched.
+    Returns the same module for convenience.
+    """
+    if opt_level not in OPT_LEVELS:
+        raise Exception(f"Invalid optimization level: {opt_level}")
+    if opt_level == 0:
+        return llvm_module
+
+    pto = llvm.create_pipeline_tuning_options(speed_level=opt_level)
+    if inline_threshold is not None:
+        pto.inlining_threshold = inline_threshold
+    pto.loop_vectorization = loop_vectorize
+    pto.slp_vectorization = loop_vectorize
+
+    pass_builder = llvm.create_pass_builder(target_machine, pto)
+    pass_manager = pass_builder.getModulePassManager()
+    pass_manager.run(llvm_module, pass_builder)
+    return llvm_module
@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import llvmlite.binding as llvm
+
+from ast_optimizer import ASTOptimizer
+from codegen import CodeGen
+from optimizer import optimize
+from semantic_analyzer import SemanticAnalyzer
+from target import host_target_machine, init_llvm, parse_module
+
+
+def shard_functions(functions, jobs):
+    """
+    Splits the function list into at most `jobs` contiguous shards of similar size,
+    preserving source order.
+    """
+    jobs = max(1, min(jobs, len(functions)))
+    size, extra = divmod(len(functions), jobs)
+    shards = []
+    start = 0
+    for i in range(jobs):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(functions[start:end])
+        start = end
+    return shards
+
+
+def compile_shard(functions, signatures, fold=True, opt_level=0, line_buffered=False, inline_threshold=None,
+                  loop_vectorize=False, emit_object=False):
+    """
+    Worker entry point: folds and compiles a list of analyzed functions into
+    their own module. `signatures` holds {name: parameter count} for the whole
+    program; every function is declared in every shard, in source order, so the
+    linked module lays out like a whole-program one.
+    Returns textual IR, or optimized bitcode if opt_level > 0, or with
+    emit_object=True an object file of the (optimized) shard.
+    """
+    program = {"type": "program", "functions": functions}
+    if fold:
+        ASTOptimizer().optimize(program)
+    codegen = CodeGen(line_buffered=line_buffered)
+    codegen.generate_ir(program, signatures)
+    if opt_level == 0 and not emit_object:
+        return str(codegen.module)
+
+    target_machine = host_target_machine(opt_level)
+    module = parse_module(codegen.module, target_machine)
+    optimize(module, target_machine, opt_level, inline_threshold, loop_vectorize)
+    if emit_object:
+        return target_machine.emit_object(module)
+    return module.as_bitcode()
+
+
+def parse_shard(result):
+    if isinstance(result, bytes):
+        return llvm.parse_bitcode(result)
+    return llvm.parse_assembly(result)
+
+
+def compile_shards(ast, jobs=None, analyzer=None, **options):
+    """
+    Analyzes the program, then runs compile_shard(**options) on its functions
+    sharded across `jobs` worker processes (default: one per CPU). Semantic
+    analysis runs here first: it is cheap, reports errors before any worker
+    starts, and writes the slots the workers' codegen needs onto the AST.
+    Returns the shards' results in source order, whatever the scheduling.
+    """
+    analyzer = analyzer or SemanticAnalyzer()
+    analyzer.analyze(ast)
+    compile_one = partial(compile_shard, signatures=analyzer.functions, **options)
+
+    shards = shard_functions(ast["functions"], jobs or os.cpu_count() or 1)
+    if len(shards) == 1:
+        return [compile_one(shards[0])]
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        return list(pool.map(compile_one, shards))
+
+
+def compile_parallel(ast, jobs=None, fold=True, opt_level=0, line_buffered=False, analyzer=None,
+                     inline_threshold=None, loop_vectorize=False):
+    """
+    Compiles a program with its functions sharded across worker processes
+    (see compile_shards). Pass `analyzer` to read its warnings and
+    symbol_stats afterwards. Each worker produces its own module, optimized at
+    opt_level if nonzero; the modules are linked in source order. They are not
+    optimized again as a whole, so nothing is inlined across shards.
+    Returns a linked llvmlite.binding.ModuleRef.
+    """
+    results = compile_shards(ast, jobs, analyzer, fold=fold, opt_level=opt_level, line_buffered=line_buffered,
+                             inline_threshold=inline_threshold, loop_vectorize=loop_vectorize)
+    init_llvm()
+    module = parse_shard(results[0])
+    for result in results[1:]:
+        module.link_in(parse_shard(result))
+    return module
+
+
+def compile_parallel_objects(ast, jobs=None, fold=True, opt_level=0, line_buffered=False, analyzer=None,
+                             inline_threshold=None, loop_vectorize=False):
+    """
+    Like compile_parallel, but each worker also emits its shard as an object
+    file. Returns the objects in source order, to be linked by the system
+    linker; the output runtime every shard defines is linkonce, so the
+    linker keeps one copy.
+    """
+    return compile_shards(ast, jobs, analyzer, fold=fold, opt_level=opt_level, line_buffered=line_buffered,
+                          inline_threshold=inline_threshold, loop_vectorize=loop_vectorize, emit_object=True)
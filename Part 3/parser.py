@@ -1,15 +1,92 @@
+import hashlib
+import os
+
+import lark
 from lark import Lark, UnexpectedInput
 
+GRAMMAR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "xdlang_grammar_part3.lark")
+
+# Serialized LALR tables are stored here, one file per (grammar, Lark version) pair.
+# Override with XDLANG_CACHE_DIR, or set it to an empty string to disable the disk cache.
+CACHE_DIR = os.environ.get(
+    "XDLANG_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".xdlang_cache"),
+)
+
+_parser = None
+_ast_parser = None
+_node_parser = None
+
+
+def grammar_cache_path(grammar: str, cache_dir: str = CACHE_DIR):
+    """
+    Returns the cache file for the given grammar text, keyed by the grammar's
+    content hash and the installed Lark version. Returns None if caching is disabled.
+    """
+    if not cache_dir:
+        return None
+    key = hashlib.sha256((lark.__version__ + "\0" + grammar).encode("utf8")).hexdigest()
+    return os.path.join(cache_dir, f"xdlang_lalr_{key[:32]}.lark")
+
+
+def build_parser(**options):
+    """
+    Builds an LALR parser for the XDLANG grammar, using the on-disk table cache.
+    """
+    with open(GRAMMAR_FILE) as f:
+        grammar = f.read()
+    cache_path = grammar_cache_path(grammar)
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        return Lark(grammar, start="start", parser="lalr", cache=cache_path, **options)
+    return Lark(grammar, start="start", parser="lalr", **options)
+
+
+def get_parser():
+    """
+    Returns the process-wide LALR parser, building it on first use.
+    The parser tables are loaded from (or saved to) the on-disk cache,
+    so a cold start only pays for grammar analysis once per grammar version.
+    """
+    global _parser
+    if _parser is None:
+        _parser = build_parser()
+    return _parser
+
+
+def get_ast_parser():
+    """
+    Returns the process-wide fused parser: ASTBuilder runs inline as each
+    LALR reduction happens, so parse() returns the AST directly and no
+    intermediate parse tree is built.
+    """
+    global _ast_parser
+    if _ast_parser is None:
+        # Imported here because ast_builder is not needed for plain parse trees
+        from ast_builder import ASTBuilder
+        _ast_parser = build_parser(transformer=ASTBuilder())
+    return _ast_parser
+
+
+def get_node_parser():
+    """
+    Returns the process-wide fused parser for the compact AST: like
+    get_ast_parser, but NodeBuilder builds ast_nodes.py nodes instead of dicts.
+    """
+    global _node_parser
+    if _node_parser is None:
+        from ast_builder import NodeBuilder
+        _node_parser = build_parser(transformer=NodeBuilder())
+    return _node_parser
+
+
 def parse_code(code: str):
     """
     Parses the XDLANG source code using xdlang_grammar_part3.lark.
     Returns a Lark parse tree if successful, or None if there's a parse error.
     """
     try:
-        with open("xdlang_grammar_part3.lark") as f:
-            grammar = f.read()
-        parser = Lark(grammar, start="start", parser="lalr")
-        tree = parser.parse(code)
+        tree = get_parser().parse(code)
         return tree
     except UnexpectedInput as e:
         print("Parse Error:")
@@ -17,3 +94,33 @@ def parse_code(code: str):
         line = e.get_context(code)
         print(line)
         return None
+
+
+def parse_to_ast(code: str):
+    """
+    Parses the XDLANG source code straight into the dictionary AST.
+    Returns the same result as ASTBuilder().transform(parse_code(code)),
+    or None if there's a parse error.
+    """
+    try:
+        return get_ast_parser().parse(code)
+    except UnexpectedInput as e:
+        print("Parse Error:")
+        # Show a snippet of the error location
+        line = e.get_context(code)
+        print(line)
+        return None
+
+
+def parse_to_nodes(code: str):
+    """
+    Parses the XDLANG source code straight into the compact Node AST
+    (see ast_nodes.py), or returns None if there's a parse error.
+    """
+    try:
+        return get_node_parser().parse(code)
+    except UnexpectedInput as e:
+        print("Parse Error:")
+        line = e.get_context(code)
+        print(line)
+        return None
@@ -0,0 +1,138 @@
+import json
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def rusage_totals():
+    """
+    Returns (cpu seconds, peak RSS in KiB) for this process plus its waited-for
+    children, so phases that shell out (linking, running ./output) are covered.
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    return cpu, own.ru_maxrss
+
+
+def ir_counts(module):
+    """
+    Counts (instructions, basic blocks) in an llvmlite.ir.Module or an
+    llvmlite.binding.ModuleRef.
+    """
+    instructions = blocks = 0
+    for func in module.functions:
+        for block in func.blocks:
+            blocks += 1
+            instructions += sum(1 for _ in block.instructions)
+    return instructions, blocks
+
+
+class PhaseProfiler:
+    """
+    Records wall time, CPU time, peak RSS growth and tracemalloc allocations for
+    each compiler phase, plus any counts the pipeline attaches (AST nodes, IR
+    instructions, basic blocks). Subscribers get phase start/end events.
+
+    A disabled profiler still fires hooks but measures nothing, so the pipeline
+    can always go through `phase()`.
+    """
+
+    def __init__(self, enabled=True, trace_memory=True):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.records = []
+        self.start_hooks = []
+        self.end_hooks = []
+
+    def subscribe(self, on_start=None, on_end=None):
+        """
+        Registers on_start(name) and/or on_end(name, record) callbacks.
+        record is the dict that ends up in `records` and in the JSON report.
+        """
+        if on_start is not None:
+            self.start_hooks.append(on_start)
+        if on_end is not None:
+            self.end_hooks.append(on_end)
+
+    @contextmanager
+    def phase(self, name, **counters):
+        """
+        Measures the enclosed block as one phase. Each keyword is a callable
+        evaluated after the phase's clocks stop; its result is stored under that
+        key (a tuple result is spread over comma-separated keys, e.g.
+        `ir_instructions,basic_blocks=lambda: ir_counts(module)`).
+        """
+        record = {"phase": name}
+        for hook in self.start_hooks:
+            hook(name)
+        if not self.enabled:
+            try:
+                yield record
+            finally:
+                for hook in self.end_hooks:
+                    hook(name, record)
+            return
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            blocks_before = len(tracemalloc.take_snapshot().traces)
+            tracemalloc.reset_peak()
+            mem_before, _ = tracemalloc.get_traced_memory()
+        cpu_before, rss_before = rusage_totals()
+        start = time.perf_counter()
+        record["ok"] = False
+        try:
+            yield record
+            record["ok"] = True
+        finally:
+            record["wall_s"] = time.perf_counter() - start
+            cpu_after, rss_after = rusage_totals()
+            record["cpu_s"] = cpu_after - cpu_before
+            record["rss_peak_delta_kib"] = rss_after - rss_before
+            if self.trace_memory:
+                mem_after, mem_peak = tracemalloc.get_traced_memory()
+                record["alloc_net_bytes"] = mem_after - mem_before
+                record["alloc_peak_bytes"] = mem_peak - mem_before
+                record["alloc_net_blocks"] = len(tracemalloc.take_snapshot().traces) - blocks_before
+            if record["ok"]:
+                for keys, counter in counters.items():
+                    values = counter()
+                    if isinstance(values, tuple):
+                        record.update(zip(keys.split(","), values))
+                    else:
+                        record[keys] = values
+            self.records.append(record)
+            for hook in self.end_hooks:
+                hook(name, record)
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def to_json(self):
+        return json.dumps({"phases": self.records}, indent=2)
+
+    def report(self):
+        header = (f"{'phase':<10} {'wall ms':>10} {'cpu ms':>10} {'rss +KiB':>9} "
+                  f"{'alloc KiB':>10} {'peak KiB':>10} {'blocks':>9}  counts")
+        lines = [header]
+        for r in self.records:
+            counts = ", ".join(f"{k}={v}" for k, v in r.items() if k not in REPORT_COLUMNS)
+            if not r["ok"]:
+                counts = "FAILED" + (", " + counts if counts else "")
+            lines.append(
+                f"{r['phase']:<10} {r['wall_s'] * 1000:>10.2f} {r['cpu_s'] * 1000:>10.2f} "
+                f"{r['rss_peak_delta_kib']:>9} "
+                f"{r.get('alloc_net_bytes', 0) / 1024:>10.1f} {r.get('alloc_peak_bytes', 0) / 1024:>10.1f} "
+                f"{r.get('alloc_net_blocks', 0):>9}  {counts}")
+        return "\n".join(lines)
+
+
+REPORT_COLUMNS = frozenset(("phase", "ok", "wall_s", "cpu_s", "rss_peak_delta_kib",
+                            "alloc_net_bytes", "alloc_peak_bytes", "alloc_net_blocks"))
+
+# Shared no-op profiler for callers that do not ask for phase timings
+NULL_PROFILER = PhaseProfiler(enabled=False)
@@ -0,0 +1,197 @@
+import random
+import sys
+
+# Binary operators the generator draws from; "/" and "%" always get a
+# nonzero literal divisor so generated programs can also be run.
+BINARY_OPS = ("+", "-", "*", "/", "%", "<", "<=", ">", ">=", "==", "!=", "and", "or")
+COMPARE_OPS = ("<", "<=", ">", ">=", "==", "!=")
+
+# Probability that an expression operand stops early as a leaf
+LEAF_PROBABILITY = 0.2
+
+# Trip count of generated loops, kept small so generated programs run quickly
+LOOP_TRIPS = 3
+
+# Probability that a leaf outside loops is a call, when functions take parameters
+CALL_PROBABILITY = 0.05
+
+
+class ProgramGenerator:
+    """
+    Seeded generator of valid XDLANG programs: every program parses, passes
+    semantic analysis, compiles, and terminates when run (loops count up to a
+    small bound and never divide by zero).
+
+    Knobs:
+      functions    number of functions; the last one is main
+      statements   total statements across all functions, nested ones included
+      max_nesting  how deeply if/while blocks may nest (0: straight-line code)
+      expr_depth   maximum depth of operator nesting in an expression
+      expr_width   operands per operator chain, e.g. width 3 gives `a + b * c`
+      max_params   functions other than main take up to this many parameters,
+                   and code outside loops may call the functions defined
+                   before it (0: no parameters and no calls)
+    """
+
+    def __init__(self, seed=0, functions=1, statements=100, max_nesting=2, expr_depth=4, expr_width=2,
+                 max_params=0):
+        self.rng = random.Random(seed)
+        self.functions = max(1, functions)
+        self.statements = statements
+        self.max_nesting = max_nesting
+        self.expr_depth = expr_depth
+        self.expr_width = max(1, expr_width)
+        self.max_params = max_params
+        self.callable = []  # (name, parameter count) of the functions defined so far
+        self.in_loop = False
+
+    def generate(self):
+        lines = []
+        per_function, extra = divmod(self.statements, self.functions)
+        for index in range(self.functions):
+            name = "main" if index == self.functions - 1 else f"f{index}"
+            self.function(lines, name, per_function + (1 if index < extra else 0))
+        return "\n".join(lines) + "\n"
+
+    def function(self, lines, name, budget):
+        self.counter = 0
+        # Calls only go to earlier functions, so there is no recursion
+        arity = self.rng.randint(0, self.max_params) if self.max_params and name != "main" else 0
+        params = [f"p{i}" for i in range(arity)]
+        lines.append(f"fn {name}({', '.join(p + ': int' for p in params)}): int {{")
+        readable = list(params)
+        mutable = list(params)
+        self.block(lines, 1, budget, readable, mutable, in_loop=False)
+        lines.append(f"    return {self.expr(self.expr_depth, readable)};")
+        lines.append("}")
+        self.callable.append((name, arity))
+
+    def fresh_name(self, prefix):
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def block(self, lines, depth, budget, readable, mutable, in_loop):
+        """
+        Appends about `budget` statements at nesting `depth`. `readable` and
+        `mutable` are copied, so names declared here stay local to the block.
+        """
+        readable = list(readable)
+        mutable = list(mutable)
+        indent = "    " * depth
+        rng = self.rng
+        while budget > 0:
+            roll = rng.random()
+            nested = depth <= self.max_nesting and budget >= 3
+            if not mutable or roll < 0.2:
+                name = self.fresh_name("v")
+                lines.append(f"{indent}let int {name} = {self.expr(self.expr_depth, readable)};")
+                readable.append(name)
+                mutable.append(name)
+                budget -= 1
+            elif roll < 0.5 or (not nested and roll < 0.85):
+                lines.append(f"{indent}mut {rng.choice(mutable)} = {self.expr(self.expr_depth, readable)};")
+                budget -= 1
+            elif roll < 0.6 or not nested:
+                if in_loop and rng.random() < 0.1:
+                    lines.append(f"{indent}if ({self.condition(readable)}) {{")
+                    lines.append(f"{indent}    {rng.choice(('break', 'continue'))};")
+                    lines.append(f"{indent}}}")
+                    budget -= 2
+                else:
+                    lines.append(f"{indent}print({self.expr(self.expr_depth, readable)});")
+                    budget -= 1
+            elif roll < 0.8:
+                inner = rng.randint(1, min(budget - 1, max(1, self.statements // 20)))
+                lines.append(f"{indent}if ({self.condition(readable)}) {{")
+                if rng.random() < 0.5 and inner >= 2:
+                    then = inner // 2
+                    self.block(lines, depth + 1, then, readable, mutable, in_loop)
+                    lines.append(f"{indent}}} else {{")
+                    self.block(lines, depth + 1, inner - then, readable, mutable, in_loop)
+                else:
+                    self.block(lines, depth + 1, inner, readable, mutable, in_loop)
+                lines.append(f"{indent}}}")
+                budget -= inner + 1
+            else:
+                # The counter is readable but never a `mut` target, and is
+                # incremented first, so `continue` cannot skip it.
+                inner = rng.randint(1, min(budget - 2, max(1, self.statements // 20)))
+                counter = self.fresh_name("i")
+                lines.append(f"{indent}let int {counter} = 0;")
+                lines.append(f"{indent}while ({counter} < {LOOP_TRIPS}) {{")
+                lines.append(f"{indent}    mut {counter} = {counter} + 1;")
+                self.in_loop = True
+                self.block(lines, depth + 1, max(1, inner - 1), readable + [counter], mutable, in_loop=True)
+                self.in_loop = in_loop
+                lines.append(f"{indent}}}")
+                budget -= inner + 2
+
+    def leaf(self, names):
+        rng = self.rng
+        # Calls stay out of loops, which keeps the run time of nested calls linear
+        if self.callable and not self.in_loop and self.max_params and rng.random() < CALL_PROBABILITY:
+            name, arity = rng.choice(self.callable)
+            return f"{name}({', '.join(self.simple_leaf(names) for _ in range(arity))})"
+        return self.simple_leaf(names)
+
+    def simple_leaf(self, names):
+        rng = self.rng
+        if names and rng.random() < 0.6:
+            return rng.choice(names)
+        return str(rng.randint(0, 100))
+
+    def expr(self, depth, names):
+        """
+        Returns an expression with at most `depth` levels of operators, each
+        level a chain of `expr_width` operands.
+        """
+        rng = self.rng
+        if depth == 0 or rng.random() < LEAF_PROBABILITY:
+            return self.leaf(names)
+        parts = [self.operand(depth - 1, names)]
+        for _ in range(self.expr_width - 1):
+            op = rng.choice(BINARY_OPS)
+            if op in ("/", "%"):
+                parts.append(f"{op} {rng.randint(1, 9)}")
+            else:
+                parts.append(f"{op} {self.operand(depth - 1, names)}")
+        return " ".join(parts)
+
+    def operand(self, depth, names):
+        text = self.expr(depth, names)
+        if " " in text:
+            return f"({text})"
+        if self.rng.random() < 0.1:
+            return f"-{text}"
+        return text
+
+    def condition(self, names):
+        depth = max(0, self.expr_depth - 1)
+        return f"{self.operand(depth, names)} {self.rng.choice(COMPARE_OPS)} {self.operand(depth, names)}"
+
+
+def generate_program(seed=0, **knobs):
+    """
+    Returns the source of a generated program (see ProgramGenerator for knobs).
+    """
+    return ProgramGenerator(seed=seed, **knobs).generate()
+
+
+def program_of_size(size_bytes, seed=0, **knobs):
+    """
+    Returns a generated program of roughly `size_bytes` bytes, scaling the
+    statement count from a small sample generated with the same knobs.
+    """
+    knobs.pop("statements", None)
+    sample_statements = 200
+    sample = generate_program(seed=seed, statements=sample_statements, **knobs)
+    per_statement = len(sample) / sample_statements
+    statements = max(1, int(size_bytes / per_statement))
+    return generate_program(seed=seed, statements=statements, **knobs)
+
+
+if __name__ == "__main__":
+    # Usage: python program_gen.py [statements] [seed] > program.xd
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    sys.stdout.write(generate_program(seed=seed, statements=statements))
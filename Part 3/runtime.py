@@ -0,0 +1,204 @@
+from llvmlite import ir
+
+# The output runtime, emitted as LLVM IR into every generated module:
+#
+#   xd_print_int(i32)  formats an integer and a newline into a process-wide
+#                      buffer, flushing it first if the text might not fit
+#   xd_flush()         writes the buffer to fd 1 with write(2) and empties it
+#
+# Everything is linkonce_odr, so modules compiled separately (incremental,
+# parallel) link to a single buffer and a single copy of each function.
+
+PRINT_INT = "xd_print_int"
+FLUSH = "xd_flush"
+BUFFER_SIZE = 1 << 16
+# "-2147483648\n"
+MAX_INT_TEXT = 12
+
+i8 = ir.IntType(8)
+i32 = ir.IntType(32)
+i64 = ir.IntType(64)
+i8_ptr = ir.PointerType(i8)
+
+# "00" "01" ... "99": two digits per lookup halves the divisions
+DIGIT_PAIRS = "".join(f"{n:02d}" for n in range(100)).encode("ascii")
+
+
+def shared_global(module, name, ty, initializer):
+    var = ir.GlobalVariable(module, ty, name=name)
+    var.linkage = "linkonce_odr"
+    var.initializer = initializer
+    return var
+
+
+def add_output_runtime(module):
+    """
+    Defines the buffered output runtime in `module` (once) and returns
+    (print_int, flush) functions to call from generated code.
+    """
+    if PRINT_INT in module.globals:
+        return module.globals[PRINT_INT], module.globals[FLUSH]
+
+    buf_ty = ir.ArrayType(i8, BUFFER_SIZE)
+    buf = shared_global(module, "xd_outbuf", buf_ty, ir.Constant(buf_ty, None))
+    length = shared_global(module, "xd_outlen", i32, ir.Constant(i32, 0))
+    pairs_ty = ir.ArrayType(i8, len(DIGIT_PAIRS))
+    pairs = shared_global(module, "xd_digit_pairs", pairs_ty, ir.Constant(pairs_ty, bytearray(DIGIT_PAIRS)))
+    pairs.global_constant = True
+    pairs.unnamed_addr = True
+
+    write = module.globals.get("write") or ir.Function(module, ir.FunctionType(i64, [i32, i8_ptr, i64]),
+                                                       name="write")
+    flush = define_flush(module, buf, length, write)
+    print_int = define_print_int(module, buf, length, pairs, flush)
+    return print_int, flush
+
+
+def define_flush(module, buf, length, write):
+    func = ir.Function(module, ir.FunctionType(ir.VoidType(), []), name=FLUSH)
+    func.linkage = "linkonce_odr"
+    entry = func.append_basic_block("entry")
+    loop = func.append_basic_block("loop")
+    advance = func.append_basic_block("advance")
+    done = func.append_basic_block("done")
+    b = ir.IRBuilder(entry)
+    total = b.load(length)
+    b.cbranch(b.icmp_signed(">", total, ir.Constant(i32, 0)), loop, done)
+
+    # write() may be partial; stop on error rather than spin
+    b.position_at_end(loop)
+    offset = b.phi(i32, name="offset")
+    offset.add_incoming(ir.Constant(i32, 0), entry)
+    start = b.gep(buf, [ir.Constant(i32, 0), offset], inbounds=True)
+    remaining = b.sext(b.sub(total, offset), i64)
+    written = b.call(write, [ir.Constant(i32, 1), start, remaining])
+    b.cbranch(b.icmp_signed("<=", written, ir.Constant(i64, 0)), done, advance)
+
+    b.position_at_end(advance)
+    next_offset = b.add(offset, b.trunc(written, i32))
+    offset.add_incoming(next_offset, advance)
+    b.cbranch(b.icmp_signed("<", next_offset, total), loop, done)
+
+    b.position_at_end(done)
+    b.store(ir.Constant(i32, 0), length)
+    b.ret_void()
+    return func
+
+
+def define_print_int(module, buf, length, pairs, flush):
+    func = ir.Function(module, ir.FunctionType(ir.VoidType(), [i32]), name=PRINT_INT)
+    func.linkage = "linkonce_odr"
+    value = func.args[0]
+    entry = func.append_basic_block("entry")
+    do_flush = func.append_basic_block("flush")
+    fmt = func.append_basic_block("format")
+    pair_loop = func.append_basic_block("pairs")
+    tail = func.append_basic_block("tail")
+    two = func.append_basic_block("two_digits")
+    one = func.append_basic_block("one_digit")
+    sign = func.append_basic_block("sign")
+    minus = func.append_basic_block("minus")
+    copy = func.append_basic_block("copy")
+    copy_loop = func.append_basic_block("copy_loop")
+    done = func.append_basic_block("done")
+
+    def const(n):
+        return ir.Constant(i32, n)
+
+    def digit_pair(b, n):
+        index = b.shl(n, const(1))
+        hi = b.load(b.gep(pairs, [const(0), index], inbounds=True))
+        lo = b.load(b.gep(pairs, [const(0), b.add(index, const(1))], inbounds=True))
+        return hi, lo
+
+    b = ir.IRBuilder(entry)
+    # Digits are written right to left into a scratch buffer, then copied out
+    scratch = b.alloca(ir.ArrayType(i8, MAX_INT_TEXT), name="scratch")
+
+    def put(b, pos, byte):
+        b.store(byte, b.gep(scratch, [const(0), pos], inbounds=True))
+
+    full = b.icmp_signed(">", b.load(length), const(BUFFER_SIZE - MAX_INT_TEXT))
+    b.cbranch(full, do_flush, fmt)
+
+    b.position_at_end(do_flush)
+    b.call(flush, [])
+    b.branch(fmt)
+
+    b.position_at_end(fmt)
+    put(b, const(MAX_INT_TEXT - 1), ir.Constant(i8, ord("\n")))
+    negative = b.icmp_signed("<", value, const(0))
+    # 0 - INT_MIN wraps to INT_MIN, whose unsigned reading is the right magnitude
+    magnitude = b.select(negative, b.sub(const(0), value), value)
+    b.branch(pair_loop)
+
+    b.position_at_end(pair_loop)
+    n = b.phi(i32, name="n")
+    pos = b.phi(i32, name="pos")
+    n.add_incoming(magnitude, fmt)
+    pos.add_incoming(const(MAX_INT_TEXT - 1), fmt)
+    many = b.icmp_unsigned(">=", n, const(100))
+    with b.if_then(many):
+        hi, lo = digit_pair(b, b.urem(n, const(100)))
+        put(b, b.sub(pos, const(1)), lo)
+        put(b, b.sub(pos, const(2)), hi)
+    # if_then leaves us in a fresh block after the conditional store
+    after = b.block
+    next_n = b.select(many, b.udiv(n, const(100)), n)
+    next_pos = b.select(many, b.sub(pos, const(2)), pos)
+    n.add_incoming(next_n, after)
+    pos.add_incoming(next_pos, after)
+    b.cbranch(many, pair_loop, tail)
+
+    b.position_at_end(tail)
+    b.cbranch(b.icmp_unsigned(">=", next_n, const(10)), two, one)
+
+    b.position_at_end(two)
+    hi, lo = digit_pair(b, next_n)
+    put(b, b.sub(next_pos, const(1)), lo)
+    put(b, b.sub(next_pos, const(2)), hi)
+    pos_two = b.sub(next_pos, const(2))
+    b.branch(sign)
+
+    b.position_at_end(one)
+    put(b, b.sub(next_pos, const(1)), b.trunc(b.add(next_n, const(ord("0"))), i8))
+    pos_one = b.sub(next_pos, const(1))
+    b.branch(sign)
+
+    b.position_at_end(sign)
+    start = b.phi(i32, name="start")
+    start.add_incoming(pos_two, two)
+    start.add_incoming(pos_one, one)
+    b.cbranch(negative, minus, copy)
+
+    b.position_at_end(minus)
+    pos_minus = b.sub(start, const(1))
+    put(b, pos_minus, ir.Constant(i8, ord("-")))
+    b.branch(copy)
+
+    b.position_at_end(copy)
+    first = b.phi(i32, name="first")
+    first.add_incoming(start, sign)
+    first.add_incoming(pos_minus, minus)
+    used = b.load(length)
+    b.branch(copy_loop)
+
+    # At most 12 bytes: a byte loop, rather than a memcpy call, which linked
+    # modules would also have to agree on the declaration order of
+    b.position_at_end(copy_loop)
+    src_pos = b.phi(i32, name="src")
+    dest_pos = b.phi(i32, name="dest")
+    src_pos.add_incoming(first, copy)
+    dest_pos.add_incoming(used, copy)
+    byte = b.load(b.gep(scratch, [const(0), src_pos], inbounds=True))
+    b.store(byte, b.gep(buf, [const(0), dest_pos], inbounds=True))
+    next_src = b.add(src_pos, const(1))
+    next_dest = b.add(dest_pos, const(1))
+    src_pos.add_incoming(next_src, copy_loop)
+    dest_pos.add_incoming(next_dest, copy_loop)
+    b.cbranch(b.icmp_signed("<", next_src, const(MAX_INT_TEXT)), copy_loop, done)
+
+    b.position_at_end(done)
+    b.store(next_dest, length)
+    b.ret_void()
+    return func
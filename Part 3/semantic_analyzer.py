@@ -1,93 +1,383 @@
+from ast_nodes import (BINARY_OPCODES, BREAK, CALL, CONTINUE, EXPR, IF, LET, MUT, OP_NAMES, PRINT, PROGRAM,
+                       RETURN, UNARY_OPCODES, VARIABLE, WHILE, Node)
+from node_timing import NodeTimer
+from symbols import SymbolTable
+
+BINARY_OPS = ("add","sub","mul","div","mod","eq","ne","lt","le","gt","ge","or","and")
+UNARY_OPS = ("neg","not")
+
+# Queued after a loop body's statements; reaching it leaves the loop
+END_LOOP = {"type": "end_loop"}
+# Queued around the statements of each nested block; they open and close its scope
+BEGIN_SCOPE = {"type": "begin_scope"}
+END_SCOPE = {"type": "end_scope"}
+
+
 class SemanticAnalyzer:
     """
     Performs basic checks on the AST:
     - Ensures a 'main' function exists
-    - Variables declared before use (simple approach)
+    - Variables declared before use, with block scoping: a `let` is visible
+      until the end of the block that contains it
     - (Optional) Ensures break/continue appear inside loops
+    - Calls name a defined function and pass it the right number of
+      arguments; functions may be called before their definition
+
+    Statements and expressions are dispatched through tables keyed by node type.
+    Handlers do not recurse: they check their own node and return the nested
+    statements or subexpressions, which visit_block / visit_expr keep on an
+    explicit stack. Nesting depth is therefore bounded only by memory, and
+    visit order is still source order.
+
+    Name resolution happens here, once: every variable, `let` and `mut`
+    node and every parameter gets the "slot" of the declaration it refers
+    to, and every function the number of "slots" it needs (see
+    symbols.SymbolTable). Code generators index by slot and never look
+    names up. A `let` that shadows a variable of an enclosing block is
+    allowed and recorded in `warnings`; `symbol_stats` holds
+    (function, slots, peak symbol table bytes) for every function.
+    With profile=True every handler is timed and `timer.report()` shows where
+    analysis time goes.
     """
 
-    def __init__(self):
+    def __init__(self, profile=False):
         self.has_main = False
-        self.symbols = {}  # var_name -> type
+        self.symbols = SymbolTable()  # variables of the current function
+        self.warnings = []  # shadowing diagnostics
+        self.symbol_stats = []  # (fn_name, slots, peak bytes) per function
+        self.functions = {}  # fn_name -> number of parameters
         self.in_loop = 0   # track if we're inside a loop
 
+        self.stmt_handlers = {
+            "let": self.visit_let,
+            "mut": self.visit_mut,
+            "print": self.visit_value,
+            "return": self.visit_value,
+            "if": self.visit_if,
+            "while": self.visit_while,
+            "break": self.visit_loop_jump,
+            "continue": self.visit_loop_jump,
+            "expr": self.visit_value,
+        }
+        self.expr_handlers = {"variable": self.visit_variable, "call": self.visit_call}
+        self.expr_handlers.update(dict.fromkeys(BINARY_OPS, self.visit_binary))
+        self.expr_handlers.update(dict.fromkeys(UNARY_OPS, self.visit_unary))
+
+        self.timer = None
+        if profile:
+            self.timer = NodeTimer()
+            self.stmt_handlers = self.timer.wrap_table(self.stmt_handlers)
+            self.expr_handlers = self.timer.wrap_table(self.expr_handlers)
+
     def analyze(self, ast):
         if ast["type"] != "program":
             raise Exception("Top-level AST must be 'program'")
 
+        self.declare_functions(ast["functions"])
         for func in ast["functions"]:
             self.visit_function(func)
 
         if not self.has_main:
             raise Exception("No 'main' function found!")
 
+    def declare_functions(self, functions):
+        """
+        Fills the function table before any body is visited, so calls can
+        refer to functions defined later in the file (and to themselves).
+        """
+        for func in functions:
+            if func["name"] in self.functions:
+                raise Exception(f"Function '{func['name']}' already defined.")
+            self.functions[func["name"]] = len(func["params"])
+
     def visit_function(self, func):
         if func["name"] == "main":
             self.has_main = True
             # Check return type
             if func["ret_type"] != "int":
                 raise Exception("main() must return int")
+            if func["params"]:
+                raise Exception("main() must not take parameters")
 
-        # Reset symbols for each function
-        self.symbols = {}
+        # Reset symbols for each function; parameters are its first variables,
+        # in the same scope as the top level of the body
+        self.symbols = symbols = SymbolTable()
         self.in_loop = 0
+        for param in func["params"]:
+            if symbols.lookup(param["name"]) is not None:
+                raise Exception(f"Parameter '{param['name']}' declared twice in '{func['name']}'.")
+            param["slot"] = symbols.declare(param["name"])
+
+        self.visit_block(func["body"])
 
-        for stmt in func["body"]:
-            self.visit_stmt(stmt)
+        symbols.measure()
+        func["slots"] = symbols.size
+        self.symbol_stats.append((func["name"], symbols.size, symbols.peak_bytes))
+        params = len(func["params"])
+        for name, outer, _ in symbols.shadowed:
+            shadowed = "a parameter" if outer < params else "a variable of an enclosing block"
+            self.warnings.append(f"Warning: '{name}' declared in '{func['name']}' shadows {shadowed}.")
+
+    def visit_block(self, stmts):
+        stack = list(reversed(stmts))
+        while stack:
+            stmt = stack.pop()
+            if stmt is END_SCOPE:
+                self.symbols.pop_scope()
+                continue
+            if stmt is BEGIN_SCOPE:
+                self.symbols.push_scope()
+                continue
+            if stmt is END_LOOP:
+                self.in_loop -= 1
+                continue
+            nested = self.visit_stmt(stmt)
+            if nested:
+                stack.extend(reversed(nested))
 
     def visit_stmt(self, stmt):
+        """
+        Checks one statement and returns the statements nested in it, if any.
+        """
         stype = stmt["type"]
-        if stype == "let":
-            var_name = stmt["name"]
-            if var_name in self.symbols:
-                raise Exception(f"Variable '{var_name}' already declared.")
-            self.symbols[var_name] = stmt["var_type"]
-        elif stype == "mut":
-            var_name = stmt["name"]
-            if var_name not in self.symbols:
-                raise Exception(f"Variable '{var_name}' not declared.")
-        elif stype == "print":
-            pass
-        elif stype == "if":
-            self.visit_expr(stmt["condition"])
-            for s in stmt["then"]:
-                self.visit_stmt(s)
-            if "else" in stmt:
-                for s in stmt["else"]:
-                    self.visit_stmt(s)
-        elif stype == "while":
-            self.visit_expr(stmt["condition"])
-            self.in_loop += 1
-            for s in stmt["body"]:
-                self.visit_stmt(s)
-            self.in_loop -= 1
-        elif stype == "break":
-            if self.in_loop == 0:
-                raise Exception("break statement not inside a loop")
-        elif stype == "continue":
-            if self.in_loop == 0:
-                raise Exception("continue statement not inside a loop")
-        elif stype == "return":
-            self.visit_expr(stmt["value"])
-        else:
+        handler = self.stmt_handlers.get(stype)
+        if handler is None:
             raise Exception(f"Unknown statement type: {stype}")
+        return handler(stmt)
+
+    def visit_let(self, stmt):
+        var_name = stmt["name"]
+        # The initializer cannot refer to the variable being declared
+        self.visit_expr(stmt["value"])
+        stmt["slot"] = self.symbols.declare(var_name)
+
+    def visit_mut(self, stmt):
+        var_name = stmt["name"]
+        slot = self.symbols.lookup(var_name)
+        if slot is None:
+            raise Exception(f"Variable '{var_name}' not declared.")
+        stmt["slot"] = slot
+        self.visit_expr(stmt["value"])
+
+    def visit_value(self, stmt):
+        # print / return
+        self.visit_expr(stmt["value"])
+
+    def visit_if(self, stmt):
+        self.visit_expr(stmt["condition"])
+        nested = [BEGIN_SCOPE, *stmt["then"], END_SCOPE]
+        if "else" in stmt:
+            nested += [BEGIN_SCOPE, *stmt["else"], END_SCOPE]
+        return nested
+
+    def visit_while(self, stmt):
+        self.visit_expr(stmt["condition"])
+        self.in_loop += 1
+        return [BEGIN_SCOPE, *stmt["body"], END_SCOPE, END_LOOP]
+
+    def visit_loop_jump(self, stmt):
+        if self.in_loop == 0:
+            raise Exception(f"{stmt['type']} statement not inside a loop")
 
     def visit_expr(self, expr):
-        # If it's an int, or basic dict with 'type'
-        if isinstance(expr, int):
-            return
+        # Ints are leaves; other nodes are checked by their handler, which
+        # returns its operands last-first, the order they come off the stack
         if not isinstance(expr, dict):
             return
-        etype = expr["type"]
-        if etype == "variable":
-            var_name = expr["name"]
-            if var_name not in self.symbols:
-                raise Exception(f"Variable '{var_name}' not declared.")
-        elif etype in ("add","sub","mul","div","mod","eq","ne","lt","le","gt","ge","or","and"):
-            self.visit_expr(expr["left"])
-            self.visit_expr(expr["right"])
-        elif etype in ("neg","not"):
-            self.visit_expr(expr["value"])
-        else:
-            # Possibly other checks
-            pass
+        handlers = self.expr_handlers
+        stack = [expr]
+        pop, push = stack.pop, stack.extend
+        while stack:
+            expr = pop()
+            if isinstance(expr, dict):
+                handler = handlers.get(expr["type"])
+                if handler is not None:
+                    operands = handler(expr)
+                    if operands:
+                        push(operands)
+
+    def visit_variable(self, expr):
+        slot = self.symbols.lookup(expr["name"])
+        if slot is None:
+            raise Exception(f"Variable '{expr['name']}' not declared.")
+        expr["slot"] = slot
+
+    def visit_call(self, expr):
+        fn_name = expr["name"]
+        if fn_name not in self.functions:
+            raise Exception(f"Function '{fn_name}' not defined.")
+        expected = self.functions[fn_name]
+        if len(expr["args"]) != expected:
+            raise Exception(f"Function '{fn_name}' takes {expected} argument(s), "
+                            f"got {len(expr['args'])}.")
+        return expr["args"][::-1]
+
+    def visit_binary(self, expr):
+        return expr["right"], expr["left"]
+
+    def visit_unary(self, expr):
+        return (expr["value"],)
+
+    def symbol_report(self, limit=10):
+        """
+        Formats symbol_stats for the `limit` functions with the largest symbol tables.
+        """
+        ordered = sorted(self.symbol_stats, key=lambda item: item[2], reverse=True)
+        lines = [f"symbols: {'function':>16} {'slots':>8} {'peak KiB':>10}"]
+        for fn_name, slots, peak in ordered[:limit]:
+            lines.append(f"{'':8} {fn_name:>16} {slots:>8} {peak / 1024:>10.1f}")
+        total = sum(peak for _, _, peak in self.symbol_stats)
+        lines.append(f"{'':8} {len(self.symbol_stats):>10} functions, {total / 1024:.1f} KiB in all")
+        return "\n".join(lines)
+
+
+class NodeAnalyzer(SemanticAnalyzer):
+    """
+    SemanticAnalyzer for the compact AST of ast_nodes.py (parser.parse_to_nodes).
+    Runs the same checks in the same order and leaves the same slots,
+    warnings and symbol_stats, but dispatches through lists indexed by
+    opcode and reads fields as attributes. visit_block, with its explicit
+    stack and scope markers, is shared with SemanticAnalyzer.
+    """
+
+    def __init__(self, profile=False):
+        super().__init__()
+        stmt_handlers = {
+            LET: self.visit_let,
+            MUT: self.visit_mut,
+            PRINT: self.visit_value,
+            RETURN: self.visit_value,
+            IF: self.visit_if,
+            WHILE: self.visit_while,
+            BREAK: self.visit_loop_jump,
+            CONTINUE: self.visit_loop_jump,
+            EXPR: self.visit_value,
+        }
+        expr_handlers = {VARIABLE: self.visit_variable, CALL: self.visit_call}
+        expr_handlers.update(dict.fromkeys(BINARY_OPCODES, self.visit_binary))
+        expr_handlers.update(dict.fromkeys(UNARY_OPCODES, self.visit_unary))
+
+        self.timer = None
+        if profile:
+            # NodeTimer reports by kind name, so time the handlers under OP_NAMES
+            self.timer = NodeTimer()
+            stmt_handlers = {op: self.timer.wrap(OP_NAMES[op], h) for op, h in stmt_handlers.items()}
+            expr_handlers = {op: self.timer.wrap(OP_NAMES[op], h) for op, h in expr_handlers.items()}
+        self.stmt_table = [stmt_handlers.get(op) for op in range(len(OP_NAMES))]
+        self.expr_table = [expr_handlers.get(op) for op in range(len(OP_NAMES))]
+
+    def analyze(self, ast):
+        if ast.op != PROGRAM:
+            raise Exception("Top-level AST must be 'program'")
+
+        self.declare_functions(ast.functions)
+        for func in ast.functions:
+            self.visit_function(func)
+
+        if not self.has_main:
+            raise Exception("No 'main' function found!")
+
+    def declare_functions(self, functions):
+        for func in functions:
+            if func.name in self.functions:
+                raise Exception(f"Function '{func.name}' already defined.")
+            self.functions[func.name] = len(func.params)
+
+    def visit_function(self, func):
+        if func.name == "main":
+            self.has_main = True
+            if func.ret_type != "int":
+                raise Exception("main() must return int")
+            if func.params:
+                raise Exception("main() must not take parameters")
+
+        self.symbols = symbols = SymbolTable()
+        self.in_loop = 0
+        for param in func.params:
+            if symbols.lookup(param.name) is not None:
+                raise Exception(f"Parameter '{param.name}' declared twice in '{func.name}'.")
+            param.slot = symbols.declare(param.name)
+
+        self.visit_block(func.body)
+
+        symbols.measure()
+        func.slots = symbols.size
+        self.symbol_stats.append((func.name, symbols.size, symbols.peak_bytes))
+        params = len(func.params)
+        for name, outer, _ in symbols.shadowed:
+            shadowed = "a parameter" if outer < params else "a variable of an enclosing block"
+            self.warnings.append(f"Warning: '{name}' declared in '{func.name}' shadows {shadowed}.")
+
+    def visit_stmt(self, stmt):
+        handler = self.stmt_table[stmt.op]
+        if handler is None:
+            raise Exception(f"Unknown statement type: {stmt.kind}")
+        return handler(stmt)
+
+    def visit_let(self, stmt):
+        # The initializer cannot refer to the variable being declared
+        self.visit_expr(stmt.value)
+        stmt.slot = self.symbols.declare(stmt.name)
+
+    def visit_mut(self, stmt):
+        slot = self.symbols.lookup(stmt.name)
+        if slot is None:
+            raise Exception(f"Variable '{stmt.name}' not declared.")
+        stmt.slot = slot
+        self.visit_expr(stmt.value)
+
+    def visit_value(self, stmt):
+        self.visit_expr(stmt.value)
+
+    def visit_if(self, stmt):
+        self.visit_expr(stmt.condition)
+        nested = [BEGIN_SCOPE, *stmt.then, END_SCOPE]
+        if stmt.else_ is not None:
+            nested += [BEGIN_SCOPE, *stmt.else_, END_SCOPE]
+        return nested
+
+    def visit_while(self, stmt):
+        self.visit_expr(stmt.condition)
+        self.in_loop += 1
+        return [BEGIN_SCOPE, *stmt.body, END_SCOPE, END_LOOP]
+
+    def visit_loop_jump(self, stmt):
+        if self.in_loop == 0:
+            raise Exception(f"{stmt.kind} statement not inside a loop")
+
+    def visit_expr(self, expr):
+        if not isinstance(expr, Node):
+            return
+        table = self.expr_table
+        stack = [expr]
+        pop, push = stack.pop, stack.extend
+        while stack:
+            expr = pop()
+            if isinstance(expr, Node):
+                handler = table[expr.op]
+                if handler is not None:
+                    operands = handler(expr)
+                    if operands:
+                        push(operands)
+
+    def visit_variable(self, expr):
+        slot = self.symbols.lookup(expr.name)
+        if slot is None:
+            raise Exception(f"Variable '{expr.name}' not declared.")
+        expr.slot = slot
+
+    def visit_call(self, expr):
+        fn_name = expr.name
+        if fn_name not in self.functions:
+            raise Exception(f"Function '{fn_name}' not defined.")
+        expected = self.functions[fn_name]
+        if len(expr.args) != expected:
+            raise Exception(f"Function '{fn_name}' takes {expected} argument(s), "
+                            f"got {len(expr.args)}.")
+        return expr.args[::-1]
+
+    def visit_binary(self, expr):
+        return expr.right, expr.left
+
+    def visit_unary(self, expr):
+        return (expr.value,)
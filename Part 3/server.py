@@ -0,0 +1,230 @@
+"""
+Compile server protocol: newline-delimited JSON over a Unix stream socket.
+A connection may send any number of requests; each gets one response line,
+in order.
+
+Request:
+    {"action": "compile" | "run", "source": "<xdlang code>",
+     "emit": "ll" | "obj",    (compile only, default "ll")
+     "opt_level": 0..3,       (default 0)
+     "timeout": seconds}      (run only, default 10)
+
+An unknown action, emit format or opt_level is answered with an error.
+
+A run's stdout is capped at MAX_RUN_OUTPUT bytes; a program that prints more
+is killed and reported as failed.
+
+Response:
+    {"ok": true, "ir": "..."}                           compile, emit=ll
+    {"ok": true, "object": "<base64>"}                  compile, emit=obj
+    {"ok": true, "exit_code": 0, "stdout": "..."}       run
+    {"ok": false, "error": "..."}                       any failure
+"""
+
+import base64
+import hashlib
+import json
+import os
+import select
+import signal
+import socket
+import socketserver
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import compile_source, init_worker, worker_target_machine
+from optimizer import OPT_LEVELS
+
+DEFAULT_RUN_TIMEOUT = 10.0
+EMIT_FORMATS = ("ll", "obj")
+MAX_RUN_OUTPUT = 1 << 20  # bytes of stdout kept from a run before the program is killed
+RESULT_CACHE_SIZE = 256
+
+# Per-worker LRU of compile responses, keyed by request content
+_results = OrderedDict()
+
+
+def cache_key(request):
+    payload = json.dumps([request.get("source"), request.get("emit", "ll"), request.get("opt_level", 0)])
+    return hashlib.sha256(payload.encode("utf8")).hexdigest()
+
+
+def run_in_child(llvm_module, target_machine, timeout, max_output=MAX_RUN_OUTPUT):
+    """
+    JIT-runs the module in a forked child, so crashes and runaway programs
+    cannot take the worker down. The child is killed after `timeout` seconds
+    or once it has written more than `max_output` bytes. Returns (exit_code,
+    stdout text); exit_code is None if the child was killed, with the reason
+    appended to the (truncated) stdout.
+    """
+    from jit import run_jit
+
+    out_r, out_w = os.pipe()
+    status_r, status_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: stdout goes to the pipe, main()'s return value to the status pipe
+        os.close(out_r)
+        os.close(status_r)
+        os.dup2(out_w, 1)
+        code = 1
+        try:
+            exit_code = run_jit(llvm_module, target_machine)
+            os.write(status_w, str(exit_code).encode())
+            code = 0
+        finally:
+            os._exit(code)
+
+    os.close(out_w)
+    os.close(status_w)
+    chunks = []
+    size = 0
+    deadline = time.monotonic() + timeout
+    killed = None
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            os.kill(pid, signal.SIGKILL)
+            killed = f"timed out after {timeout} s"
+            break
+        ready, _, _ = select.select([out_r], [], [], remaining)
+        if ready:
+            data = os.read(out_r, 65536)
+            if not data:
+                break
+            chunks.append(data)
+            size += len(data)
+            if size > max_output:
+                os.kill(pid, signal.SIGKILL)
+                killed = f"output exceeded {max_output} bytes"
+                chunks = [b"".join(chunks)[:max_output]]
+                break
+    _, status = os.waitpid(pid, 0)
+    exit_text = os.read(status_r, 64).decode()
+    os.close(out_r)
+    os.close(status_r)
+
+    stdout = b"".join(chunks).decode("utf8", "replace")
+    if killed is None and os.WIFSIGNALED(status):
+        killed = f"killed by signal {os.WTERMSIG(status)}"
+    if killed is not None or not exit_text:
+        return None, stdout + f"\n[{killed or 'program failed'}]"
+    return int(exit_text), stdout
+
+
+def handle_request(request):
+    """
+    Worker entry point: serves one decoded request with the worker's warm state.
+    """
+    try:
+        action = request.get("action", "compile")
+        opt_level = request.get("opt_level", 0)
+        if not isinstance(opt_level, int) or opt_level not in OPT_LEVELS:
+            return {"ok": False, "error": f"Invalid opt_level: {opt_level!r} (expected one of {OPT_LEVELS})"}
+        if action == "compile":
+            emit = request.get("emit", "ll")
+            if emit not in EMIT_FORMATS:
+                return {"ok": False, "error": f"Unknown emit format: {emit!r} (expected one of {EMIT_FORMATS})"}
+            key = cache_key(request)
+            if key in _results:
+                _results.move_to_end(key)
+                return _results[key]
+            llvm_module = compile_source(request["source"], opt_level=opt_level)
+            if emit == "obj":
+                obj = worker_target_machine(opt_level).emit_object(llvm_module)
+                response = {"ok": True, "object": base64.b64encode(obj).decode("ascii")}
+            else:
+                response = {"ok": True, "ir": str(llvm_module)}
+            _results[key] = response
+            if len(_results) > RESULT_CACHE_SIZE:
+                _results.popitem(last=False)
+            return response
+        if action == "run":
+            llvm_module = compile_source(request["source"], opt_level=opt_level)
+            exit_code, stdout = run_in_child(llvm_module, worker_target_machine(opt_level),
+                                             float(request.get("timeout", DEFAULT_RUN_TIMEOUT)))
+            if exit_code is None:
+                return {"ok": False, "error": "run failed", "stdout": stdout}
+            return {"ok": True, "exit_code": exit_code, "stdout": stdout}
+        return {"ok": False, "error": f"Unknown action: {action}"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Accepts connections on a Unix socket; each connection is read by its own
+    thread, while the compile work itself runs in a fixed-size process pool,
+    which bounds concurrency and keeps the parser and target machine warm.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, workers):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.workers = workers
+        self.pool = self.new_pool()
+        super().__init__(socket_path, RequestHandler)
+
+    def new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(0,))
+
+    def submit(self, request):
+        try:
+            return self.pool.submit(handle_request, request).result()
+        except BrokenProcessPool:
+            # A worker died; replace the pool so later requests still work
+            self.pool = self.new_pool()
+            return {"ok": False, "error": "worker process died"}
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"ok": False, "error": f"Invalid JSON: {e}"}
+            else:
+                response = self.server.submit(request)
+            self.wfile.write(json.dumps(response).encode("utf8") + b"\n")
+            self.wfile.flush()
+
+
+def serve(socket_path, workers):
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Treat SIGTERM like Ctrl-C so the socket file is removed on the way out
+    signal.signal(signal.SIGTERM, stop)
+    with CompileServer(socket_path, workers) as server:
+        server.serve_forever()
+
+
+class Client:
+    """
+    Minimal client: one connection, synchronous request/response.
+    """
+
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.rfile = self.sock.makefile("rb")
+
+    def request(self, **request):
+        self.sock.sendall(json.dumps(request).encode("utf8") + b"\n")
+        return json.loads(self.rfile.readline())
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
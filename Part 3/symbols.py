@@ -0,0 +1,84 @@
+import sys
+
+# An undo log entry; names are shared with the AST and not counted
+UNDO_ENTRY_BYTES = sys.getsizeof(("name", 0))
+
+
+class SymbolTable:
+    """
+    Lexically scoped variables of one function, resolved to dense slots.
+
+    Slots are allocated like a stack frame: parameters take 0..n-1, each
+    `let` takes the next free slot, and leaving a block frees the slots its
+    declarations took, so sibling blocks reuse them. `size` is the number of
+    slots the function needs. Backends index arrays by slot.
+
+    Every visible name is kept in one dict, and an undo log restores what a
+    block's declarations shadowed when the block ends. A lookup is therefore
+    a single dict probe however deeply blocks are nested.
+    """
+
+    __slots__ = ("visible", "undo", "scopes", "next_slot", "size", "shadowed", "peak_bytes")
+
+    def __init__(self):
+        self.visible = {}    # name -> slot of the innermost declaration in scope
+        self.undo = []       # (name, slot it shadowed or None), in declaration order
+        self.scopes = []     # (undo length, next slot) when each open block began
+        self.next_slot = 0
+        self.size = 0
+        self.shadowed = []   # (name, outer slot, inner slot) for every shadowing declaration
+        self.peak_bytes = 0
+
+    def declare(self, name):
+        """
+        Declares `name` in the innermost block and returns its slot.
+        Redeclaring a name in the same block is an error; a name from an
+        enclosing block is shadowed until this block ends.
+        """
+        outer = self.visible.get(name)
+        slot = self.next_slot
+        if outer is not None:
+            if outer >= self.scope_base():
+                raise Exception(f"Variable '{name}' already declared.")
+            self.shadowed.append((name, outer, slot))
+        self.undo.append((name, outer))
+        self.visible[name] = slot
+        self.next_slot = slot + 1
+        if slot == self.size:
+            self.size = slot + 1
+        return slot
+
+    def lookup(self, name):
+        """
+        Returns the slot `name` refers to here, or None if it is not in scope.
+        """
+        return self.visible.get(name)
+
+    def scope_base(self):
+        # Slots at or above this were declared in the innermost block
+        return self.scopes[-1][1] if self.scopes else 0
+
+    def push_scope(self):
+        self.scopes.append((len(self.undo), self.next_slot))
+
+    def pop_scope(self):
+        self.measure()
+        mark, self.next_slot = self.scopes.pop()
+        undo, visible = self.undo, self.visible
+        while len(undo) > mark:
+            name, outer = undo.pop()
+            if outer is None:
+                del visible[name]
+            else:
+                visible[name] = outer
+
+    def measure(self):
+        """
+        Updates peak_bytes with the current size of the table's containers.
+        The table only grows between the ends of blocks, so measuring there
+        and at the end of the function finds the peak.
+        """
+        size = (sys.getsizeof(self.visible) + sys.getsizeof(self.undo) + sys.getsizeof(self.scopes)
+                + UNDO_ENTRY_BYTES * len(self.undo))
+        if size > self.peak_bytes:
+            self.peak_bytes = size
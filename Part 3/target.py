@@ -0,0 +1,43 @@
+import llvmlite.binding as llvm
+
+_initialized = False
+
+
+def init_llvm():
+    """
+    Initializes the native target and asm printer once per process.
+    """
+    global _initialized
+    if not _initialized:
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        _initialized = True
+
+
+def host_target_machine(opt_level: int = 0):
+    """
+    Creates a TargetMachine for the host CPU. Code is position independent,
+    so emitted objects link into the PIE executables Linux toolchains default to.
+    """
+    init_llvm()
+    target = llvm.Target.from_default_triple()
+    return target.create_target_machine(opt=opt_level, reloc="pic", codemodel="default")
+
+
+def parse_module(module, target_machine=None):
+    """
+    Converts an llvmlite.ir.Module into a verified llvmlite.binding.ModuleRef
+    with the host triple and data layout set. An already parsed ModuleRef is
+    verified and retargeted in place.
+    """
+    init_llvm()
+    if target_machine is None:
+        target_machine = host_target_machine()
+    if isinstance(module, llvm.ModuleRef):
+        llvm_module = module
+    else:
+        llvm_module = llvm.parse_assembly(str(module))
+    llvm_module.triple = target_machine.triple
+    llvm_module.data_layout = str(target_machine.target_data)
+    llvm_module.verify()
+    return llvm_module
@@ -0,0 +1,29 @@
+from types import GeneratorType
+
+
+def run(start, request):
+    """
+    Runs a compile request without recursion and returns its result.
+
+    `start(request)` returns either the result itself or a generator: a
+    handler that yields a request for each operand or nested block it needs
+    and is resumed with that request's result. Suspended handlers wait on an
+    explicit stack, so the depth of the AST is bounded by memory rather than
+    by Python's recursion limit.
+    """
+    stack = []  # send() of each suspended handler, innermost last
+    push, pop = stack.append, stack.pop
+    value = start(request)
+    while True:
+        if type(value) is GeneratorType:
+            push(value.send)
+            value = None
+        elif not stack:
+            return value
+        try:
+            request = stack[-1](value)
+        except StopIteration as done:
+            pop()
+            value = done.value
+            continue
+        value = start(request)
@@ -0,0 +1,516 @@
+import sys
+from array import array
+
+import trampoline
+from ast_optimizer import wrap_i32
+
+# Opcodes. Every instruction is four ints (op, a, b, c) in one flat array('i');
+# a, b, c are register numbers, except jump targets, which are resolved
+# instruction offsets (multiples of 4) into the same array, and the callee of
+# CALL/TAILCALL (b), an index into the program's function list. Arguments are
+# passed in consecutive registers starting at c.
+(ADD, SUB, MUL, DIV, MOD,
+ EQ, NE, LT, LE, GT, GE,
+ NEG, NOT, MOV,
+ JMP, JZ, JNZ,
+ JEQ, JNE, JLT, JLE, JGT, JGE,
+ PRINT, CALL, TAILCALL, RET) = range(27)
+
+OP_NAMES = ("add", "sub", "mul", "div", "mod",
+            "eq", "ne", "lt", "le", "gt", "ge",
+            "neg", "not", "mov",
+            "jmp", "jz", "jnz",
+            "jeq", "jne", "jlt", "jle", "jgt", "jge",
+            "print", "call", "tailcall", "ret")
+
+ARITH_OPS = {"add": ADD, "sub": SUB, "mul": MUL, "div": DIV, "mod": MOD}
+CMP_OPS = {"eq": EQ, "ne": NE, "lt": LT, "le": LE, "gt": GT, "ge": GE}
+# Comparison -> compare-and-jump taken when it holds / when it does not
+JUMP_IF = {"eq": JEQ, "ne": JNE, "lt": JLT, "le": JLE, "gt": JGT, "ge": JGE}
+JUMP_UNLESS = {"eq": JNE, "ne": JEQ, "lt": JGE, "le": JGT, "gt": JLE, "ge": JLT}
+
+# Printed values are joined and written once this many are pending
+OUTPUT_BATCH = 4096
+
+# Nested (non-tail) calls allowed before execution stops with VMError
+MAX_CALL_DEPTH = 1 << 18
+
+# Requests a compile step yields to BytecodeCompiler.run: evaluate
+# (VALUE, expr, dst register or None), jump (BRANCH_IF/BRANCH_UNLESS, expr,
+# label), compile a statement or a block
+VALUE, BRANCH_IF, BRANCH_UNLESS, STMT, BLOCK = range(5)
+
+
+class VMFunction:
+    """
+    A compiled function: its code, the number of registers it needs and the
+    initial register file. Registers hold, in order, the function's variable
+    slots as SemanticAnalyzer resolved them (parameters first), its constants
+    and its temporaries; constants are preloaded, so no instruction loads
+    them. `slots` names the variables that use each slot, for disassembly.
+    `program` is the list of every function of the program, which CALL indexes.
+    """
+    __slots__ = ("name", "code", "registers", "slots", "params", "program")
+
+    def __init__(self, name, code, registers, slots, params=0):
+        self.name = name
+        self.code = code
+        self.registers = registers
+        self.slots = slots
+        self.params = params
+        self.program = [self]
+
+    def disassemble(self):
+        names = {reg: "/".join(names) for reg, names in enumerate(self.slots) if names}
+        lines = [f"fn {self.name}: {self.params} params, {len(self.registers)} registers"]
+        code = self.code
+        for pc in range(0, len(code), 4):
+            op = code[pc]
+            if op in (CALL, TAILCALL):
+                callee = self.program[code[pc + 2]]
+                args = ", ".join(f"r{code[pc + 3] + i}" for i in range(callee.params))
+                dst = f"{names.get(code[pc + 1], f'r{code[pc + 1]}')} = " if op == CALL else ""
+                lines.append(f"  {pc:5d}  {OP_NAMES[op]:<6} {dst}{callee.name}({args})")
+                continue
+            operands = list(code[pc + 1:pc + 1 + OPERAND_COUNTS[op]])
+            target = operands.pop() if JMP <= op <= JGE else None
+            text = ", ".join(names.get(reg, f"r{reg}") for reg in operands)
+            if target is not None:
+                text = f"{text} -> {target}".lstrip()
+            lines.append(f"  {pc:5d}  {OP_NAMES[op]:<6} {text}")
+        return "\n".join(lines)
+
+
+# Operands used by each opcode; for jumps the last one is the target
+OPERAND_COUNTS = [3] * 11 + [2, 2, 2] + [1, 2, 2] + [3] * 6 + [1, 3, 3, 1]
+
+
+class BytecodeCompiler:
+    """
+    Lowers the (analyzed, optionally folded) dictionary AST to register
+    bytecode. Conditions in `if`/`while` become compare-and-jump instructions
+    with short-circuit `and`/`or`, and loops test their condition at the bottom.
+    A function returning a call to itself rebinds its parameters and jumps back
+    to its first instruction; other calls in return position become TAILCALL,
+    which reuses the caller's frame.
+
+    Like CodeGen, the compile steps are generators that yield requests for
+    their operands and nested blocks, driven by trampoline.run, so deep
+    expressions and nesting do not recurse in Python.
+    """
+
+    def compile_program(self, ast):
+        if ast["type"] != "program":
+            raise Exception("Expected 'program' node.")
+        self.function_index = {func["name"]: i for i, func in enumerate(ast["functions"])}
+        program = [self.compile_function(func) for func in ast["functions"]]
+        for function in program:
+            function.program = program
+        return {function.name: function for function in program}
+
+    def compile_function(self, func):
+        self.fn_name = func["name"]
+        self.code = array("i")
+        self.slots = [[] for _ in range(func["slots"])]  # slot -> names declared in it
+        self.constants = {}
+        self.registers = [0] * func["slots"]
+        self.free_temps = []
+        self.loop_targets = []  # (continue label, break label) per enclosing while
+        self.temps_owned = set()  # temporaries allocated by the current statement
+        self.labels = []        # label -> offset, or None while unplaced
+        self.fixups = []        # (code index, label) to patch once offsets are known
+
+        self.params = [self.declare(param) for param in func["params"]]
+        self.entry_label = self.new_label()
+        self.place(self.entry_label)
+        self.run((BLOCK, func["body"]))
+        self.emit(RET, self.constant(0))
+        for index, label in self.fixups:
+            self.code[index] = self.labels[label]
+        return VMFunction(func["name"], self.code, self.registers, self.slots, len(self.params))
+
+    def run(self, request):
+        return trampoline.run(self.start, request)
+
+    def start(self, request):
+        kind, node = request[0], request[1]
+        if kind == VALUE:
+            return self.compile_value(node, request[2])
+        if kind == BRANCH_IF:
+            return self.jump_if(node, request[2])
+        if kind == BRANCH_UNLESS:
+            return self.jump_unless(node, request[2])
+        if kind == STMT:
+            return self.with_temps(self.compile_stmt_body(node))
+        return self.compile_block(node)
+
+    # ------------------ Registers and labels ------------------
+    def new_register(self, value=0):
+        self.registers.append(value)
+        return len(self.registers) - 1
+
+    def declare(self, node):
+        # Variables live in the register of their slot
+        slot = node["slot"]
+        if node["name"] not in self.slots[slot]:
+            self.slots[slot].append(node["name"])
+        return slot
+
+    def constant(self, value):
+        # Literals wrap to i32 like LLVM constants, e.g. 3000000000 is -1294967296
+        value = wrap_i32(value)
+        reg = self.constants.get(value)
+        if reg is None:
+            reg = self.constants[value] = self.new_register(value)
+        return reg
+
+    def temp(self):
+        return self.free_temps.pop() if self.free_temps else self.new_register()
+
+    def new_label(self):
+        self.labels.append(None)
+        return len(self.labels) - 1
+
+    def place(self, label):
+        self.labels[label] = len(self.code)
+
+    def emit(self, op, a=0, b=0, c=0):
+        self.code.extend((op, a, b, c))
+
+    def emit_jump(self, op, label, a=0, b=0):
+        # The target goes in the last operand the opcode uses
+        self.emit(op, a, b, 0)
+        index = len(self.code) - 4 + (1 if op == JMP else 2 if op in (JZ, JNZ) else 3)
+        self.fixups.append((index, label))
+
+    # ------------------ Statements ------------------
+    def compile_block(self, stmts):
+        for stmt in stmts:
+            yield STMT, stmt
+
+    def with_temps(self, steps):
+        """
+        Runs the compile steps `steps`, then frees the temporaries they allocated.
+        """
+        outer, self.temps_owned = self.temps_owned, set()
+        result = yield from steps
+        self.free_temps.extend(self.temps_owned)
+        self.temps_owned = outer
+        return result
+
+    def compile_stmt_body(self, stmt):
+        stype = stmt["type"]
+        if stype == "let":
+            yield VALUE, stmt["value"], self.declare(stmt)
+        elif stype == "mut":
+            yield VALUE, stmt["value"], stmt["slot"]
+        elif stype == "print":
+            self.emit(PRINT, (yield VALUE, stmt["value"], None))
+        elif stype == "return":
+            yield from self.compile_return(stmt["value"])
+        elif stype == "expr":
+            yield VALUE, stmt["value"], None
+        elif stype == "if":
+            yield from self.compile_if(stmt)
+        elif stype == "while":
+            yield from self.compile_while(stmt)
+        elif stype == "break":
+            self.emit_jump(JMP, self.loop_targets[-1][1])
+        elif stype == "continue":
+            self.emit_jump(JMP, self.loop_targets[-1][0])
+        else:
+            raise Exception(f"Unknown statement type: {stype}")
+
+    def compile_return(self, value):
+        if not isinstance(value, dict) or value["type"] != "call":
+            self.emit(RET, (yield VALUE, value, None))
+        elif value["name"] == self.fn_name:
+            # Every argument is evaluated before any parameter is rebound
+            first = yield from self.compile_args(value["args"])
+            for i, param in enumerate(self.params):
+                self.emit(MOV, param, first + i)
+            self.emit_jump(JMP, self.entry_label)
+        else:
+            first = yield from self.compile_args(value["args"])
+            self.emit(TAILCALL, 0, self.function_index[value["name"]], first)
+
+    def compile_if(self, stmt):
+        else_label = self.new_label()
+        yield from self.with_temps(self.jump_unless(stmt["condition"], else_label))
+        yield BLOCK, stmt["then"]
+        if "else" in stmt:
+            end_label = self.new_label()
+            self.emit_jump(JMP, end_label)
+            self.place(else_label)
+            yield BLOCK, stmt["else"]
+            self.place(end_label)
+        else:
+            self.place(else_label)
+
+    def compile_while(self, stmt):
+        body_label = self.new_label()
+        cond_label = self.new_label()
+        end_label = self.new_label()
+        self.emit_jump(JMP, cond_label)
+        self.place(body_label)
+        self.loop_targets.append((cond_label, end_label))
+        yield BLOCK, stmt["body"]
+        self.loop_targets.pop()
+        self.place(cond_label)
+        yield from self.with_temps(self.jump_if(stmt["condition"], body_label))
+        self.place(end_label)
+
+    # ------------------ Conditions ------------------
+    def jump_if(self, expr, label):
+        """
+        Jumps to `label` if expr is nonzero, falling through otherwise.
+        """
+        etype = expr["type"] if isinstance(expr, dict) else None
+        if etype == "or":
+            yield BRANCH_IF, expr["left"], label
+            yield BRANCH_IF, expr["right"], label
+        elif etype == "and":
+            skip = self.new_label()
+            yield BRANCH_UNLESS, expr["left"], skip
+            yield BRANCH_IF, expr["right"], label
+            self.place(skip)
+        elif etype == "not":
+            yield BRANCH_UNLESS, expr["value"], label
+        elif etype in JUMP_IF:
+            left = yield VALUE, expr["left"], None
+            right = yield VALUE, expr["right"], None
+            self.emit_jump(JUMP_IF[etype], label, left, right)
+        else:
+            self.emit_jump(JNZ, label, (yield VALUE, expr, None))
+
+    def jump_unless(self, expr, label):
+        """
+        Jumps to `label` if expr is zero, falling through otherwise.
+        """
+        etype = expr["type"] if isinstance(expr, dict) else None
+        if etype == "and":
+            yield BRANCH_UNLESS, expr["left"], label
+            yield BRANCH_UNLESS, expr["right"], label
+        elif etype == "or":
+            skip = self.new_label()
+            yield BRANCH_IF, expr["left"], skip
+            yield BRANCH_UNLESS, expr["right"], label
+            self.place(skip)
+        elif etype == "not":
+            yield BRANCH_IF, expr["value"], label
+        elif etype in JUMP_UNLESS:
+            left = yield VALUE, expr["left"], None
+            right = yield VALUE, expr["right"], None
+            self.emit_jump(JUMP_UNLESS[etype], label, left, right)
+        else:
+            self.emit_jump(JZ, label, (yield VALUE, expr, None))
+
+    # ------------------ Expressions ------------------
+    def result_register(self, dst):
+        if dst is not None:
+            return dst
+        reg = self.temp()
+        self.temps_owned.add(reg)
+        return reg
+
+    def compile_args(self, args):
+        """
+        Evaluates call arguments into fresh consecutive registers and returns
+        the first one.
+        """
+        regs = [self.new_register() for _ in args]
+        self.temps_owned.update(regs)
+        for arg, reg in zip(args, regs):
+            yield VALUE, arg, reg
+        return regs[0] if regs else 0
+
+    def compile_expr(self, expr, dst=None):
+        """
+        Returns the register holding expr's value. Variables and constants are
+        used in place; if `dst` is given the value is left in that register.
+        """
+        return self.run((VALUE, expr, dst))
+
+    def compile_value(self, expr, dst):
+        if isinstance(expr, int):
+            reg = self.constant(expr)
+        elif expr["type"] == "variable":
+            reg = expr["slot"]
+        else:
+            return self.compile_operation(expr, dst)
+        if dst is not None and dst != reg:
+            self.emit(MOV, dst, reg)
+            return dst
+        return reg
+
+    def compile_operation(self, expr, dst):
+        etype = expr["type"]
+        if etype in ARITH_OPS or etype in CMP_OPS:
+            left = yield VALUE, expr["left"], None
+            right = yield VALUE, expr["right"], None
+            dst = self.result_register(dst)
+            self.emit(ARITH_OPS[etype] if etype in ARITH_OPS else CMP_OPS[etype], dst, left, right)
+            return dst
+        if etype in ("neg", "not"):
+            value = yield VALUE, expr["value"], None
+            dst = self.result_register(dst)
+            self.emit(NEG if etype == "neg" else NOT, dst, value)
+            return dst
+        if etype == "call":
+            first = yield from self.compile_args(expr["args"])
+            dst = self.result_register(dst)
+            self.emit(CALL, dst, self.function_index[expr["name"]], first)
+            return dst
+        if etype in ("and", "or"):
+            # dst = 0 (and) / 1 (or); overwritten if the other outcome is reached.
+            # Computed in a temporary, since dst may be read by the operands.
+            result = self.temp()
+            self.temps_owned.add(result)
+            done = self.new_label()
+            if etype == "and":
+                self.emit(MOV, result, self.constant(0))
+                yield BRANCH_UNLESS, expr, done
+                self.emit(MOV, result, self.constant(1))
+            else:
+                self.emit(MOV, result, self.constant(1))
+                yield BRANCH_IF, expr, done
+                self.emit(MOV, result, self.constant(0))
+            self.place(done)
+            if dst is not None:
+                self.emit(MOV, dst, result)
+                return dst
+            return result
+        raise Exception(f"Unhandled expr type: {etype}")
+
+
+class VMError(Exception):
+    pass
+
+
+def execute(function, out=None, line_buffered=False):
+    """
+    Runs a compiled function and returns its result. `print` output is
+    collected and written to `out` (default sys.stdout) in batches and when the
+    function returns, or after every print with line_buffered. Arithmetic wraps
+    to i32; division and remainder truncate toward zero like sdiv/srem, and
+    raise VMError where the native code would trap (divisor zero, INT_MIN / -1).
+    Calls push the caller's code, registers and resume point on a frame stack;
+    more than MAX_CALL_DEPTH nested calls raise VMError (where native code
+    would overflow its stack).
+    """
+    out = out or sys.stdout
+    program = function.program
+    code = function.code
+    regs = list(function.registers)
+    frames = []  # (code, regs, pc, result register) of each caller
+    pending = []
+    batch = 1 if line_buffered else OUTPUT_BATCH
+    pc = 0
+    try:
+        while True:
+            op, a, b, c = code[pc], code[pc + 1], code[pc + 2], code[pc + 3]
+            pc += 4
+            if op <= MUL:
+                if op == ADD:
+                    v = regs[b] + regs[c]
+                elif op == SUB:
+                    v = regs[b] - regs[c]
+                else:
+                    v = regs[b] * regs[c]
+                if -0x80000000 <= v <= 0x7FFFFFFF:
+                    regs[a] = v
+                else:
+                    v &= 0xFFFFFFFF
+                    regs[a] = v - 0x100000000 if v & 0x80000000 else v
+            elif op >= JEQ:
+                if op == JLT:
+                    if regs[a] < regs[b]:
+                        pc = c
+                elif op == JGE:
+                    if regs[a] >= regs[b]:
+                        pc = c
+                elif op == JNE:
+                    if regs[a] != regs[b]:
+                        pc = c
+                elif op == JEQ:
+                    if regs[a] == regs[b]:
+                        pc = c
+                elif op == JLE:
+                    if regs[a] <= regs[b]:
+                        pc = c
+                elif op == JGT:
+                    if regs[a] > regs[b]:
+                        pc = c
+                elif op == PRINT:
+                    pending.append(str(regs[a]))
+                    if len(pending) >= batch:
+                        out.write("\n".join(pending) + "\n")
+                        pending.clear()
+                        if line_buffered:
+                            out.flush()
+                elif op == RET:
+                    if not frames:
+                        return regs[a]
+                    value = regs[a]
+                    code, regs, pc, a = frames.pop()
+                    regs[a] = value
+                else:  # CALL, TAILCALL
+                    callee = program[b]
+                    args = regs[c:c + callee.params]
+                    if op == CALL:
+                        if len(frames) >= MAX_CALL_DEPTH:
+                            raise VMError(f"Call stack overflow (more than {MAX_CALL_DEPTH} nested calls)")
+                        frames.append((code, regs, pc, a))
+                    code = callee.code
+                    regs = list(callee.registers)
+                    regs[:callee.params] = args
+                    pc = 0
+            elif op == JMP:
+                pc = a
+            elif op == MOV:
+                regs[a] = regs[b]
+            elif op <= MOD:
+                x, y = regs[b], regs[c]
+                if y == 0 or (x == -0x80000000 and y == -1):
+                    raise VMError("Division by zero" if y == 0 else "Division overflow (INT_MIN / -1)")
+                q = abs(x) // abs(y)
+                if (x < 0) != (y < 0):
+                    q = -q
+                regs[a] = q if op == DIV else x - y * q
+            elif op <= GE:
+                x, y = regs[b], regs[c]
+                if op == LT:
+                    regs[a] = int(x < y)
+                elif op == EQ:
+                    regs[a] = int(x == y)
+                elif op == NE:
+                    regs[a] = int(x != y)
+                elif op == LE:
+                    regs[a] = int(x <= y)
+                elif op == GT:
+                    regs[a] = int(x > y)
+                else:
+                    regs[a] = int(x >= y)
+            elif op == JZ:
+                if not regs[a]:
+                    pc = b
+            elif op == JNZ:
+                if regs[a]:
+                    pc = b
+            elif op == NEG:
+                v = regs[b]
+                regs[a] = v if v == -0x80000000 else -v
+            else:  # NOT
+                regs[a] = int(not regs[b])
+    finally:
+        if pending:
+            out.write("\n".join(pending) + "\n")
+        out.flush()
+
+
+def run_vm(ast, out=None, line_buffered=False):
+    """
+    Compiles an analyzed AST to bytecode and runs main(), returning its result.
+    """
+    functions = BytecodeCompiler().compile_program(ast)
+    return execute(functions["main"], out, line_buffered)